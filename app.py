@@ -2,11 +2,18 @@
 """Just example of runner."""
 
 import argparse
+import cProfile
+import json
 import sys
 from distutils.util import strtobool
 
-from yapam.armory import Armory
+from yapam.accesslog import AccessLogImporter
+from yapam.armory import Armory, DEFAULT_SAMPLE_SIZE
 from yapam.config import AmmoConfig
+from yapam.har import HarImporter
+from yapam.instrumentation import Instrumentation, NULL_INSTRUMENTATION
+from yapam.merge import AmmoMerger, DEFAULT_MERGE_MODE, MERGE_MODES
+from yapam.validator import AmmoValidator
 
 
 def parse_args():
@@ -16,6 +23,30 @@ def parse_args():
                         help='Path to configuration file, ex: config.json')
     parser.add_argument('--template', default=False, type=strtobool, nargs='?', const=True,
                         help='Create config template')
+    parser.add_argument('--workers', default=None, type=int,
+                        help='Number of rendering processes, overrides WORKERS from config')
+    parser.add_argument('--chunk-size', default=None, type=int,
+                        help='Number of requests rendered by a worker at once, overrides CHUNK_SIZE from config')
+    parser.add_argument('--validate', default=None, type=str, nargs='?', const='',
+                        help='Validate ammo file (AMMO_FILE from config by default) and print statistics')
+    parser.add_argument('--dry-run', default=None, type=int, nargs='?', const=DEFAULT_SAMPLE_SIZE,
+                        metavar='SAMPLE_SIZE',
+                        help='Print ammo size, bullets per case and estimated render time without writing ammo. '
+                             'Requests with a data feed or generators are sampled by SAMPLE_SIZE bullets')
+    parser.add_argument('--merge', default=None, type=str, nargs='+', metavar='AMMO_FILE',
+                        help='Merge ammo files to --output (AMMO_FILE from config by default) and print statistics')
+    parser.add_argument('--merge-mode', default=DEFAULT_MERGE_MODE, choices=MERGE_MODES,
+                        help='concat - files one after another, interleave - bullets are taken from files by --ratios')
+    parser.add_argument('--ratios', default=None, type=int, nargs='+',
+                        help='Number of bullets taken from each merged file in turn, 1 for each file by default')
+    parser.add_argument('--window', default=0, type=int,
+                        help='Shuffle merged bullets within a window of this number of bullets')
+    parser.add_argument('--seed', default=0, type=int,
+                        help='Random generator seed for --window shuffle')
+    parser.add_argument('--output', default=None, type=str,
+                        help='Path to merged ammo file')
+    parser.add_argument('--profile', default=None, type=str,
+                        help='Save phase timers and per-case counters to a JSON file and cProfile stats to <file>.prof')
     return parser.parse_args()
 
 
@@ -30,16 +61,74 @@ def main():
         cfg.log.debug('Exit.')
         sys.exit(0)
 
+    if args.validate is not None:
+        ammo_file = args.validate if args.validate else AmmoConfig(args.config).ammo_file
+        report = AmmoValidator(ammo_file).validate()
+        print(json.dumps(report, indent=2))
+        sys.exit(0 if report['valid'] else 1)
+
+    if args.merge:
+        output = args.output if args.output else AmmoConfig(args.config).ammo_file
+        stats = AmmoMerger(args.merge, args.merge_mode, args.ratios, args.window, args.seed).merge(output)
+        print(json.dumps(stats, indent=2))
+        sys.exit(0)
+
+    instrumentation = Instrumentation() if args.profile else NULL_INSTRUMENTATION
+    profiler = cProfile.Profile() if args.profile else None
+    if profiler:
+        profiler.enable()
+
     try:
-        user_config = AmmoConfig(args.config)
+        with instrumentation.phase('config'):
+            user_config = AmmoConfig(args.config)
+    except (AssertionError, FileNotFoundError, TypeError, ValueError) as error_msg:
+        # logger of the broken config does not exist, default logging parameters are used
+        AmmoConfig().log.critical('Configuration file {} is not loaded: {}'.format(args.config, error_msg))
+        sys.exit(1)
+
+    try:
+        if args.workers is not None:
+            user_config.workers = args.workers
+        if args.chunk_size is not None:
+            user_config.chunk_size = args.chunk_size
         user_config.log.debug('Configuration file loaded: {}'.format(user_config.public_attrs()))
 
-        armory = Armory(user_config.requests, user_config.ammo_file, user_config.log)
-        armory.generate_ammo()
-    except (AssertionError, FileExistsError) as error_msg:
+        if user_config.access_log:
+            requests = AccessLogImporter(**user_config.access_log)
+        elif user_config.har:
+            requests = HarImporter(**user_config.har)
+        else:
+            requests = user_config.requests
+
+        armory = Armory(requests, user_config.ammo_file, user_config.log,
+                        buffer_size=user_config.write_buffer_size,
+                        workers=user_config.workers,
+                        chunk_size=user_config.chunk_size,
+                        total_bullets=user_config.total_bullets,
+                        seed=user_config.seed,
+                        compression=user_config.compression or None,
+                        compression_workers=user_config.compression_workers,
+                        cache_dir=user_config.cache_dir or None,
+                        instrumentation=instrumentation,
+                        ammo_type=user_config.ammo_type,
+                        connection=user_config.connection,
+                        default_headers=user_config.default_headers,
+                        shards=user_config.shards,
+                        shard_strategy=user_config.shard_strategy)
+        if args.dry_run is not None:
+            print(json.dumps(armory.estimate(args.dry_run), indent=2))
+        else:
+            armory.generate_ammo()
+    except (AssertionError, FileExistsError, TypeError, ValueError) as error_msg:
         user_config.log.critical(str(error_msg))
         sys.exit(1)
 
+    if profiler:
+        profiler.disable()
+        profiler.dump_stats(args.profile + '.prof')
+        instrumentation.save(args.profile, stats=armory.stats)
+        user_config.log.info('Profile report saved to {}'.format(args.profile))
+
     sys.exit(0)
 
 
@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+"""Ammo generation throughput and memory benchmarks.
+
+Each benchmark runs in a fresh process, so peak memory of one benchmark does not affect another.
+Results are printed and saved as JSON, a previous result file may be passed to compare versions.
+
+Example of usage:
+    python -m benchmarks.bench_generation --count 100000 --output results.json
+    python -m benchmarks.bench_generation --count 100000 --baseline results.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from multiprocessing import get_context
+
+import yapam
+from yapam.armory import Armory, render_bullet
+from yapam.config import ConfigRequest
+from yapam.phantom import PhantomAmmo, compile_template, encode_body, request_profile
+
+SHAPES = {
+    'get_no_body': {'host': '127.0.0.1', 'port': 8080, 'url': '/catalog?page=1', 'method': 'GET'},
+    'post_large_json': {'host': '127.0.0.1', 'port': 8080, 'url': '/order', 'method': 'POST',
+                        'body': {'field_{}'.format(i): 'value_{}'.format(i) * 10 for i in range(100)}},
+    'many_headers': {'host': '127.0.0.1', 'port': 8080, 'url': '/search?q=tank', 'method': 'GET',
+                     'extra_headers': {'X-Header-{}'.format(i): 'value-{}'.format(i) for i in range(30)}},
+    'generators': {'host': '127.0.0.1', 'port': 8080, 'url': '/users/${seq()}', 'method': 'GET',
+                   'extra_headers': {'X-Request-Id': '${uuid()}'}},
+}
+# generator expressions are replaced by Armory only
+ARMORY_SHAPES = frozenset(['generators'])
+TARGETS = ('phantom_ammo', 'template', 'render_bullet', 'armory')
+
+
+def peak_rss_kb() -> int:
+    """Peak resident set size of the current process in KiB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, Linux reports KiB
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+def run_benchmark(target: str, shape: str, count: int) -> dict:
+    """Run one benchmark in the current process."""
+    request = ConfigRequest(**SHAPES[shape])
+    rss_before = peak_rss_kb()
+    total_bytes = 0
+    started = time.perf_counter()
+    if target == 'phantom_ammo':
+        for __ in range(count):
+            bullet = PhantomAmmo(request.method, request.url, request.host, request.case, request.port,
+                                 request.extra_headers, request.body).bullet
+            total_bytes += len(bullet.encode('utf-8'))
+    elif target == 'template':
+        headers = tuple((key, str(val)) for key, val in request.extra_headers.items())
+        for __ in range(count):
+            template = compile_template(request.method, request.host, request.port, headers,
+                                        request_profile(request))
+            total_bytes += len(template.render(request.url, request.case, encode_body(request.body)))
+    elif target == 'render_bullet':
+        for __ in range(count):
+            total_bytes += len(render_bullet(request))
+    else:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            armory = Armory(repeat(request, count), os.path.join(tmp_dir, 'ammo'), None)
+            armory.generate_ammo()
+            total_bytes = armory.stats['bytes']
+    seconds = time.perf_counter() - started
+    return {'name': '{}.{}'.format(target, shape),
+            'target': target,
+            'shape': shape,
+            'bullets': count,
+            'bytes': total_bytes,
+            'seconds': seconds,
+            'bullets_per_sec': count / seconds,
+            'bytes_per_sec': total_bytes / seconds,
+            'peak_rss_kb': peak_rss_kb(),
+            'rss_growth_kb': peak_rss_kb() - rss_before}
+
+
+def run_isolated(target: str, shape: str, count: int) -> dict:
+    """Run one benchmark in a fresh process."""
+    with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as pool:
+        return pool.submit(run_benchmark, target, shape, count).result()
+
+
+def parse_args():
+    """Benchmark arguments parser."""
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--count', default=100000, type=int,
+                        help='Number of bullets for each benchmark')
+    parser.add_argument('--millions', default=1, type=int,
+                        help='Millions of bullets for the long armory run, 0 to skip it')
+    parser.add_argument('--targets', default=','.join(TARGETS), type=str,
+                        help='Comma separated benchmark targets: {}'.format(', '.join(TARGETS)))
+    parser.add_argument('--output', default=None, type=str,
+                        help='Path to a JSON file for results')
+    parser.add_argument('--baseline', default=None, type=str,
+                        help='Path to a JSON file with previous results to compare with')
+    return parser.parse_args()
+
+
+def main():
+    """Run benchmarks, print and save results."""
+    args = parse_args()
+    results = list()
+    for target in args.targets.split(','):
+        for shape in SHAPES:
+            if shape in ARMORY_SHAPES and target != 'armory':
+                continue
+            results.append(run_isolated(target, shape, args.count))
+    if args.millions and 'armory' in args.targets:
+        result = run_isolated('armory', 'get_no_body', args.millions * 1000000)
+        result['name'] = 'armory.millions'
+        results.append(result)
+
+    baseline = dict()
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as baseline_file:
+            baseline = {result['name']: result for result in json.load(baseline_file)['results']}
+    for result in results:
+        line = '{name:<32} {bullets_per_sec:>12.0f} bullets/s {bytes_per_sec:>14.0f} B/s {peak_rss_kb:>9} KiB'.format(
+            **result)
+        if result['name'] in baseline:
+            line += '  x{:.2f}'.format(result['bullets_per_sec'] / baseline[result['name']]['bullets_per_sec'])
+        print(line)
+    timings = {result['name']: result['seconds'] for result in results}
+    if 'armory.generators' in timings and 'armory.get_no_body' in timings:
+        # each bullet takes values from a shared stream, so generators should cost a few times a plain GET at most
+        print('generator expressions overhead: x{:.2f}'.format(
+            timings['armory.generators'] / timings['armory.get_no_body']))
+
+    report = {'yapam_version': yapam.__version__,
+              'python': platform.python_version(),
+              'platform': platform.platform(),
+              'results': results}
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as output_file:
+            json.dump(report, output_file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""Access log importer test cases."""
+import gzip
+
+import pytest
+
+from yapam.accesslog import AccessLogImporter
+from yapam.armory import Armory
+
+
+pytestmark = [pytest.mark.accesslog]
+
+LOG_LINES = [
+    '10.0.0.1 - - [10/Oct/2020:13:55:36 +0300] "GET /catalog?page=1 HTTP/1.1" 200 2326 "-" "curl/7.68.0"\n',
+    '10.0.0.2 - bob [10/Oct/2020:13:55:37 +0300] "POST /order HTTP/1.1" 201 12 "-" "Mozilla/5.0"\n',
+    '10.0.0.3 - - [10/Oct/2020:13:55:38 +0300] "GET /search?q=tank HTTP/1.1" 404 0\n',
+    '10.0.0.4 - - [10/Oct/2020:13:55:39 +0300] "CONNECT example.com:443 HTTP/1.1" 400 0 "-" "-"\n',
+    'garbage line\n',
+]
+
+
+@pytest.fixture(params=['plain', 'gzip'])
+def access_log_file(tmpdir, request):
+    """Temporary access log, plain or gzip-compressed."""
+    if request.param == 'gzip':
+        fn = str(tmpdir.join('access.log.gz'))
+        with gzip.open(fn, 'wt', encoding='utf-8') as f:
+            f.writelines(LOG_LINES)
+    else:
+        fn = str(tmpdir.join('access.log'))
+        with open(fn, 'w', encoding='utf-8') as f:
+            f.writelines(LOG_LINES)
+    return fn
+
+
+class TestAccessLogImporter:
+    """AccessLogImporter test cases."""
+
+    def test_import(self, access_log_file):
+        """Check that supported lines are imported and the rest are skipped."""
+        importer = AccessLogImporter(access_log_file, host='127.0.0.1', port=8080)
+        requests = list(importer)
+        assert [(request.method, request.url, request.case) for request in requests] == [
+            ('GET', '/catalog?page=1', '/catalog'), ('POST', '/order', '/order'), ('GET', '/search?q=tank', '/search')]
+        assert all(request.port == 8080 for request in requests)
+        assert (importer.imported, importer.skipped) == (3, 2)
+
+    def test_filters(self, access_log_file):
+        """Check methods, statuses and url filters."""
+        importer = AccessLogImporter(access_log_file, host='127.0.0.1', methods=['get'], statuses=[200, 404],
+                                     url_pattern='^/search')
+        assert [request.url for request in importer] == ['/search?q=tank']
+
+    def test_sample_rate(self, tmpdir):
+        """Check that sampling is reproducible and close to sample_rate."""
+        fn = str(tmpdir.join('access.log'))
+        with open(fn, 'w', encoding='utf-8') as f:
+            f.writelines(LOG_LINES[0] for __ in range(1000))
+        first = AccessLogImporter(fn, host='127.0.0.1', sample_rate=0.3, seed=1)
+        assert 200 < len(list(first)) < 400
+        assert first.imported == len(list(AccessLogImporter(fn, host='127.0.0.1', sample_rate=0.3, seed=1)))
+
+    def test_bad_sample_rate(self, access_log_file):
+        """Check that sample_rate should be in (0, 1] range."""
+        with pytest.raises(ValueError):
+            AccessLogImporter(access_log_file, host='127.0.0.1', sample_rate=0)
+
+    def test_generate_ammo(self, access_log_file, temporary_ammo_file, logger):
+        """Check that log is converted to ammo."""
+        armory = Armory(AccessLogImporter(access_log_file, host='127.0.0.1'), temporary_ammo_file, logger)
+        assert armory.generate_ammo()
+        assert armory.stats['bullets'] == 3
+
+    def test_literal_urls(self, tmpdir):
+        """Check that generator expressions in logged urls are written as is."""
+        fn = str(tmpdir.join('access.log'))
+        urls = ['/x?q=${env(HOME)}', '/s/${seq()}', '/f/${choice(@/etc/passwd)}']
+        with open(fn, 'w', encoding='utf-8') as f:
+            f.writelines('10.0.0.1 - - [10/Oct/2020:13:55:36 +0300] "GET {} HTTP/1.1" 200 0\n'.format(url)
+                         for url in urls)
+        ammo_file = str(tmpdir.join('ammo'))
+        importer = AccessLogImporter(fn, host='127.0.0.1')
+        assert Armory(importer, ammo_file, None).generate_ammo()
+        assert (importer.imported, importer.skipped) == (3, 0)
+        with open(ammo_file, 'rb') as f:
+            ammo = f.read()
+        assert all('GET {} HTTP/1.1'.format(url).encode() in ammo for url in urls)
+        assert b'root:' not in ammo
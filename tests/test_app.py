@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+"""Example runner test cases."""
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+
+pytestmark = [pytest.mark.app]
+
+APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app.py')
+
+
+def run_app(*args) -> subprocess.CompletedProcess:
+    """Run app.py with arguments."""
+    return subprocess.run([sys.executable, APP] + list(args), capture_output=True, text=True, timeout=60)
+
+
+class TestApp:
+    """Runner test cases."""
+
+    @pytest.mark.parametrize('data', ['{"AMMO_FILE": "ammo",', '{"AMMO_FILE": "ammo", "REQUESTS": [{"url": "/"}]}'])
+    def test_bad_config(self, tmpdir, data):
+        """Check that a malformed config file is reported without a traceback."""
+        config_file = tmpdir.join('config.json')
+        config_file.write(data)
+        result = run_app('--config', str(config_file))
+        assert result.returncode == 1
+        assert 'Configuration file {} is not loaded'.format(config_file) in result.stdout
+        assert 'Traceback' not in result.stderr
+
+    def test_missing_config(self, tmpdir):
+        """Check that a missing config file is reported."""
+        result = run_app('--config', str(tmpdir.join('missing.json')))
+        assert result.returncode == 1
+        assert 'not exists' in result.stdout
+
+    def test_bad_requests_file(self, tmpdir):
+        """Check that a bad JSONL request found during generation is reported with its line without a traceback."""
+        requests_file = tmpdir.join('requests.jsonl')
+        requests_file.write(json.dumps({'host': '127.0.0.1', 'url': '/', 'method': 'GET'}) + '\n'
+                            + json.dumps({'host': '127.0.0.1', 'url': '/', 'method': 'BAD'}) + '\n')
+        config_file = tmpdir.join('config.json')
+        config_file.write(json.dumps({'AMMO_FILE': str(tmpdir.join('ammo')), 'REQUESTS_FILE': str(requests_file)}))
+        result = run_app('--config', str(config_file))
+        assert result.returncode == 1
+        assert '{}:2 contains bad parameters'.format(requests_file) in result.stdout + result.stderr
+        assert 'Traceback' not in result.stderr
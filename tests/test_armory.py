@@ -1,9 +1,15 @@
 # -*- coding: utf-8 -*-
 """Ammo factory test cases."""
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+
 import pytest
 
 from yapam.armory import Armory
-from yapam.config import ConfigRequest
+from yapam.config import ConfigRequest, RequestTable
+from yapam.phantom import compile_template
+from yapam.validator import AmmoValidator
 
 
 pytestmark = [pytest.mark.armory]
@@ -65,3 +71,324 @@ class TestArmory:
 
         # Compare list
         assert ammo_lines == phantom_ammo_blueprint
+
+    def test_generate_ammo_parallel(self, logger, tmpdir, config_request):
+        """Check that parallel mode output is byte-identical to the serial one."""
+        requests = list()
+        for i in range(25):
+            config_request.update({'url': '/auth/{}'.format(i), 'extra_headers': {'X-Id': str(i)}})
+            requests.append(ConfigRequest(**config_request))
+        serial_file, parallel_file = str(tmpdir.join('serial')), str(tmpdir.join('parallel'))
+
+        assert Armory(requests=requests, ammo_file_path=serial_file, logger=logger).generate_ammo()
+        armory = Armory(requests=requests, ammo_file_path=parallel_file, logger=logger, workers=2, chunk_size=4)
+        assert armory.generate_ammo()
+        assert armory.stats['bullets'] == len(requests)
+
+        with open(serial_file, 'rb') as serial, open(parallel_file, 'rb') as parallel:
+            assert serial.read() == parallel.read()
+
+    def test_bad_workers(self, logger, temporary_ammo_file, config_requests):
+        """Check that workers and chunk_size should be positive."""
+        with pytest.raises(ValueError):
+            Armory(requests=config_requests, ammo_file_path=temporary_ammo_file, logger=logger, workers=0)
+
+    def test_generate_ammo_from_feed(self, logger, temporary_ammo_file, config_request, tmpdir):
+        """Check that request with a data feed is expanded to one bullet per feed row."""
+        feed_file = str(tmpdir.join('users.csv'))
+        with open(feed_file, 'w', encoding='utf-8') as f:
+            f.write('user_id,token\n1,aaa\n2,bbb\n')
+        config_request.update({'url': '/users/${user_id}',
+                               'extra_headers': {'Authorization': 'jwt ${token}'},
+                               'body': {'user_id': '${user_id}'},
+                               'feed': feed_file})
+        armory = Armory(requests=[ConfigRequest(**config_request)], ammo_file_path=temporary_ammo_file, logger=logger)
+        assert armory.generate_ammo()
+        assert armory.stats['bullets'] == 2
+
+        with open(temporary_ammo_file, 'r') as f:
+            ammo = f.read()
+        for user_id, token in (('1', 'aaa'), ('2', 'bbb')):
+            assert 'POST /users/{} HTTP/1.1'.format(user_id) in ammo
+            assert 'Authorization: jwt {}'.format(token) in ammo
+            assert '{{"user_id": "{}"}}'.format(user_id) in ammo
+        assert ammo.count(' /users/${user_id}\n') == 2
+
+    def test_feed_values_literal(self, logger, temporary_ammo_file, config_request, tmpdir):
+        """Check that feed values are not parsed as generator expressions."""
+        feed_file = str(tmpdir.join('users.csv'))
+        with open(feed_file, 'w', encoding='utf-8') as f:
+            f.write('user_id,token\n${seq()},${env(HOME)}\n')
+        config_request.update({'url': '/users/${user_id}', 'extra_headers': {'Authorization': 'jwt ${token}'},
+                               'feed': feed_file})
+        armory = Armory(requests=[ConfigRequest(**config_request)], ammo_file_path=temporary_ammo_file, logger=logger)
+        assert armory.generate_ammo()
+        with open(temporary_ammo_file, 'r') as f:
+            ammo = f.read()
+        assert 'POST /users/${seq()} HTTP/1.1' in ammo
+        assert 'Authorization: jwt ${env(HOME)}' in ammo
+
+    def test_dynamic_headers_not_cached(self, logger, tmpdir, config_request):
+        """Check that a header with a new value for each bullet does not compile a template for each bullet."""
+        config_request.update({'url': '/users/${seq()}', 'extra_headers': {'X-Request-Id': '${uuid()}'},
+                               'body': {'id': '${seq()}'}})
+        requests = [ConfigRequest(**config_request) for __ in range(200)]
+        compile_template.cache_clear()
+        for ammo_type in ('phantom', 'uripost'):
+            ammo_file = str(tmpdir.join(ammo_type))
+            assert Armory(requests=requests, ammo_file_path=ammo_file, logger=logger, ammo_type=ammo_type).generate_ammo()
+            with open(ammo_file, 'rb') as f:
+                ammo = f.read()
+            assert len(set(re.findall(rb'X-Request-Id: ([0-9a-f-]{36})', ammo))) == 200
+        assert compile_template.cache_info().currsize == 1
+        assert b'{"id": 199}' in ammo
+
+    def test_generate_ammo_mix(self, logger, tmpdir, config_request):
+        """Check that weighted mix gives total_bullets bullets and the same seed gives the same file."""
+        requests = list()
+        for url, weight in (('/catalog', 70), ('/search', 25), ('/order', 5)):
+            config_request.update({'url': url, 'weight': weight})
+            requests.append(ConfigRequest(**config_request))
+        first_file, second_file = str(tmpdir.join('first')), str(tmpdir.join('second'))
+
+        for ammo_file in (first_file, second_file):
+            armory = Armory(requests=requests, ammo_file_path=ammo_file, logger=logger, total_bullets=1000, seed=3)
+            assert armory.generate_ammo()
+            assert armory.stats['bullets'] == 1000
+
+        with open(first_file, 'rb') as first, open(second_file, 'rb') as second:
+            ammo = first.read()
+            assert ammo == second.read()
+        assert ammo.count(b'POST /catalog HTTP/1.1') > ammo.count(b'POST /search HTTP/1.1') > ammo.count(b'POST /order')
+
+    @pytest.mark.parametrize('ammo_type, method', [('uri', 'GET'), ('uripost', 'POST')])
+    def test_generate_uri_ammo(self, logger, tmpdir, config_request, ammo_type, method):
+        """Check that URI ammo in parallel mode is byte-identical to the serial one."""
+        requests = list()
+        for i in range(25):
+            config_request.update({'url': '/auth/{}'.format(i), 'method': method, 'host': '127.0.0.{}'.format(i // 3),
+                                   'body': config_request['body'] if method == 'POST' else None})
+            requests.append(ConfigRequest(**config_request))
+        serial_file, parallel_file = str(tmpdir.join('serial')), str(tmpdir.join('parallel'))
+
+        armory = Armory(requests=requests, ammo_file_path=serial_file, logger=logger, ammo_type=ammo_type)
+        assert armory.generate_ammo()
+        assert armory.stats['bullets'] == len(requests)
+        armory = Armory(requests=requests, ammo_file_path=parallel_file, logger=logger, workers=2, chunk_size=4,
+                        ammo_type=ammo_type)
+        assert armory.generate_ammo()
+
+        with open(serial_file, 'rb') as serial, open(parallel_file, 'rb') as parallel:
+            ammo = serial.read()
+            assert ammo == parallel.read()
+        assert ammo.count(b'[User-Agent: phantom]') == 1
+        assert ammo.count(b'[Host: ') == 9
+
+    def test_bad_ammo_type(self, logger, temporary_ammo_file, config_requests):
+        """Check that ammo_type should be supported."""
+        with pytest.raises(ValueError):
+            Armory(requests=config_requests, ammo_file_path=temporary_ammo_file, logger=logger, ammo_type='json')
+
+    def test_generate_keep_alive_ammo(self, logger, temporary_ammo_file, config_request):
+        """Check that config connection profile is used by requests without their own one."""
+        requests = [ConfigRequest(**config_request), ConfigRequest(**dict(config_request, connection='close'))]
+        armory = Armory(requests=requests, ammo_file_path=temporary_ammo_file, logger=logger,
+                        connection='keep-alive', default_headers={'User-Agent': 'app/1.0'})
+        assert armory.generate_ammo()
+
+        with open(temporary_ammo_file, 'rb') as f:
+            ammo = f.read()
+        assert ammo.count(b'Connection: Keep-Alive\r\n') == 1
+        assert ammo.count(b'Connection: Close\r\n') == 1
+        assert ammo.count(b'User-Agent: app/1.0\r\n') == 2
+
+    def test_generate_ammo_with_generators(self, logger, tmpdir, config_request):
+        """Check that each bullet gets generated values and the same seed gives the same file."""
+        config_request.update({'url': '/users/${seq(1)}', 'body': {'id': '${seq(1)}', 'token': '${uuid()}'}})
+        requests = [ConfigRequest(**config_request)]
+        first_file, second_file = str(tmpdir.join('first')), str(tmpdir.join('second'))
+
+        for ammo_file in (first_file, second_file):
+            armory = Armory(requests=requests, ammo_file_path=ammo_file, logger=logger, total_bullets=50, seed=3)
+            assert armory.generate_ammo()
+
+        with open(first_file, 'rb') as first, open(second_file, 'rb') as second:
+            ammo = first.read()
+            assert ammo == second.read()
+        assert b'POST /users/50 HTTP/1.1' in ammo
+        assert b'{"id": 50, "token": "' in ammo
+        # test case tag is the url template
+        assert ammo.count(b' /users/${seq(1)}\n') == 50
+
+    def test_generators_shared_between_requests(self, logger, tmpdir, config_request):
+        """Check that requests with the same template take values from one stream, with or without a cache."""
+        config_request.update({'url': '/users/${seq()}', 'method': 'GET', 'body': None})
+        requests = [ConfigRequest(**config_request) for __ in range(3)]
+        first_file, second_file = str(tmpdir.join('first')), str(tmpdir.join('second'))
+
+        assert Armory(requests=requests, ammo_file_path=first_file, logger=logger).generate_ammo()
+        for __ in range(2):
+            armory = Armory(requests=requests, ammo_file_path=second_file, logger=logger,
+                            cache_dir=str(tmpdir.join('cache')))
+            assert armory.generate_ammo()
+
+        with open(first_file, 'rb') as first, open(second_file, 'rb') as second:
+            ammo = first.read()
+            assert ammo == second.read()
+        urls = [line.split()[1] for line in ammo.split(b'\n') if line.startswith(b'GET ')]
+        assert urls == [b'/users/0', b'/users/1', b'/users/2']
+
+    def test_stream_consumer_gone(self, logger, tmpdir, config_request):
+        """Check that generation stops without errors when a FIFO reader closes it."""
+        fifo = str(tmpdir.join('ammo.fifo'))
+        os.mkfifo(fifo)
+
+        def read_head():
+            with open(fifo, 'rb') as f:
+                return f.read(1000)
+
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            head = pool.submit(read_head)
+            armory = Armory(requests=[ConfigRequest(**config_request)], ammo_file_path=fifo, logger=logger,
+                            buffer_size=1024, total_bullets=100000)
+            assert armory.generate_ammo()
+        assert head.result().startswith(b'192 /auth\n')
+        assert armory.stats['file_bytes'] < 100000 * 201
+
+    @pytest.mark.parametrize('ammo_type, workers', [('phantom', 1), ('phantom', 2), ('uri', 1)])
+    def test_generate_sharded_ammo(self, logger, tmpdir, config_request, ammo_type, workers):
+        """Check that shards contain all bullets of the single file in round-robin order."""
+        requests = list()
+        for i in range(20):
+            config_request.update({'url': '/auth/{}'.format(i), 'method': 'GET', 'body': None})
+            requests.append(ConfigRequest(**config_request))
+        single_file, sharded_file = str(tmpdir.join('single')), str(tmpdir.join('sharded'))
+
+        assert Armory(requests=requests, ammo_file_path=single_file, logger=logger, ammo_type=ammo_type).generate_ammo()
+        armory = Armory(requests=requests, ammo_file_path=sharded_file, logger=logger, ammo_type=ammo_type,
+                        workers=workers, chunk_size=3, shards=2)
+        assert armory.generate_ammo()
+        assert armory.stats['bullets'] == len(requests)
+        assert armory.stats['shards'] == 2
+
+        with open(single_file, 'rb') as f:
+            single = f.read()
+        for index in range(2):
+            with open('{}.{}'.format(sharded_file, index), 'rb') as f:
+                shard = f.read()
+            for i, request in enumerate(requests):
+                assert (request.url.encode('utf-8') + b' ' in shard) == (i % 2 == index)
+            if ammo_type == 'uri':
+                # each shard has its own header lines
+                assert shard.startswith(single[:single.index(b'/auth/0')])
+
+    @pytest.mark.parametrize('ammo_type', ['phantom', 'uripost'])
+    def test_generate_ammo_with_file_body(self, logger, tmpdir, config_request, ammo_type):
+        """Check that file body is written as is in serial and parallel modes."""
+        body_file = tmpdir.join('image.png')
+        body_file.write_binary(b'\x89PNG\r\n\x00' * 10000)
+        config_request.update({'body_type': 'raw', 'body': {'file': str(body_file), 'content_type': 'image/png'}})
+        requests = [ConfigRequest(**config_request) for __ in range(5)]
+        serial_file, parallel_file = str(tmpdir.join('serial')), str(tmpdir.join('parallel'))
+
+        assert Armory(requests=requests, ammo_file_path=serial_file, logger=logger, ammo_type=ammo_type,
+                      buffer_size=1024).generate_ammo()
+        assert Armory(requests=requests, ammo_file_path=parallel_file, logger=logger, ammo_type=ammo_type,
+                      workers=2, chunk_size=2).generate_ammo()
+
+        with open(serial_file, 'rb') as serial, open(parallel_file, 'rb') as parallel:
+            data = serial.read()
+            assert data == parallel.read()
+        assert data.count(b'\x89PNG\r\n\x00' * 10000) == 5
+        if ammo_type == 'phantom':
+            assert AmmoValidator(serial_file).validate()['valid']
+
+
+class TestEstimate:
+    """Armory.estimate test cases."""
+
+    @staticmethod
+    def requests(config_request, tmpdir, method='POST'):
+        """Static, feed and generator requests."""
+        feed_file = str(tmpdir.join('users.csv'))
+        with open(feed_file, 'w', encoding='utf-8') as f:
+            f.write('user_id\n' + ''.join('{}\n'.format(i * 37) for i in range(30)))
+        config_request['method'] = method
+        if method == 'GET':
+            config_request['body'] = None
+        # URI ammo can not remove headers, so all requests have X-User
+        static = ConfigRequest(**dict(config_request, url='/catalog', case='catalog', weight=5,
+                                      extra_headers={'X-User': 'guest'}))
+        feed = ConfigRequest(**dict(config_request, url='/users/${user_id}', case='users', feed=feed_file,
+                                    extra_headers={'X-User': '${user_id}'}))
+        generated = ConfigRequest(**dict(config_request, url='/orders/${randint(1, 100000)}', case='orders',
+                                         weight=2, extra_headers={'X-User': 'guest'}))
+        return [static, feed, generated]
+
+    @staticmethod
+    def check(armory, report):
+        """Check that estimate is the same as the generated ammo, or close to it if it is not exact."""
+        assert not os.path.exists(armory.ammo_file_path)
+        assert armory.generate_ammo()
+        assert report['bullets'] == armory.stats['bullets']
+        assert armory.stats['bytes'] == os.path.getsize(armory.ammo_file_path)
+        if report['exact']:
+            assert report['bytes'] == armory.stats['bytes']
+        else:
+            assert abs(report['bytes'] - armory.stats['bytes']) < armory.stats['bytes'] * 0.1
+
+    @pytest.mark.parametrize('ammo_type, method', [('phantom', 'POST'), ('uri', 'GET'), ('uripost', 'POST')])
+    def test_estimate(self, logger, tmpdir, config_request, ammo_type, method):
+        """Check that estimate of each request is exact."""
+        armory = Armory(requests=self.requests(config_request, tmpdir, method), logger=logger,
+                        ammo_file_path=str(tmpdir.join('ammo')), ammo_type=ammo_type)
+        report = armory.estimate()
+        assert report['exact']
+        assert report['cases']['users']['bullets'] == 30
+        assert report['cases']['catalog'] == {'bullets': 1, 'bytes': report['cases']['catalog']['bytes'],
+                                              'exact': True}
+        self.check(armory, report)
+
+    @pytest.mark.parametrize('ammo_type, method', [('phantom', 'POST'), ('uri', 'GET')])
+    def test_estimate_mix(self, logger, tmpdir, config_request, ammo_type, method):
+        """Check estimate of a weighted mix."""
+        armory = Armory(requests=self.requests(config_request, tmpdir, method), logger=logger,
+                        ammo_file_path=str(tmpdir.join('ammo')), ammo_type=ammo_type, total_bullets=300, seed=5)
+        report = armory.estimate(sample_size=300)
+        # X-User header of users case is changed by other requests in URI ammo
+        assert report['exact'] == (ammo_type == 'phantom')
+        assert report['cases']['catalog']['exact']
+        self.check(armory, report)
+
+    @pytest.mark.parametrize('ammo_type', ['phantom', 'uripost'])
+    def test_estimate_table(self, logger, tmpdir, config_request, monkeypatch, ammo_type):
+        """Check that bullet sizes of RequestTable rows are exact and only a sample of rows is rendered."""
+        rendered = list()
+        bullet_renderer = Armory.bullet_renderer
+
+        def counting_renderer(armory):
+            render = bullet_renderer(armory)
+            return lambda request, *args: rendered.append(request) or render(request, *args)
+
+        monkeypatch.setattr(Armory, 'bullet_renderer', counting_renderer)
+        requests = RequestTable([dict(config_request, url='/items/{}'.format(i), case='case_{}'.format(i % 3),
+                                      body={'id': i % 4}) for i in range(500)])
+        armory = Armory(requests=requests, logger=logger, ammo_file_path=str(tmpdir.join('ammo')),
+                        ammo_type=ammo_type)
+        report = armory.estimate(sample_size=20)
+        assert report['exact']
+        assert report['bullets'] == 500
+        assert len(rendered) == 20
+        self.check(armory, report)
+
+    def test_extrapolated(self, logger, tmpdir, config_request):
+        """Check that bytes of a large request are extrapolated from a sample."""
+        armory = Armory(requests=self.requests(config_request, tmpdir), logger=logger,
+                        ammo_file_path=str(tmpdir.join('ammo')), total_bullets=3000)
+        report = armory.estimate(sample_size=50)
+        assert not report['exact']
+        assert report['cases']['catalog']['exact']
+        assert not report['cases']['orders']['exact']
+        assert report['bullets'] == 3000
+        assert armory.generate_ammo()
+        assert abs(report['bytes'] - armory.stats['bytes']) < armory.stats['bytes'] * 0.01
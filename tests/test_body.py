@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""Request body encoders test cases."""
+import pytest
+
+from yapam.body import BOUNDARY, FormBody, MultipartBody, RawBody, make_encoder, map_file
+from yapam.config import ConfigRequest
+from yapam.phantom import PhantomRenderer
+from yapam.writer import join_parts
+
+
+pytestmark = [pytest.mark.body]
+
+
+@pytest.fixture
+def body_file(tmpdir):
+    """Binary body file."""
+    file_path = tmpdir.join('image.png')
+    file_path.write_binary(b'\x89PNG\r\n\x00' * 100)
+    return str(file_path)
+
+
+class TestEncoders:
+    """Body encoders test cases."""
+
+    def test_raw_file(self, body_file):
+        """Check that raw file body is a memory map shared by encoders."""
+        encoder = make_encoder('raw', {'file': body_file, 'content_type': 'image/png'})
+        assert isinstance(encoder, RawBody)
+        assert encoder.parts == (map_file(body_file),)
+        assert encoder.parts[0] is make_encoder('raw', {'file': body_file}).parts[0]
+        assert encoder.size == 700
+        assert encoder.content_type == 'image/png'
+        assert encoder.files == [body_file]
+
+    def test_raw_text(self):
+        """Check raw text body."""
+        encoder = make_encoder('raw', {'text': 'привет'})
+        assert encoder.parts == ('привет'.encode('utf-8'),)
+        assert encoder.content_type == 'application/octet-stream'
+
+    def test_raw_empty(self):
+        """Check that raw body should have file or text."""
+        with pytest.raises(ValueError):
+            make_encoder('raw', {'content_type': 'text/plain'})
+
+    def test_form(self):
+        """Check url-encoded form body."""
+        encoder = make_encoder('form', {'username': 'tank user', 'tags': ['a', 'b']})
+        assert isinstance(encoder, FormBody)
+        assert encoder.parts == (b'username=tank+user&tags=a&tags=b',)
+        assert encoder.content_type == 'application/x-www-form-urlencoded'
+
+    def test_multipart(self, body_file):
+        """Check multipart body with a field and a file."""
+        encoder = make_encoder('multipart', {'name': 'avatar', 'avatar': {'file': body_file,
+                                                                          'content_type': 'image/png'}})
+        assert isinstance(encoder, MultipartBody)
+        assert encoder.content_type == 'multipart/form-data; boundary={}'.format(BOUNDARY)
+        assert encoder.parts[1] is map_file(body_file)
+        boundary = BOUNDARY.encode('utf-8')
+        assert join_parts(encoder.parts) == (
+            b'--' + boundary + b'\r\nContent-Disposition: form-data; name="name"\r\n\r\navatar\r\n'
+            b'--' + boundary + b'\r\nContent-Disposition: form-data; name="avatar"; filename="image.png"\r\n'
+            b'Content-Type: image/png\r\n\r\n' + b'\x89PNG\r\n\x00' * 100 + b'\r\n--' + boundary + b'--\r\n')
+        assert encoder.size == len(join_parts(encoder.parts))
+
+    def test_multipart_boundary(self):
+        """Check that field with the boundary is an error."""
+        with pytest.raises(ValueError):
+            make_encoder('multipart', {'name': BOUNDARY})
+
+    def test_json(self):
+        """Check that json body has no encoder."""
+        assert make_encoder('json', {'username': 'admin'}) is None
+
+    def test_bad_body_type(self):
+        """Check unknown body type."""
+        with pytest.raises(ValueError):
+            make_encoder('xml', {})
+
+
+class TestRequestBody:
+    """ConfigRequest body_type test cases."""
+
+    def test_render_raw_file(self, body_file):
+        """Check phantom bullet with a raw file body."""
+        request = ConfigRequest(host='127.0.0.1', port=8888, url='/upload', method='POST', body_type='raw',
+                                body={'file': body_file, 'content_type': 'image/png'})
+        bullet = PhantomRenderer.render_request(request)
+        assert type(bullet) is tuple
+        assert map_file(body_file) in bullet
+        head, __, tail = join_parts(bullet).partition(b'\r\n\r\n')
+        assert b'Content-Type: image/png' in head
+        assert b'Content-Type: application/json' not in head
+        assert b'Content-Length: 700' in head
+        assert tail == b'\x89PNG\r\n\x00' * 100 + b'\r\n\r\n'
+
+    def test_bad_body_type(self):
+        """Check that bad body_type is a config error."""
+        with pytest.raises(TypeError):
+            ConfigRequest(host='127.0.0.1', port=8888, url='/', method='POST', body_type='xml', body={'a': 1})
+
+    def test_missing_file(self, tmpdir):
+        """Check that missing body file is a config error."""
+        with pytest.raises(TypeError):
+            ConfigRequest(host='127.0.0.1', port=8888, url='/', method='POST', body_type='raw',
+                          body={'file': str(tmpdir.join('missing'))})
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""Regeneration cache test cases."""
+import os
+
+import pytest
+
+from yapam.armory import Armory
+from yapam.cache import SegmentCache
+from yapam.config import ConfigRequest
+
+
+pytestmark = [pytest.mark.cache]
+
+
+@pytest.fixture
+def requests(config_request):
+    """List of 5 config requests."""
+    return [ConfigRequest(**dict(config_request, url='/auth/{}'.format(i))) for i in range(5)]
+
+
+class TestSegmentCache:
+    """SegmentCache test cases."""
+
+    def test_key(self, config_request):
+        """Check that key depends on request content only."""
+        first, second = ConfigRequest(**config_request), ConfigRequest(**config_request)
+        assert SegmentCache.key(first) == SegmentCache.key(second)
+        second.body = {'username': 'other'}
+        assert SegmentCache.key(first) != SegmentCache.key(second)
+        assert SegmentCache.key(first) != SegmentCache.key(first, salt='uri')
+
+    def test_regeneration(self, logger, tmpdir, requests):
+        """Check that only changed requests are rendered and output is the same as without cache."""
+        cache_dir = str(tmpdir.join('cache'))
+        plain_file, cached_file = str(tmpdir.join('plain')), str(tmpdir.join('cached'))
+
+        armory = Armory(requests=requests, ammo_file_path=cached_file, logger=logger, cache_dir=cache_dir)
+        assert armory.generate_ammo()
+        assert armory.stats['bullets'] == 5
+
+        requests[2].url = '/changed'
+        armory = Armory(requests=requests, ammo_file_path=cached_file, logger=logger, cache_dir=cache_dir)
+        assert armory.generate_ammo()
+        Armory(requests=requests, ammo_file_path=plain_file, logger=logger).generate_ammo()
+        with open(plain_file, 'rb') as plain, open(cached_file, 'rb') as cached:
+            assert plain.read() == cached.read()
+
+        # old segment of the changed request is removed
+        cache = SegmentCache(cache_dir)
+        assert len(cache.segments) == 5
+        assert len([name for name in os.listdir(cache_dir) if name.endswith('.ammo')]) == 5
+
+    def test_hits(self, tmpdir, requests):
+        """Check cache hits and misses counters."""
+        cache = SegmentCache(str(tmpdir.join('cache')))
+        key = cache.key(requests[0])
+        assert key not in cache
+        assert cache.store(key, [b'bullet'], buffer_size=1024) == 1
+        assert key in cache
+        assert cache.reuse(key) == 1
+        assert (cache.hits, cache.misses) == (1, 1)
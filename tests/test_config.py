@@ -4,7 +4,8 @@ import json
 
 import pytest
 
-from yapam.config import AmmoConfig, ConfigRequest
+from yapam.armory import Armory
+from yapam.config import AmmoConfig, ConfigRequest, JsonlRequestSource, RequestTable
 
 
 pytestmark = [pytest.mark.config]
@@ -51,6 +52,17 @@ def bad_config_file(tmpdir_factory):
     return fn
 
 
+@pytest.fixture
+def requests_file(tmpdir, config_request):
+    """Temporary JSONL requests file with 3 requests."""
+    fn = str(tmpdir.join('requests.jsonl'))
+    with open(fn, 'w', encoding='utf-8') as f:
+        for i in range(3):
+            f.write(json.dumps(dict(config_request, url='/auth/{}'.format(i))) + '\n')
+        f.write('\n')
+    return fn
+
+
 @pytest.mark.request
 class TestConfigRequest:
     """ConfigRequest test cases."""
@@ -60,6 +72,29 @@ class TestConfigRequest:
         request_instance = ConfigRequest(**config_request)
         assert isinstance(request_instance, ConfigRequest)
 
+    def test_bad_weight(self, config_request):
+        """Check that request weight should be a positive number."""
+        config_request['weight'] = 0
+        with pytest.raises(TypeError):
+            ConfigRequest(**config_request)
+
+    def test_bad_connection(self, config_request):
+        """Check that request connection should be one of connection profiles."""
+        config_request['connection'] = 'upgrade'
+        with pytest.raises(TypeError):
+            ConfigRequest(**config_request)
+
+    def test_literal(self, config_request, tmpdir):
+        """Check that literal request keeps ${...} as is and can not have a feed."""
+        config_request.update({'url': '/x?q=${env(HOME)}', 'body': {'id': '${seq()}'}, 'literal': True})
+        assert ConfigRequest(**config_request).generators == {}
+        table = RequestTable([dict(config_request, url='/a'), dict(config_request, url='/b', literal=False)])
+        assert (table[0].generators, list(table[1].generators)) == ({}, ['seq()'])
+        feed_file = tmpdir.join('users.csv')
+        feed_file.write('user_id\n1\n')
+        with pytest.raises(TypeError):
+            ConfigRequest(**dict(config_request, feed=str(feed_file)))
+
     def test_bad_request(self, bad_config_request):
         """Check that unexpected request structure not allowed."""
         try:
@@ -91,3 +126,96 @@ class TestAmmoConfig:
         """Check that template with config blueprint can be created."""
         AmmoConfig().create_template(temporary_json_file)
         assert True
+
+
+@pytest.mark.request
+class TestJsonlRequestSource:
+    """JsonlRequestSource test cases."""
+
+    def test_iter(self, requests_file):
+        """Check that requests are read on each iteration."""
+        source = JsonlRequestSource(requests_file)
+        assert [request.url for request in source] == ['/auth/0', '/auth/1', '/auth/2']
+        assert all(isinstance(request, ConfigRequest) for request in source)
+
+    def test_bad_line(self, requests_file):
+        """Check that bad request is reported with its line number."""
+        with open(requests_file, 'a', encoding='utf-8') as f:
+            f.write(json.dumps({'host': '127.0.0.1', 'url': '/', 'method': 'BAD'}) + '\n')
+        with pytest.raises(ValueError, match='requests.jsonl:5'):
+            list(JsonlRequestSource(requests_file))
+
+    def test_config(self, requests_file, tmpdir, temporary_ammo_file, logger):
+        """Check that REQUESTS_FILE replaces REQUESTS and ammo is generated from it."""
+        fn = str(tmpdir.join('cfg.json'))
+        data = AmmoConfig().template_blueprint
+        data['REQUESTS_FILE'] = requests_file
+        with open(fn, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        cfg = AmmoConfig(fn)
+        assert isinstance(cfg.requests, JsonlRequestSource)
+        armory = Armory(cfg.requests, temporary_ammo_file, logger)
+        assert armory.generate_ammo()
+        assert armory.stats['bullets'] == 3
+
+
+@pytest.mark.request
+class TestRequestTable:
+    """RequestTable test cases."""
+
+    @staticmethod
+    def raw_requests(tmpdir) -> list:
+        """Requests of a few shapes, with a data feed and generator expressions."""
+        feed_file = str(tmpdir.join('users.csv'))
+        with open(feed_file, 'w', encoding='utf-8') as f:
+            f.write('user_id\n1\n2\n')
+        requests = list()
+        for i in range(30):
+            requests.append({'host': '127.0.0.1', 'port': 8888, 'url': '/items/{}'.format(i),
+                             'method': 'POST' if i % 2 else 'GET', 'case': 'case_{}'.format(i % 3) if i % 5 else None,
+                             'extra_headers': {'X-Shard': str(i % 3)}, 'body': {'id': 1} if i % 2 else None})
+        requests.append({'host': '127.0.0.1', 'url': '/users/${user_id}', 'method': 'GET', 'feed': feed_file})
+        requests.append({'host': '127.0.0.1', 'url': '/orders', 'method': 'POST', 'body': {'id': '${seq()}'}})
+        return requests
+
+    def test_rows(self, tmpdir):
+        """Check that rows are the same as ConfigRequest instances and shapes are shared."""
+        raw_requests = self.raw_requests(tmpdir)
+        table = RequestTable(raw_requests)
+        assert len(table) == len(raw_requests)
+        assert len(table.shapes) == 6
+        assert sorted(table.requests) == [30, 31]
+        for row, raw_request in zip(table, raw_requests):
+            request = ConfigRequest(**raw_request)
+            assert isinstance(row, ConfigRequest)
+            # feeds and generators are compared by file path and expressions
+            assert dict(row.__dict__, feed=None, generators=list(row.generators)) == \
+                dict(request.__dict__, feed=None, generators=list(request.generators))
+            assert (row.feed is None) == (request.feed is None)
+        assert table[0].extra_headers is table[6].extra_headers
+        assert table[-1].generators
+
+    @pytest.mark.parametrize('bad_request', [{'url': '/', 'method': 'BAD'}, {'url': 1, 'method': 'GET'},
+                                             {'url': '/', 'method': 'GET', 'port': 8888.0},
+                                             {'url': '/', 'method': 'GET', 'headers': {}}])
+    def test_bad_request(self, bad_request):
+        """Check that each row is validated, even if its shape is known."""
+        table = RequestTable([{'host': '127.0.0.1', 'url': '/', 'method': 'GET', 'port': 8888}])
+        with pytest.raises(TypeError):
+            table.append(dict(bad_request, host='127.0.0.1'))
+        assert len(table) == 1
+
+    def test_generate_ammo(self, tmpdir, logger):
+        """Check that ammo of the table is the same as ammo of ConfigRequest list."""
+        raw_requests = self.raw_requests(tmpdir)
+        for total_bullets in (0, 100):
+            table_file, list_file = str(tmpdir.join('table')), str(tmpdir.join('list'))
+            Armory(RequestTable(raw_requests), table_file, logger, total_bullets=total_bullets).generate_ammo()
+            Armory([ConfigRequest(**raw_request) for raw_request in raw_requests], list_file, logger,
+                   total_bullets=total_bullets).generate_ammo()
+            with open(table_file, 'rb') as table_ammo, open(list_file, 'rb') as list_ammo:
+                assert table_ammo.read() == list_ammo.read()
+
+    def test_config(self, good_config_file):
+        """Check that AmmoConfig builds RequestTable."""
+        assert isinstance(AmmoConfig(good_config_file).requests, RequestTable)
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""Data feed test cases."""
+import json
+
+import pytest
+
+from yapam.feed import DataFeed, render
+
+
+pytestmark = [pytest.mark.feed]
+
+
+@pytest.fixture
+def csv_feed_file(tmpdir):
+    """Temporary CSV data feed."""
+    fn = str(tmpdir.join('users.csv'))
+    with open(fn, 'w', encoding='utf-8') as f:
+        f.write('user_id,token\n1,aaa\n2,bbb\n')
+    return fn
+
+
+@pytest.fixture
+def jsonl_feed_file(tmpdir):
+    """Temporary JSONL data feed."""
+    fn = str(tmpdir.join('users.jsonl'))
+    with open(fn, 'w', encoding='utf-8') as f:
+        f.write(json.dumps({'user_id': 1, 'token': 'aaa'}) + '\n\n')
+        f.write(json.dumps({'user_id': 2, 'token': 'bbb'}) + '\n')
+    return fn
+
+
+class TestDataFeed:
+    """DataFeed test cases."""
+
+    def test_csv_feed(self, csv_feed_file):
+        """Check that CSV rows are read as dicts."""
+        assert list(DataFeed(csv_feed_file)) == [{'user_id': '1', 'token': 'aaa'}, {'user_id': '2', 'token': 'bbb'}]
+
+    def test_jsonl_feed(self, jsonl_feed_file):
+        """Check that JSONL rows are read as dicts and empty lines are skipped."""
+        assert list(DataFeed(jsonl_feed_file)) == [{'user_id': 1, 'token': 'aaa'}, {'user_id': 2, 'token': 'bbb'}]
+
+    def test_bad_extension(self, temporary_json_file):
+        """Check that only CSV and JSONL feeds are allowed."""
+        with open(temporary_json_file, 'w') as f:
+            f.write('{}')
+        with pytest.raises(TypeError):
+            DataFeed(temporary_json_file)
+
+    def test_missing_file(self, tmpdir):
+        """Check that feed file should exist."""
+        with pytest.raises(FileNotFoundError):
+            DataFeed(str(tmpdir.join('missing.csv')))
+
+
+class TestRender:
+    """Placeholders rendering test cases."""
+
+    def test_render(self):
+        """Check that placeholders in nested values are replaced."""
+        row = {'user_id': 7, 'token': 'aaa'}
+        template = {'url': '/users/${user_id}?t=${token}', 'id': '${user_id}', 'list': ['${token}'], 'n': 1}
+        assert render(template, row) == {'url': '/users/7?t=aaa', 'id': 7, 'list': ['aaa'], 'n': 1}
+
+    def test_missing_column(self):
+        """Check that unknown placeholder raises ValueError."""
+        with pytest.raises(ValueError):
+            render('/users/${missing}', {'user_id': 1})
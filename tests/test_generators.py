@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""Value generators test cases."""
+import re
+import time
+from itertools import islice
+
+import pytest
+
+from yapam.config import ConfigRequest
+from yapam.feed import render
+from yapam.generators import ValueStream, compile_expression, compile_generators, find_expressions
+
+
+pytestmark = [pytest.mark.generators]
+
+UUID4 = re.compile(r'^[0-9a-f]{8}-[0-9a-f]{4}-4[0-9a-f]{3}-[89ab][0-9a-f]{3}-[0-9a-f]{12}$')
+
+
+def take(generators: dict, count: int, seed=0, batch_size: int = 3) -> list:
+    """First count rows of a value stream with small batches."""
+    return list(islice(ValueStream(generators, seed=seed, batch_size=batch_size), count))
+
+
+class TestGenerators:
+    """Generator expressions test cases."""
+
+    def test_find_expressions(self):
+        """Check that generator expressions are found in nested values and feed columns are skipped."""
+        value = {'id': '${seq()}', 'list': ['${uuid()}', '${user_id}'], 'n': 1}
+        assert find_expressions(value) == {'seq()', 'uuid()'}
+        assert find_expressions('/users/${randint(1, 10)}?t=${token}') == {'randint(1, 10)'}
+
+    def test_seq(self):
+        """Check that sequence continues between batches."""
+        rows = take(compile_generators('${seq()}', '${seq(100, 5)}'), 7)
+        assert [row['seq()'] for row in rows] == list(range(7))
+        assert [row['seq(100, 5)'] for row in rows] == list(range(100, 135, 5))
+
+    def test_lazy_batches(self):
+        """Check that batches grow from a small one and the stream counts taken rows."""
+        stream = ValueStream(compile_generators('${seq()}'), batch_size=1000)
+        assert [row['seq()'] for row in islice(stream, 5)] == list(range(5))
+        assert stream.position == 5
+        stream.skip(100)
+        assert next(stream)['seq()'] == 105
+        assert stream.position == 106
+
+    def test_randint(self):
+        """Check that random integers are in range and the same seed gives the same values."""
+        generators = compile_generators('${randint(1, 3)}')
+        values = [row['randint(1, 3)'] for row in take(generators, 100, seed=1)]
+        assert set(values) == {1, 2, 3}
+        assert values == [row['randint(1, 3)'] for row in take(generators, 100, seed=1)]
+        assert values != [row['randint(1, 3)'] for row in take(generators, 100, seed=2)]
+
+    def test_uuid(self):
+        """Check that uuid4 strings are valid and unique."""
+        values = [row['uuid()'] for row in take(compile_generators('${uuid()}'), 1000, batch_size=100)]
+        assert all(UUID4.match(value) for value in values)
+        assert len(set(values)) == len(values)
+
+    def test_timestamp(self):
+        """Check that timestamps are current."""
+        row = take(compile_generators('${timestamp()}', '${timestamp(ms)}'), 1)[0]
+        assert abs(row['timestamp()'] - time.time()) < 5
+        assert abs(row['timestamp(ms)'] / 1000 - time.time()) < 5
+
+    def test_choice(self, tmpdir):
+        """Check that tokens are picked from arguments or a file."""
+        tokens_file = tmpdir.join('tokens.txt')
+        tokens_file.write('aaa\nbbb\n\n')
+        expression = 'choice(@{})'.format(tokens_file)
+        rows = take(compile_generators('${choice(x, y)}', '${' + expression + '}'), 50)
+        assert {row['choice(x, y)'] for row in rows} == {'x', 'y'}
+        assert {row[expression] for row in rows} == {'aaa', 'bbb'}
+
+    @pytest.mark.parametrize('expression', ['unknown()', 'seq(a)', 'randint(5, 1)', 'randint(1)', 'uuid(1)',
+                                            'timestamp(h)', 'choice()'])
+    def test_bad_expression(self, expression):
+        """Check that bad expressions are not allowed."""
+        with pytest.raises(ValueError):
+            compile_expression(expression)
+
+    def test_render(self):
+        """Check that the same expression gives the same value in all fields of a bullet."""
+        row = take(compile_generators('${seq(7)}'), 1)[0]
+        assert render({'url': '/users/${seq(7)}', 'id': '${seq(7)}'}, row) == {'url': '/users/7', 'id': 7}
+
+    def test_config_request(self, config_request):
+        """Check that ConfigRequest compiles generators and reports bad expressions."""
+        config_request.update({'url': '/users/${seq()}', 'body': {'token': '${uuid()}'}})
+        assert set(ConfigRequest(**config_request).generators) == {'seq()', 'uuid()'}
+        config_request['url'] = '/users/${uuid(1)}'
+        with pytest.raises(TypeError):
+            ConfigRequest(**config_request)
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""HAR importer test cases."""
+import json
+
+import pytest
+
+from yapam.armory import Armory
+from yapam.har import HarImporter, iter_entries
+
+
+pytestmark = [pytest.mark.har]
+
+
+def har_entry(method: str, url: str, headers: dict = None, text: str = None,
+              mime_type: str = 'application/json') -> dict:
+    """HAR log entry."""
+    request = {'method': method, 'url': url,
+               'headers': [{'name': name, 'value': value} for name, value in (headers or dict()).items()]}
+    if text is not None:
+        request['postData'] = {'mimeType': mime_type, 'text': text}
+    return {'startedDateTime': '2020-10-10T13:55:36.000Z', 'request': request, 'response': {'status': 200}}
+
+
+@pytest.fixture
+def har_file(tmpdir):
+    """Temporary HAR file."""
+    entries = [
+        har_entry('GET', 'https://example.com/catalog?page=1',
+                  {':authority': 'example.com', 'Host': 'example.com', 'authorization': 'jwt 1', 'Cookie': 'a=1',
+                   'user-agent': 'browser/1.0'}),
+        har_entry('POST', 'http://127.0.0.1:8888/order', {'Content-Type': 'application/json'}, '{"item": 1}'),
+        har_entry('POST', 'http://127.0.0.1:8888/upload', text='a=1&b=2', mime_type='application/x-www-form-urlencoded'),
+        har_entry('CONNECT', 'https://example.com/'),
+    ]
+    data = {'log': {'version': '1.2', 'creator': {'name': 'test', 'version': '1'},
+                    'pages': [{'title': 'entries'}], 'entries': entries}}
+    fn = str(tmpdir.join('session.har'))
+    with open(fn, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2)
+    return fn
+
+
+class TestHarImporter:
+    """HarImporter test cases."""
+
+    def test_iter_entries(self, har_file):
+        """Check that entries are parsed incrementally even with a tiny read size."""
+        with open(har_file, encoding='utf-8') as f:
+            expected = json.load(f)['log']['entries']
+        assert list(iter_entries(har_file, read_size=7)) == expected
+
+    def test_broken_file(self, har_file):
+        """Check that truncated HAR file raises ValueError."""
+        with open(har_file, encoding='utf-8') as f:
+            data = f.read()
+        with open(har_file, 'w', encoding='utf-8') as f:
+            f.write(data[:len(data) // 2])
+        with pytest.raises(ValueError):
+            list(iter_entries(har_file))
+
+    def test_import(self, har_file):
+        """Check that entries are mapped to requests."""
+        importer = HarImporter(har_file, header_deny=['cookie'])
+        requests = list(importer)
+        assert [(request.method, request.host, request.port, request.url, request.case) for request in requests] == [
+            ('GET', 'example.com', 443, '/catalog?page=1', '/catalog'),
+            ('POST', '127.0.0.1', 8888, '/order', '/order'),
+            ('POST', '127.0.0.1', 8888, '/upload', '/upload')]
+        assert requests[0].extra_headers == {'Authorization': 'jwt 1', 'User-Agent': 'browser/1.0'}
+        assert (requests[1].body, requests[1].body_type) == ({'item': 1}, 'json')
+        assert (requests[2].body, requests[2].body_type) == (
+            {'text': 'a=1&b=2', 'content_type': 'application/x-www-form-urlencoded'}, 'raw')
+        assert (importer.imported, importer.skipped, importer.raw_bodies) == (3, 1, 1)
+
+    def test_header_allow(self, har_file):
+        """Check that only allowed headers are kept."""
+        requests = list(HarImporter(har_file, header_allow=['cookie'], url_pattern='^/catalog'))
+        assert len(requests) == 1
+        assert requests[0].extra_headers == {'Cookie': 'a=1'}
+
+    def test_generate_ammo(self, har_file, temporary_ammo_file, logger):
+        """Check that HAR file is converted to ammo."""
+        armory = Armory(HarImporter(har_file), temporary_ammo_file, logger)
+        assert armory.generate_ammo()
+        assert armory.stats['bullets'] == 3
+        with open(temporary_ammo_file, 'rb') as f:
+            ammo = f.read()
+        # imported headers replace default headers
+        assert ammo.count(b'User-Agent: browser/1.0\r\n') == 1
+        assert b'User-Agent: phantom' in ammo
+        assert b'Content-Type: application/x-www-form-urlencoded\r\nConnection: Close\r\nContent-Length: 7\r\n\r\na=1&b=2' in ammo
+
+    def test_literal(self, tmpdir):
+        """Check that generator expressions in recorded requests are kept as is."""
+        entries = [har_entry('POST', 'http://127.0.0.1/s/${seq()}?q=${env(HOME)}', {'X-Id': '${uuid()}'},
+                             '{"id": "${seq()}"}'),
+                   har_entry('POST', 'http://127.0.0.1/f', text='${choice(@/etc/passwd)}', mime_type='text/plain'),
+                   har_entry('GET', 'http://127.0.0.1:99999/')]
+        fn = str(tmpdir.join('session.har'))
+        with open(fn, 'w', encoding='utf-8') as f:
+            json.dump({'log': {'entries': entries}}, f)
+        importer = HarImporter(fn)
+        requests = list(importer)
+        assert (importer.imported, importer.skipped) == (2, 1)
+        assert requests[0].url == '/s/${seq()}?q=${env(HOME)}'
+        ammo_file = str(tmpdir.join('ammo'))
+        assert Armory(requests, ammo_file, None).generate_ammo()
+        with open(ammo_file, 'rb') as f:
+            ammo = f.read()
+        assert b'POST /s/${seq()}?q=${env(HOME)} HTTP/1.1' in ammo
+        assert b'X-Id: ${uuid()}' in ammo
+        assert b'{"id": "${seq()}"}' in ammo
+        assert b'${choice(@/etc/passwd)}' in ammo
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""Instrumentation test cases."""
+import json
+
+import pytest
+
+from yapam.armory import Armory
+from yapam.config import ConfigRequest
+from yapam.instrumentation import Instrumentation, NULL_INSTRUMENTATION
+
+
+pytestmark = [pytest.mark.instrumentation]
+
+
+class TestInstrumentation:
+    """Instrumentation test cases."""
+
+    def test_phase(self):
+        """Check that time of the same phase is summed up."""
+        instrumentation = Instrumentation()
+        with instrumentation.phase('config'):
+            pass
+        instrumentation.add_time('config', 1.0)
+        assert instrumentation.report()['phases']['config'] >= 1.0
+
+    def test_null_instrumentation(self):
+        """Check that disabled instrumentation collects nothing."""
+        with NULL_INSTRUMENTATION.phase('config'):
+            NULL_INSTRUMENTATION.count('case', 10, 1.0)
+        assert not NULL_INSTRUMENTATION.enabled
+        assert NULL_INSTRUMENTATION.report() == {'phases': {}, 'cases': {}}
+
+    def test_generate_ammo(self, logger, temporary_ammo_file, config_request, tmpdir):
+        """Check phases and per-case counters of an instrumented run."""
+        requests = [ConfigRequest(**dict(config_request, case='first')) for __ in range(3)]
+        requests.append(ConfigRequest(**dict(config_request, case='second')))
+        instrumentation = Instrumentation()
+        armory = Armory(requests, temporary_ammo_file, logger, instrumentation=instrumentation)
+        assert armory.generate_ammo()
+
+        report_file = str(tmpdir.join('report.json'))
+        instrumentation.save(report_file, stats=armory.stats)
+        with open(report_file, 'r', encoding='utf-8') as f:
+            report = json.load(f)
+        assert set(report['phases']) == {'generate', 'expand', 'render', 'write'}
+        assert report['cases']['first']['bullets'] == 3
+        assert report['cases']['second']['bullets'] == 1
+        assert sum(case['bytes'] for case in report['cases'].values()) == report['stats']['bytes']
+
+    @pytest.mark.parametrize('options', [{'workers': 2}, {'workers': 2, 'ammo_type': 'uripost'},
+                                         {'shards': 2}, {'shards': 2, 'workers': 2}, {'cache_dir': 'cache'}])
+    def test_counters(self, logger, config_request, tmpdir, options):
+        """Check per-case counters of parallel, sharded and cached runs."""
+        requests = [ConfigRequest(**dict(config_request, case='first', url='/{}'.format(i))) for i in range(30)]
+        requests.append(ConfigRequest(**dict(config_request, case='second')))
+        if 'cache_dir' in options:
+            options = dict(options, cache_dir=str(tmpdir.join(options['cache_dir'])))
+        # the second run of a cached generation reuses all segments
+        for run in range(2 if 'cache_dir' in options else 1):
+            instrumentation = Instrumentation()
+            armory = Armory(requests, str(tmpdir.join('ammo{}'.format(run))), logger, chunk_size=4,
+                            instrumentation=instrumentation, **options)
+            assert armory.generate_ammo()
+            report = instrumentation.report()
+            assert report['cases']['first']['bullets'] == 30
+            assert report['cases']['second']['bullets'] == 1
+            assert sum(case['bytes'] for case in report['cases'].values()) == armory.stats['bytes']
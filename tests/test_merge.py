@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+"""Ammo merge test cases."""
+import gzip
+
+import pytest
+
+from yapam.merge import AmmoMerger, interleave, shuffle_window
+from yapam.reader import AmmoReader
+from yapam.validator import AmmoValidator
+
+
+pytestmark = [pytest.mark.merge]
+
+
+def bullet(case: str, number: int) -> bytes:
+    """Encoded bullet of a case."""
+    request = 'GET /{}/{} HTTP/1.1\r\nHost: 127.0.0.1\r\n'.format(case, number).encode('utf-8')
+    return b'%d %b\n%b\r\n\r\n' % (len(request), case.encode('utf-8'), request)
+
+
+@pytest.fixture
+def ammo_files(tmpdir):
+    """Ammo files with 30 bullets of case a and 10 bullets of case b."""
+    file_paths = list()
+    for case, count in (('a', 30), ('b', 10)):
+        file_path = tmpdir.join(case)
+        file_path.write_binary(b''.join(bullet(case, number) for number in range(count)))
+        file_paths.append(str(file_path))
+    return file_paths
+
+
+def read_cases(file_path: str) -> str:
+    """Cases of the ammo file bullets as a string."""
+    with AmmoReader(file_path, index_path=file_path + '.test.idx') as reader:
+        return ''.join(item.case for item in reader)
+
+
+class TestHelpers:
+    """Merge helpers test cases."""
+
+    def test_interleave(self):
+        """Check that items are taken by ratios and exhausted iterables are skipped."""
+        items = ''.join(item for __, item in interleave(['aaaaaaaa', 'bb', 'cccc'], [2, 1, 1]))
+        assert items == 'abcaabcaacaaca'
+
+    def test_shuffle_window(self):
+        """Check that all items are kept and the same seed gives the same order."""
+        items = list(shuffle_window(range(1000), 50, seed=1))
+        assert sorted(items) == list(range(1000))
+        assert items != list(range(1000))
+        assert items == list(shuffle_window(range(1000), 50, seed=1))
+        # items are not taken before they get to the window
+        assert all(item < position + 50 for position, item in enumerate(items))
+
+
+class TestAmmoMerger:
+    """AmmoMerger test cases."""
+
+    def test_concat(self, ammo_files, tmpdir):
+        """Check that inputs are copied one after another."""
+        output = str(tmpdir.join('merged'))
+        stats = AmmoMerger(ammo_files).merge(output)
+        assert stats['bullets'] == 40
+        assert stats['inputs'] == [{'file': ammo_files[0], 'bullets': 30}, {'file': ammo_files[1], 'bullets': 10}]
+        with open(output, 'rb') as merged, open(ammo_files[0], 'rb') as first, open(ammo_files[1], 'rb') as second:
+            assert merged.read() == first.read() + second.read()
+
+    def test_interleave(self, ammo_files, tmpdir):
+        """Check that bullets are interleaved by ratios and bytes are unchanged."""
+        output = str(tmpdir.join('merged.gz'))
+        stats = AmmoMerger(ammo_files, mode='interleave', ratios=[3, 1]).merge(output)
+        assert stats['bullets'] == 40
+        with gzip.open(output, 'rb') as f:
+            data = f.read()
+        assert data.startswith(bullet('a', 0) + bullet('a', 1) + bullet('b', 0) + bullet('a', 2))
+        plain = str(tmpdir.join('merged'))
+        with open(plain, 'wb') as f:
+            f.write(data)
+        assert read_cases(plain) == 'aaba' * 10
+        assert AmmoValidator(plain).validate()['valid']
+
+    def test_shuffle(self, ammo_files, tmpdir):
+        """Check that shuffled ammo has all bullets and the same seed gives the same file."""
+        first, second = str(tmpdir.join('first')), str(tmpdir.join('second'))
+        for output in (first, second):
+            AmmoMerger(ammo_files, window=8, seed=3).merge(output)
+        with open(first, 'rb') as f, open(second, 'rb') as g:
+            assert f.read() == g.read()
+        cases = read_cases(first)
+        assert sorted(cases) == sorted('a' * 30 + 'b' * 10)
+        assert cases != 'a' * 30 + 'b' * 10
+
+    def test_broken_input(self, ammo_files, tmpdir):
+        """Check that broken framing is reported with the file path."""
+        with open(ammo_files[1], 'ab') as f:
+            f.write(b'100 b\nGET /')
+        with pytest.raises(ValueError, match=ammo_files[1]):
+            AmmoMerger(ammo_files, mode='interleave').merge(str(tmpdir.join('merged')))
+
+    def test_output_is_input(self, ammo_files):
+        """Check that input file can not be overwritten."""
+        with pytest.raises(ValueError):
+            AmmoMerger(ammo_files).merge(ammo_files[0])
+
+    @pytest.mark.parametrize('kwargs', [{'mode': 'zip'}, {'ratios': [1]}, {'ratios': [1, 0]}, {'window': -1}])
+    def test_bad_parameters(self, ammo_files, kwargs):
+        """Check merge parameters validation."""
+        with pytest.raises(ValueError):
+            AmmoMerger(ammo_files, **kwargs)
@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+"""Weighted request mix test cases."""
+from collections import Counter
+
+import pytest
+
+from yapam.mix import WeightedSampler
+
+
+pytestmark = [pytest.mark.mix]
+
+
+class TestWeightedSampler:
+    """WeightedSampler test cases."""
+
+    def test_distribution(self):
+        """Check that sampled indexes follow the weights."""
+        counter = Counter(WeightedSampler([70, 25, 5], seed=1).sample(100000))
+        assert abs(counter[0] / 100000 - 0.70) < 0.01
+        assert abs(counter[1] / 100000 - 0.25) < 0.01
+        assert abs(counter[2] / 100000 - 0.05) < 0.01
+
+    def test_seed(self):
+        """Check that the same seed gives the same sequence."""
+        first = list(WeightedSampler([1, 2, 3], seed=7).sample(1000))
+        assert first == list(WeightedSampler([1, 2, 3], seed=7).sample(1000))
+        assert first != list(WeightedSampler([1, 2, 3], seed=8).sample(1000))
+
+    @pytest.mark.parametrize('weights', [[], [1, 0], [1, -1]])
+    def test_bad_weights(self, weights):
+        """Check that weights should be positive."""
+        with pytest.raises(ValueError):
+            WeightedSampler(weights)
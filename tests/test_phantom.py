@@ -1,8 +1,13 @@
 # -*- coding: utf-8 -*-
 """Phantom test cases."""
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
 import pytest
 
-from yapam.phantom import PhantomAmmo
+from yapam.config import ConfigRequest
+from yapam.phantom import (PhantomAmmo, PhantomRenderer, bullet_headers, compile_template, encode_body,
+                           header_profile)
 
 
 pytestmark = [pytest.mark.phantom]
@@ -213,3 +218,131 @@ class TestPhantomAmmoWithBody:
         """Check that bullet property converted as expected."""
         assert self.convert_bullet_with_body_to_dict(
             phantom_ammo_with_body_inst.bullet) == phantom_bullet_with_body_dict
+
+
+class TestPhantomTemplate:
+    """Precompiled Phantom template test cases."""
+
+    @pytest.mark.parametrize('body', [{}, {'username': 'admin', 'password': 'admin'}])
+    def test_render(self, phantom_ammo_dict, body):
+        """Check that compiled template renders the same bullet as PhantomAmmo."""
+        phantom_ammo_dict.update({'body': body, 'log': None, 'extra_headers': {'authorization': 'token'}})
+        template = compile_template(phantom_ammo_dict['method'], phantom_ammo_dict['host'], phantom_ammo_dict['port'],
+                                    (('authorization', 'token'),))
+        bullet = template.render(phantom_ammo_dict['url'], phantom_ammo_dict['case'], encode_body(body))
+        assert bullet == PhantomAmmo(**phantom_ammo_dict).bullet.encode('utf-8')
+
+    def test_non_ascii_body(self, phantom_ammo_dict):
+        """Check that request and content lengths are measured in bytes."""
+        body = {'username': 'админ'}
+        phantom_ammo_dict.update({'method': 'POST', 'body': body, 'log': None, 'extra_headers': {}})
+        template = compile_template(phantom_ammo_dict['method'], phantom_ammo_dict['host'], phantom_ammo_dict['port'],
+                                    ())
+        bullet = template.render(phantom_ammo_dict['url'], phantom_ammo_dict['case'], encode_body(body))
+        assert bullet == PhantomAmmo(**phantom_ammo_dict).bullet.encode('utf-8')
+
+        length_line, request = bullet.split(b'\n', 1)
+        assert int(length_line.split(b' ')[0]) == len(request) - len(b'\r\n\r\n')
+        encoded_body = encode_body(body)
+        assert b'Content-Length: %d\r\n' % len(encoded_body) in request
+        assert request.endswith(encoded_body + b'\r\n\r\n')
+
+        template = compile_template('POST', phantom_ammo_dict['host'], phantom_ammo_dict['port'], ())
+        assert template.render(phantom_ammo_dict['url'], phantom_ammo_dict['case'], encoded_body) == bullet
+
+    def test_cache(self):
+        """Check that template is compiled once for the same request shape."""
+        first = compile_template('GET', '127.0.0.1', 80, (('X-Token', '1'),))
+        assert compile_template('GET', '127.0.0.1', 80, (('X-Token', '1'),)) is first
+        assert compile_template('GET', '127.0.0.1', 80, (('X-Token', '2'),)) is not first
+
+    def test_dynamic_headers(self):
+        """Check that values of dynamic headers are spliced in the same places as compiled values."""
+        template = compile_template('POST', '127.0.0.1', 80, (('X-Id', None), ('user-agent', None), ('X-Token', '1')))
+        expected = compile_template('POST', '127.0.0.1', 80, (('X-Id', '7'), ('user-agent', 'app'), ('X-Token', '1')))
+        assert template.render('/', 'case', b'{}', ('7', 'app')) == expected.render('/', 'case', b'{}')
+        assert template.render_parts('/', 'case', (b'{}',), 2, ('7', 'app')) == \
+            expected.render_parts('/', 'case', (b'{}',), 2)
+
+
+class TestPhantomRenderer:
+    """Stateless renderer test cases."""
+
+    def test_phantom_ammo_side_effects(self, phantom_ammo_dict):
+        """Check that PhantomAmmo changes neither extra_headers nor class default headers."""
+        extra_headers = {'Authorization': 'token'}
+        phantom_ammo_dict['extra_headers'] = extra_headers
+        PhantomAmmo(**phantom_ammo_dict)
+        assert extra_headers == {'Authorization': 'token'}
+        assert PhantomAmmo.default_headers['Host'] is None
+
+    def test_render(self, phantom_ammo_with_body_dict):
+        """Check that renderer output is the same as PhantomAmmo output."""
+        expected = PhantomAmmo(**phantom_ammo_with_body_dict).bullet.encode('utf-8')
+        del phantom_ammo_with_body_dict['log']
+        assert PhantomRenderer().render(**phantom_ammo_with_body_dict) == expected
+
+    def test_connection_profile(self, phantom_ammo_with_body_dict):
+        """Check that connection and default headers are the same in PhantomAmmo and renderer."""
+        phantom_ammo_with_body_dict.update({'connection': 'keep-alive',
+                                            'default_headers': {'user-agent': 'app/1.0', 'Accept': None}})
+        expected = PhantomAmmo(**phantom_ammo_with_body_dict).bullet.encode('utf-8')
+        del phantom_ammo_with_body_dict['log']
+        bullet = PhantomRenderer().render(**phantom_ammo_with_body_dict)
+        assert bullet == expected
+        assert b'Connection: Keep-Alive\r\n' in bullet
+        assert b'User-Agent: app/1.0\r\n' in bullet
+        assert b'Accept:' not in bullet
+
+    def test_connection_default_headers(self):
+        """Check that Connection from default headers wins over the connection profile."""
+        assert dict(header_profile('keep-alive'))['Connection'] == 'Keep-Alive'
+        assert dict(header_profile('close', (('connection', 'Upgrade'),)))['Connection'] == 'Upgrade'
+        assert 'Connection' not in dict(header_profile('keep-alive', (('Connection', None),)))
+        bullet = PhantomRenderer.render('GET', '/', '127.0.0.1', connection='close',
+                                        default_headers={'Connection': None})
+        assert b'Connection:' not in bullet
+
+    def test_extra_headers_override(self):
+        """Check that extra headers replace default headers in any letter case."""
+        headers = bullet_headers('127.0.0.1', 80, (('user-agent', 'app/1.0'), ('ACCEPT', 'text/html')))
+        assert headers == [('User-Agent', 'app/1.0'), ('Accept', 'text/html'), ('Host', '127.0.0.1:80'),
+                           ('Content-Type', 'application/json'), ('Connection', 'Close')]
+        bullet = PhantomRenderer.render('GET', '/', '127.0.0.1', extra_headers={'user-agent': 'app/1.0'})
+        assert bullet.count(b'User-Agent:') == 1
+
+    def test_request_profile(self, config_request):
+        """Check that request connection and default headers override the profile."""
+        profile = header_profile('keep-alive', (('User-Agent', 'app/1.0'),))
+        bullet = PhantomRenderer.render_request(ConfigRequest(**config_request), profile)
+        assert b'Connection: Keep-Alive\r\n' in bullet
+        assert b'User-Agent: app/1.0\r\n' in bullet
+        config_request.update({'connection': 'close', 'default_headers': {'X-Client': 'tank'}})
+        bullet = PhantomRenderer.render_request(ConfigRequest(**config_request), profile)
+        assert b'Connection: Close\r\n' in bullet
+        assert b'User-Agent: app/1.0\r\nAccept: */*\r\nContent-Type: application/json\r\n' in bullet
+        assert b'X-Client: tank\r\n' in bullet
+
+    def test_bad_connection(self):
+        """Check that connection should be one of connection profiles."""
+        with pytest.raises(ValueError):
+            header_profile('upgrade')
+
+    def test_contention(self):
+        """Check that concurrent rendering for different hosts gives the same bullets as sequential one."""
+        renderer = PhantomRenderer()
+        params = [{'method': 'POST', 'url': '/auth/{}'.format(i), 'host': '10.0.0.{}'.format(i % 7), 'port': 80 + i % 3,
+                   'extra_headers': {'X-Id': str(i)}, 'body': {'id': i}} for i in range(2000)]
+        expected = [PhantomAmmo(case=param['url'], **param).bullet.encode('utf-8') for param in params]
+
+        switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        try:
+            with ThreadPoolExecutor(max_workers=16) as pool:
+                for __ in range(3):
+                    assert list(pool.map(lambda param: renderer.render(**param), params)) == expected
+                    assert list(pool.map(lambda param: PhantomAmmo(case=param['url'], **param).bullet.encode('utf-8'),
+                                         params)) == expected
+        finally:
+            sys.setswitchinterval(switch_interval)
+        assert all(param['extra_headers'] == {'X-Id': param['url'].rsplit('/', 1)[1]} for param in params)
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""Ammo reader test cases."""
+import os
+
+import pytest
+
+from yapam.armory import Armory
+from yapam.config import ConfigRequest
+from yapam.reader import AmmoReader, iter_frames, parse_frame
+
+
+pytestmark = [pytest.mark.reader]
+
+
+@pytest.fixture
+def ammo_file(tmpdir, config_request):
+    """Ammo file with 50 bullets, odd bullets without body."""
+    requests = list()
+    for i in range(50):
+        config_request.update({'url': '/auth/{}'.format(i), 'case': 'case_{}'.format(i % 3),
+                               'method': 'POST' if i % 2 else 'GET', 'body': config_request['body'] if i % 2 else {}})
+        requests.append(ConfigRequest(**config_request))
+    file_path = str(tmpdir.join('ammo'))
+    Armory(requests=requests, ammo_file_path=file_path, logger=None).generate_ammo()
+    return file_path
+
+
+class TestFraming:
+    """Bullet framing parser test cases."""
+
+    def test_parse_frame(self):
+        """Check that framing is parsed and separators are skipped."""
+        data = b'5 case\nGET /\r\n\r\n3 x\nabc'
+        frames = list(iter_frames(data))
+        assert [(frame.case, data[frame.start:frame.end]) for frame in frames] == [('case', b'GET /'), ('x', b'abc')]
+        assert frames[1].offset == frames[0].next
+
+    @pytest.mark.parametrize('data', [b'5 case', b'x case\nGET /', b'50 case\nGET /'])
+    def test_bad_frame(self, data):
+        """Check that broken framing raises ValueError."""
+        with pytest.raises(ValueError):
+            parse_frame(data, 0)
+
+
+class TestAmmoReader:
+    """AmmoReader test cases."""
+
+    def test_random_access(self, ammo_file):
+        """Check bullets access by number and slice."""
+        with AmmoReader(ammo_file) as reader:
+            assert len(reader) == 50
+            bullet = reader[7]
+            assert bullet.case == 'case_1'
+            assert bytes(bullet.request).startswith(b'POST /auth/7 HTTP/1.1')
+            assert [bullet.case for bullet in reader[3:6]] == ['case_0', 'case_1', 'case_2']
+            assert bytes(reader[-1].request).startswith(b'POST /auth/49 HTTP/1.1')
+        # bullets do not hold the mapped file
+        assert bullet.request.startswith(b'POST /auth/7 HTTP/1.1')
+
+    def test_index_sidecar(self, ammo_file):
+        """Check that index is saved and reused."""
+        with AmmoReader(ammo_file) as reader:
+            index = reader.index
+        assert os.path.isfile(ammo_file + '.idx')
+        with AmmoReader(ammo_file) as reader:
+            assert reader.load_index() == index
+
+    @pytest.mark.parametrize('index_path', ['missing/ammo.idx', 'directory'])
+    def test_index_not_saved(self, ammo_file, tmpdir, index_path):
+        """Check that index is kept in memory if the sidecar file can not be written."""
+        tmpdir.mkdir('directory')
+        with AmmoReader(ammo_file, index_path=str(tmpdir.join(index_path))) as reader:
+            assert len(reader) == 50
+            assert reader[49].case
+            assert not reader.save_index()
+        # a partially written sidecar is removed
+        assert not tmpdir.join(index_path + '.tmp').check()
+
+    def test_index_outdated(self, ammo_file):
+        """Check that index is not reused when the ammo file is changed without changing its size."""
+        with AmmoReader(ammo_file) as reader:
+            assert len(reader) == 50
+        with open(ammo_file, 'rb') as f:
+            data = f.read()
+        with open(ammo_file, 'wb') as f:
+            f.write(data.replace(b'case_0', b'case_9'))
+        os.utime(ammo_file, ns=(0, 0))
+        with AmmoReader(ammo_file) as reader:
+            assert reader.load_index() is None
+            assert reader[0].case == 'case_9'
+
+    def test_write_slice(self, ammo_file, tmpdir):
+        """Check that slice of bullets is saved as a valid ammo file."""
+        slice_file = str(tmpdir.join('slice'))
+        with AmmoReader(ammo_file) as reader:
+            reader.write_slice(slice_file, 10, 20)
+            expected = [(bullet.case, bytes(bullet.request)) for bullet in reader[10:20]]
+        with AmmoReader(slice_file) as reader:
+            assert [(bullet.case, bytes(bullet.request)) for bullet in reader] == expected
+
+    def test_sample(self, ammo_file):
+        """Check that sample is reproducible with a seed."""
+        with AmmoReader(ammo_file) as reader:
+            first = [bullet.offset for bullet in reader.sample(5, seed=1)]
+            assert first == [bullet.offset for bullet in reader.sample(5, seed=1)]
+            assert first == sorted(first)
+
+    def test_empty_file(self, tmpdir):
+        """Check that empty file has no bullets."""
+        file_path = str(tmpdir.join('empty'))
+        open(file_path, 'wb').close()
+        with AmmoReader(file_path) as reader:
+            assert len(reader) == 0
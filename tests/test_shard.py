@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""Sharded output test cases."""
+import json
+
+import pytest
+
+from yapam.shard import ShardedWriter, manifest_path, shard_path
+
+
+pytestmark = [pytest.mark.shard]
+
+BULLETS = [('case_{}'.format(i % 3), b'x' * (10 + i % 7 * 10)) for i in range(300)]
+
+
+def write_bullets(file_path: str, shards: int, strategy: str) -> ShardedWriter:
+    """Write BULLETS to shards."""
+    with ShardedWriter(file_path, shards, strategy, buffer_size=64) as writer:
+        for case, bullet in BULLETS:
+            writer.write(writer.pick(case), bullet, case)
+    return writer
+
+
+class TestShardedWriter:
+    """ShardedWriter test cases."""
+
+    def test_shard_path(self):
+        """Check that compression extension is kept."""
+        assert shard_path('ammo', 1) == 'ammo.1'
+        assert shard_path('/tmp/ammo.gz', 0) == '/tmp/ammo.0.gz'
+
+    def test_round_robin(self, tmpdir):
+        """Check that bullets are distributed one by one and manifest is saved."""
+        file_path = str(tmpdir.join('ammo'))
+        writer = write_bullets(file_path, 3, 'round-robin')
+        with open(manifest_path(file_path), 'r', encoding='utf-8') as manifest_file:
+            manifest = json.load(manifest_file)
+        assert manifest == writer.manifest
+        assert manifest['strategy'] == 'round-robin'
+        assert [shard['bullets'] for shard in manifest['shards']] == [100, 100, 100]
+        with open(shard_path(file_path, 1), 'rb') as f:
+            assert f.read() == b''.join(bullet for __, bullet in BULLETS[1::3])
+        assert writer.stats['bullets'] == len(BULLETS)
+        assert writer.stats['bytes'] == sum(len(bullet) for __, bullet in BULLETS)
+
+    def test_byte_balanced(self, tmpdir):
+        """Check that shards have almost the same number of bytes."""
+        writer = write_bullets(str(tmpdir.join('ammo')), 4, 'byte-balanced')
+        shard_bytes = [shard['bytes'] for shard in writer.manifest['shards']]
+        assert sum(shard_bytes) == writer.stats['bytes']
+        assert max(shard_bytes) - min(shard_bytes) <= 70
+
+    def test_byte_balanced_index(self, tmpdir):
+        """Check that bytes are charged to the shard written, not to the picked one."""
+        with ShardedWriter(str(tmpdir.join('ammo')), 3, 'byte-balanced') as writer:
+            assert writer.pick('case') == 0
+            for __ in range(10):
+                writer.write(2, b'x' * 100, 'case')
+            writer.write(0, b'x' * 10, 'case')
+            assert writer.pick('case') == 1
+            writer.write(1, b'x' * 20, 'case')
+            assert writer.pick('case') == 0
+        assert [shard['bytes'] for shard in writer.manifest['shards']] == [10, 20, 1000]
+
+    def test_hash_by_case(self, tmpdir):
+        """Check that all bullets of a case are in one shard."""
+        writer = write_bullets(str(tmpdir.join('ammo')), 2, 'hash-by-case')
+        cases = [set(shard['cases']) for shard in writer.manifest['shards']]
+        assert not cases[0] & cases[1]
+        assert cases[0] | cases[1] == {'case_0', 'case_1', 'case_2'}
+
+    @pytest.mark.parametrize('shards, strategy', [(0, 'round-robin'), (2, 'random')])
+    def test_bad_parameters(self, tmpdir, shards, strategy):
+        """Check that shards and strategy are checked."""
+        with pytest.raises(ValueError):
+            ShardedWriter(str(tmpdir.join('ammo')), shards, strategy)
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""URI-style and URIPOST ammo test cases."""
+import pytest
+
+from yapam.config import ConfigRequest
+from yapam.uri import UriPostRenderer, UriRenderer, request_shape
+
+
+pytestmark = [pytest.mark.uri]
+
+HEADER_LINES = (b'[Host: 127.0.0.1:8888]\n'
+                b'[User-Agent: phantom]\n'
+                b'[Accept: */*]\n'
+                b'[Content-Type: application/json]\n'
+                b'[Connection: Close]\n')
+
+
+@pytest.fixture
+def get_request():
+    """GET request without body."""
+    return ConfigRequest(host='127.0.0.1', port=8888, url='/catalog?page=1', method='GET', case='catalog')
+
+
+class TestUriRenderer:
+    """UriRenderer test cases."""
+
+    def test_render(self, get_request):
+        """Check that headers are written once for requests of the same shape."""
+        renderer = UriRenderer()
+        assert renderer.render_request(get_request) == HEADER_LINES + b'/catalog?page=1 catalog\n'
+        assert renderer.render_request(get_request) == b'/catalog?page=1 catalog\n'
+
+    def test_changed_headers(self, get_request):
+        """Check that only changed headers are written again."""
+        renderer = UriRenderer(request_shape(get_request))
+        other = ConfigRequest(host='127.0.0.2', port=8888, url='/', method='GET')
+        assert renderer.render_request(other) == b'[Host: 127.0.0.2:8888]\n/ /\n'
+
+    def test_removed_headers(self, get_request):
+        """Check that headers can not be removed."""
+        other = ConfigRequest(host='127.0.0.1', port=8888, url='/', method='GET', extra_headers={'X-Id': '1'})
+        renderer = UriRenderer(request_shape(other))
+        with pytest.raises(ValueError, match='X-Id'):
+            renderer.render_request(get_request)
+
+    def test_unsupported_requests(self, config_request):
+        """Check that POST and requests with body are not supported."""
+        with pytest.raises(ValueError):
+            UriRenderer().render_request(ConfigRequest(**config_request))
+        config_request['method'] = 'GET'
+        with pytest.raises(ValueError):
+            UriRenderer().render_request(ConfigRequest(**config_request))
+
+
+class TestUriPostRenderer:
+    """UriPostRenderer test cases."""
+
+    def test_render(self, config_request):
+        """Check that body length is counted in bytes and body follows the uri line."""
+        config_request['body'] = {'name': 'ё'}
+        bullet = UriPostRenderer().render_request(ConfigRequest(**config_request))
+        assert bullet == HEADER_LINES + b'18 /auth /auth\n{"name": "\\u0451"}\n'
+
+    def test_get(self, get_request):
+        """Check that only POST requests are supported."""
+        with pytest.raises(ValueError):
+            UriPostRenderer().render_request(get_request)
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""Ammo validator test cases."""
+import re
+
+import pytest
+
+from yapam.armory import Armory
+from yapam.config import ConfigRequest
+from yapam.reader import iter_frames
+from yapam.validator import AmmoValidator
+
+
+pytestmark = [pytest.mark.validator]
+
+
+@pytest.fixture
+def ammo_file(tmpdir, config_request):
+    """Valid ammo file: 3 POST bullets and 2 GET bullets."""
+    requests = [ConfigRequest(**dict(config_request, case='post', body={'username': 'админ'})) for __ in range(3)]
+    requests += [ConfigRequest(**dict(config_request, case='get', method='GET', body={})) for __ in range(2)]
+    file_path = str(tmpdir.join('ammo'))
+    Armory(requests=requests, ammo_file_path=file_path, logger=None).generate_ammo()
+    return file_path
+
+
+class TestAmmoValidator:
+    """AmmoValidator test cases."""
+
+    def test_valid_file(self, ammo_file):
+        """Check report of a valid file."""
+        report = AmmoValidator(ammo_file).validate()
+        assert report['valid']
+        assert report['bullets'] == 5
+        assert report['cases']['post']['bullets'] == 3
+        assert report['cases']['get']['bullets'] == 2
+        assert sum(report['cases']['post']['histogram'].values()) == 3
+
+    def test_bad_content_length(self, ammo_file):
+        """Check that wrong Content-Length is reported with the bullet offset."""
+        with open(ammo_file, 'rb') as f:
+            data = f.read()
+        # same number of digits, so the bullet framing is not broken
+        with open(ammo_file, 'wb') as f:
+            f.write(re.sub(rb'Content-Length: (\d+)', lambda m: b'Content-Length: ' + b'9' * len(m.group(1)), data,
+                           count=1))
+        report = AmmoValidator(ammo_file).validate()
+        assert not report['valid']
+        assert report['errors_total'] == 1
+        assert report['errors'][0]['offset'] == 0
+        assert report['bullets'] == 5
+
+    def test_broken_framing(self, ammo_file):
+        """Check that broken request length stops validation."""
+        with open(ammo_file, 'ab') as f:
+            f.write(b'1000 broken\nGET / HTTP/1.1\r\n')
+        report = AmmoValidator(ammo_file).validate()
+        assert not report['valid']
+        assert report['bullets'] == 5
+        assert 'longer than the rest of the file' in report['errors'][0]['error']
+
+    def test_over_declared_length(self, ammo_file):
+        """Check that request length covering the separator is reported."""
+        with open(ammo_file, 'rb') as f:
+            data = f.read()
+        # the first GET bullet is valid HTTP even with the separator included
+        frame = list(iter_frames(data))[3]
+        header = b'%d get\n' % (frame.end - frame.start + 4)
+        with open(ammo_file, 'wb') as f:
+            f.write(data[:frame.offset] + header + data[frame.start:])
+        report = AmmoValidator(ammo_file).validate()
+        assert not report['valid']
+        assert report['bullets'] == 3
+        assert 'is not followed by' in report['errors'][0]['error']
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""Ammo writer test cases."""
+import gzip
+import logging
+import lzma
+import os
+import socket
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from yapam.writer import AmmoWriter, compress_block, debug_enabled, is_stream
+
+
+pytestmark = [pytest.mark.writer]
+
+
+def read_fifo(file_path: str) -> bytes:
+    """Read FIFO till the writer closes it."""
+    with open(file_path, 'rb') as f:
+        return f.read()
+
+
+def read_socket(server: socket.socket) -> bytes:
+    """Accept one connection and read till the writer closes it."""
+    connection, __ = server.accept()
+    with connection:
+        return b''.join(iter(lambda: connection.recv(65536), b''))
+
+
+class TestAmmoWriter:
+    """AmmoWriter test cases."""
+
+    def test_write(self, temporary_ammo_file):
+        """Check that all bullets are written and counted."""
+        bullets = [b'first bullet\n', b'second bullet\n', 'буллет\n'.encode('utf-8')]
+        with AmmoWriter(temporary_ammo_file, buffer_size=16) as writer:
+            for bullet in bullets:
+                writer.write(bullet)
+
+        with open(temporary_ammo_file, 'rb') as f:
+            assert f.read() == b''.join(bullets)
+        assert writer.stats['bullets'] == len(bullets)
+        assert writer.stats['bytes'] == sum(len(bullet) for bullet in bullets)
+
+    def test_large_write(self, temporary_ammo_file):
+        """Check that data larger than the buffer is written as is."""
+        data = memoryview(b'x' * 100)
+        with AmmoWriter(temporary_ammo_file, buffer_size=16) as writer:
+            writer.write(b'small')
+            writer.write(data)
+            writer.write(data)
+
+        with open(temporary_ammo_file, 'rb') as f:
+            assert f.read() == b'small' + bytes(data) * 2
+        assert writer.stats['bytes'] == 205
+
+    @pytest.mark.parametrize('compression,workers', [('gzip', 1), ('gzip', 3), ('xz', 1), ('xz', 3)])
+    def test_compression(self, tmpdir, compression, workers):
+        """Check that compressed output (single or parallel) is decompressed to the original data."""
+        file_path = str(tmpdir.join('ammo'))
+        bullets = [b'bullet number %d\n' % i for i in range(1000)]
+        with AmmoWriter(file_path, buffer_size=1024, compression=compression, compression_workers=workers) as writer:
+            for bullet in bullets:
+                writer.write(bullet)
+
+        decompress = gzip.decompress if compression == 'gzip' else lzma.decompress
+        with open(file_path, 'rb') as f:
+            assert decompress(f.read()) == b''.join(bullets)
+        assert writer.stats['bytes'] == sum(len(bullet) for bullet in bullets)
+        assert 0 < writer.stats['file_bytes'] < writer.stats['bytes']
+
+    def test_compress_block(self):
+        """Check that a gzip block is a complete member with zero mtime."""
+        block = compress_block('gzip', b'bullet' * 100)
+        assert gzip.decompress(block) == b'bullet' * 100
+        assert block[4:8] == b'\x00' * 4
+        assert compress_block('gzip', b'bullet' * 100) == block
+
+    def test_compression_by_extension(self, tmpdir):
+        """Check that compression is chosen by file extension and readable by gzip tool."""
+        file_path = str(tmpdir.join('ammo.gz'))
+        with AmmoWriter(file_path, buffer_size=8, compression_workers=2) as writer:
+            writer.write(b'first bullet\n')
+            writer.write(b'second bullet\n')
+        assert writer.compression == 'gzip'
+        assert subprocess.run(['gzip', '-dc', file_path], stdout=subprocess.PIPE, check=True).stdout == \
+            b'first bullet\nsecond bullet\n'
+
+    def test_bad_compression(self, temporary_ammo_file):
+        """Check that only gzip and xz are supported."""
+        with pytest.raises(ValueError):
+            AmmoWriter(temporary_ammo_file, compression='zip')
+
+    def test_bad_buffer_size(self, temporary_ammo_file):
+        """Check that buffer size should be positive."""
+        with pytest.raises(ValueError):
+            AmmoWriter(temporary_ammo_file, buffer_size=0)
+
+    def test_debug_enabled(self, logger):
+        """Check logger level detection."""
+        assert debug_enabled(logger)
+        assert not debug_enabled(None)
+        logger.setLevel(logging.INFO)
+        assert not debug_enabled(logger)
+
+
+class TestStreamOutput:
+    """FIFO and Unix socket output test cases."""
+
+    @pytest.mark.parametrize('compression', [None, 'gzip'])
+    def test_fifo(self, tmpdir, compression):
+        """Check that all bullets are streamed to a FIFO reader."""
+        fifo = str(tmpdir.join('ammo.fifo'))
+        os.mkfifo(fifo)
+        assert is_stream(fifo)
+        bullets = [b'bullet %d\n' % i for i in range(10000)]
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            data = pool.submit(read_fifo, fifo)
+            with AmmoWriter(fifo, buffer_size=1024, compression=compression) as writer:
+                for bullet in bullets:
+                    writer.write(bullet)
+        data = data.result()
+        assert (gzip.decompress(data) if compression else data) == b''.join(bullets)
+        assert writer.stats['file_bytes'] == len(data)
+
+    def test_socket(self, tmpdir):
+        """Check that all bullets are streamed to a Unix socket listener."""
+        socket_path = str(tmpdir.join('ammo.sock'))
+        bullets = [b'bullet %d\n' % i for i in range(10000)]
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as server, ThreadPoolExecutor(max_workers=1) as pool:
+            server.bind(socket_path)
+            server.listen(1)
+            assert is_stream(socket_path)
+            data = pool.submit(read_socket, server)
+            with AmmoWriter(socket_path, buffer_size=1024) as writer:
+                for bullet in bullets:
+                    writer.write(bullet)
+            assert data.result() == b''.join(bullets)
+        assert writer.stats['file_bytes'] == writer.stats['bytes']
+
+    def test_regular_file(self, temporary_ammo_file):
+        """Check that regular files and missing paths are not streams."""
+        assert not is_stream(temporary_ammo_file + '.missing')
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""Access log importer.
+
+Converts nginx/Apache combined (or common) format access log to requests for Armory.
+Log is read line by line, plain or gzip-compressed.
+
+Example of usage:
+    requests = AccessLogImporter('access.log.gz', host='127.0.0.1', methods=['GET'], sample_rate=0.1)
+    Armory(requests, 'ammo', logger).generate_ammo()
+"""
+
+import gzip
+import io
+import random
+import re
+
+from dav_utils.descriptors import HttpMethod
+
+from yapam.config import ConfigRequest
+
+LOG_LINE = re.compile(
+    r'^\S+ \S+ \S+ \[[^\]]+\] '
+    r'"(?P<method>[A-Z]+) (?P<url>\S+)(?: [^"]*)?" '
+    r'(?P<status>\d{3}) \S+'
+)
+GZIP_MAGIC = b'\x1f\x8b'
+
+
+def open_log(file_path: str):
+    """Open plain or gzip-compressed log file as text."""
+    with io.open(file_path, mode='rb') as log_file:
+        compressed = log_file.read(2) == GZIP_MAGIC
+    if compressed:
+        return gzip.open(file_path, mode='rt', encoding='utf-8', errors='replace')
+    return io.open(file_path, mode='r', encoding='utf-8', errors='replace')
+
+
+class AccessLogImporter:
+    """Iterable of ConfigRequest instances made from access log lines.
+
+    file_path:   path to the access log (plain or gzip).
+    host:        request host parameter (host where load generator will shoot).
+    port:        request port where handler runs. default value is 80.
+    methods:     list of allowed request methods. default value is None (all methods).
+    statuses:    list of allowed response statuses, ex: [200, 304]. default value is None (all statuses).
+    url_pattern: regular expression, only matching urls are imported. default value is None (all urls).
+    sample_rate: share of matched lines to import, from 0 to 1. default value is 1.
+    seed:        random generator seed for sampling.
+    Test case tag is the url path without query string. Urls are literal, ${...} in them is never replaced.
+    Lines that can not be parsed or have unsupported methods are counted in skipped.
+    """
+
+    def __init__(self, file_path: str, host: str, port: int = 80, methods: list = None, statuses: list = None,
+                 url_pattern: str = None, sample_rate: float = 1, seed: int = 0):
+        """Set importer parameters."""
+        if not 0 < sample_rate <= 1:
+            raise ValueError('sample_rate should be in (0, 1] range.')
+        self.file_path = file_path
+        self.host = host
+        self.port = port
+        self.methods = frozenset(method.upper() for method in methods) if methods else HttpMethod.http_methods
+        self.statuses = frozenset(str(status) for status in statuses) if statuses else None
+        self.url_pattern = re.compile(url_pattern) if url_pattern else None
+        self.sample_rate = sample_rate
+        self.seed = seed
+        self.imported = 0
+        self.skipped = 0
+
+    def __iter__(self):
+        """Yield ConfigRequest for each matching log line."""
+        rand = random.Random(self.seed).random
+        methods, statuses, url_pattern = self.methods & HttpMethod.http_methods, self.statuses, self.url_pattern
+        with open_log(self.file_path) as log_file:
+            for line in log_file:
+                match = LOG_LINE.match(line)
+                if match is None or match.group('method') not in methods:
+                    self.skipped += 1
+                    continue
+                if statuses is not None and match.group('status') not in statuses:
+                    continue
+                url = match.group('url')
+                if url_pattern is not None and not url_pattern.search(url):
+                    continue
+                if self.sample_rate < 1 and rand() >= self.sample_rate:
+                    continue
+                try:
+                    request = ConfigRequest(host=self.host, url=url, method=match.group('method'),
+                                            case=url.partition('?')[0], port=self.port, literal=True)
+                except TypeError:
+                    self.skipped += 1
+                    continue
+                self.imported += 1
+                yield request
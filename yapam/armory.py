@@ -1,54 +1,652 @@
 # -*- coding: utf-8 -*-
 """Ammo factory.
 
-Supported ammo types: Phantom
+Supported ammo types: Phantom, URI, URIPOST
 In most cases, you need this particular module.
 
 Example of usage:
     user_config = AmmoConfig('config.json')
     armory = Armory(user_config.requests, user_config.ammo_file, user_config.log)
+    armory.estimate()  # size of the ammo, nothing is written
     armory.generate_ammo()
 """
 
+import os
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import chain, islice, repeat
+
 from dav_utils.config import Config
-from dav_utils.descriptors import WritableFile
 from dav_utils.utils import Util
 
-from yapam.phantom import PhantomAmmo
+from yapam.body import DEFAULT_BODY_TYPE, make_encoder
+from yapam.cache import SegmentCache
+from yapam.config import (AMMO_TYPES, ConfigRequest, DEFAULT_AMMO_TYPE, DEFAULT_CHUNK_SIZE, DEFAULT_CONNECTION,
+                          DEFAULT_WORKERS, RequestTable, WritableOutput)
+from yapam.estimate import AmmoEstimate, TimeSample
+from yapam.feed import render
+from yapam.generators import ValueStream
+from yapam.instrumentation import Instrumentation, NULL_INSTRUMENTATION
+from yapam.mix import WeightedSampler
+from yapam.phantom import DEFAULT_PROFILE, PhantomRenderer, encode_body, header_profile
+from yapam.shard import DEFAULT_SHARD_STRATEGY, ShardedWriter, manifest_path
+from yapam.uri import UriPostRenderer, UriRenderer, header_switch, request_shape
+from yapam.writer import AmmoWriter, DEFAULT_BUFFER_SIZE, bullet_size, debug_enabled, join_parts
+
+
+RENDERER = PhantomRenderer()
+URI_RENDERERS = {UriRenderer.ammo_type: UriRenderer, UriPostRenderer.ammo_type: UriPostRenderer}
+DEFAULT_SAMPLE_SIZE = 1000
+
+
+def render_bullet(request: ConfigRequest, log=None, profile: tuple = DEFAULT_PROFILE) -> bytes:
+    """Render request to an encoded Phantom bullet.
+
+    Static parts of a bullet are compiled once for each request shape (see PhantomTemplate).
+    profile: default headers, see header_profile.
+    Bullet with a file-backed body is a tuple of parts, files are not copied.
+    """
+    bullet = RENDERER.render_request(request, profile)
+    if log:
+        log.debug(join_parts(bullet).decode('utf-8', errors='replace').replace('\r\n', ', ').replace('\n', ', '))
+    return bullet
+
+
+def render_chunk(requests: list, profile: tuple = DEFAULT_PROFILE) -> bytes:
+    """Render list of requests to joined encoded bullets. Executed in a worker process."""
+    return b''.join(join_parts(render_bullet(request, profile=profile)) for request in requests)
+
+
+def render_bullets(requests: list, profile: tuple = DEFAULT_PROFILE) -> list:
+    """Render list of requests to a list of encoded bullets. Executed in a worker process."""
+    return [join_parts(render_bullet(request, profile=profile)) for request in requests]
+
+
+def render_uri_chunk(requests: list, ammo_type: str, shape: tuple, profile: tuple = DEFAULT_PROFILE) -> bytes:
+    """Render list of requests to joined encoded URI or URIPOST bullets. Executed in a worker process.
+
+    shape: shape of the last request of the previous chunk, header lines are written only if it differs.
+    """
+    renderer = URI_RENDERERS[ammo_type](shape, profile)
+    return b''.join(join_parts(renderer.render_request(request)) for request in requests)
+
+
+def timed_bullets(render, requests: list) -> list:
+    """Render list of requests to a list of (encoded bullet, render seconds)."""
+    clock = time.perf_counter
+    bullets = list()
+    for request in requests:
+        started = clock()
+        bullet = join_parts(render(request))
+        bullets.append((bullet, clock() - started))
+    return bullets
+
+
+def render_timed_bullets(requests: list, profile: tuple = DEFAULT_PROFILE) -> list:
+    """Render list of requests to a list of (encoded bullet, render seconds). Executed in a worker process."""
+    return timed_bullets(partial(render_bullet, profile=profile), requests)
+
+
+def render_timed_uri_bullets(requests: list, ammo_type: str, shape: tuple, profile: tuple = DEFAULT_PROFILE) -> list:
+    """Render list of requests to a list of (encoded URI bullet, render seconds), see render_uri_chunk."""
+    return timed_bullets(URI_RENDERERS[ammo_type](shape, profile).render_request, requests)
+
+
+def submit_chunk(function, pool, chunk: list, profile: tuple):
+    """Submit rendering of a chunk of requests to a process pool."""
+    return pool.submit(function, chunk, profile)
+
+
+def chunks(iterable, chunk_size: int):
+    """Split iterable to lists of chunk_size length."""
+    iterator = iter(iterable)
+    chunk = list(islice(iterator, chunk_size))
+    while chunk:
+        yield chunk
+        chunk = list(islice(iterator, chunk_size))
 
 
 class Armory(Util):
     """Ammo factory.
 
     requests:       list of ConfigRequest instances, like [ConfigRequest, ]
-    ammo_file_path: path to file where result should be saved.
+    ammo_file_path: path to file where result should be saved, or an existing FIFO or Unix socket.
+                    Bullets are streamed to the consumer while they are rendered, writing blocks while it is busy.
     logger:         your logger instance. Transmitted to ammo class for debug logging. May be None.
+    buffer_size:    size of a write chunk in bytes.
+    workers:        number of rendering processes. 1 means rendering in the current process.
+    chunk_size:     number of requests rendered by a worker process at once.
+    total_bullets:  number of bullets sampled from requests by weight. 0 means one bullet per request.
+    seed:           random generator seed for the request mix.
+    compression:    gzip, xz or None. If None, compression is chosen by ammo_file_path extension (.gz, .xz).
+    compression_workers: number of threads compressing independent blocks in parallel.
+    cache_dir:      directory for rendered segments of requests. Unchanged requests are not rendered again.
+                    Not used with total_bullets and URI ammo types.
+    instrumentation: Instrumentation instance for phase timers and per-case counters. May be None.
+    ammo_type:      phantom, uri or uripost.
+    connection:     close or keep-alive - Connection header of bullets. Request connection overrides it.
+    default_headers: overrides of PhantomAmmo.default_headers, None value removes a header.
+                    Request default_headers override it.
+    shards:         number of ammo files bullets are split to (see ShardedWriter). 1 means a single ammo file.
+    shard_strategy: round-robin, byte-balanced or hash-by-case.
     """
 
-    ammo_file_path = WritableFile('ammo_file_path')
+    ammo_file_path = WritableOutput('ammo_file_path')
 
-    def __init__(self, requests: str, ammo_file_path: str, logger: Config.log):
+    def __init__(self, requests: str, ammo_file_path: str, logger: Config.log,
+                 buffer_size: int = DEFAULT_BUFFER_SIZE, workers: int = DEFAULT_WORKERS,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE, total_bullets: int = 0, seed: int = 0,
+                 compression: str = None, compression_workers: int = 1, cache_dir: str = None,
+                 instrumentation: Instrumentation = None, ammo_type: str = DEFAULT_AMMO_TYPE,
+                 connection: str = DEFAULT_CONNECTION, default_headers: dict = None, shards: int = 1,
+                 shard_strategy: str = DEFAULT_SHARD_STRATEGY):
         """Armory constructor.
 
-        requests:  list of requests from config
-        ammo_file: path to a file where results should be saved
-        logger:    config logger.
+        requests:    list of requests from config
+        ammo_file:   path to a file where results should be saved
+        logger:      config logger.
+        buffer_size: size of a write chunk in bytes.
+        workers:     number of rendering processes.
+        chunk_size:  number of requests rendered by a worker process at once.
+        total_bullets: number of bullets sampled from requests by weight.
+        seed:        random generator seed for the request mix.
+        compression: gzip, xz or None (by ammo_file extension).
+        compression_workers: number of compressing threads.
+        cache_dir:   directory for rendered segments of requests.
+        instrumentation: phase timers and per-case counters.
+        ammo_type:   phantom, uri or uripost.
+        connection:  close or keep-alive.
+        default_headers: overrides of default headers.
+        shards:      number of ammo files.
+        shard_strategy: round-robin, byte-balanced or hash-by-case.
         """
+        if workers < 1 or chunk_size < 1:
+            raise ValueError('workers and chunk_size should be positive numbers.')
+        if ammo_type not in AMMO_TYPES:
+            raise ValueError('{} is not one of supported ammo types: {}.'.format(ammo_type, ', '.join(AMMO_TYPES)))
         self.requests = requests
         self.ammo_file_path = ammo_file_path
         self.log = logger
+        self.buffer_size = buffer_size
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.total_bullets = total_bullets
+        self.seed = seed
+        self.compression = compression
+        self.compression_workers = compression_workers
+        self.cache_dir = cache_dir
+        self.instrumentation = instrumentation if instrumentation else NULL_INSTRUMENTATION
+        self.ammo_type = ammo_type
+        self.profile = header_profile(connection, tuple(default_headers.items()) if default_headers else ())
+        self.shards = shards
+        self.shard_strategy = shard_strategy
+        self.stats = dict()
+        self.value_streams = dict()
+        self.time_sample = TimeSample(DEFAULT_SAMPLE_SIZE)
+        self.body_sizes = dict()
+
+    def expand_requests(self):
+        """Yield requests, requests with a data feed are expanded lazily - one request per feed row."""
+        self.reset_streams()
+        if self.total_bullets:
+            yield from self.mix_requests()
+            return
+        for request in self.requests:
+            yield from self.expand_request(request)
+
+    def expand_request(self, request: ConfigRequest):
+        """Yield request or one request per feed row for a request with a data feed.
+
+        Generator expressions are replaced with values of the request template value stream, see value_stream.
+        """
+        if request.feed is None and not request.generators:
+            yield request
+            return
+        for row in self.request_rows(request):
+            yield self.render_request(request, row)
+
+    def request_rows(self, request: ConfigRequest):
+        """Yield placeholder values of each bullet of a request: feed row and generated values."""
+        values = self.value_stream(request)
+        for row in request.feed if request.feed is not None else (dict(),):
+            yield row if values is None else dict(row, **next(values))
+
+    def value_stream(self, request: ConfigRequest):
+        """Return ValueStream of a request, None if request has no generator expressions.
+
+        Requests with the same url, extra_headers and body templates share a stream, so ${seq()} continues
+        from one request to another. Streams are started over by reset_streams.
+        """
+        if not request.generators:
+            return None
+        template = repr((request.url, request.extra_headers, request.body))
+        stream = self.value_streams.get(template)
+        if stream is None:
+            stream = self.value_streams[template] = ValueStream(request.generators,
+                                                                seed='{}:{}'.format(self.seed, template))
+        return stream
+
+    def reset_streams(self):
+        """Start value streams of all templates over, each generation run gets the same values."""
+        self.value_streams = dict()
+
+    def mix_requests(self):
+        """Yield total_bullets requests sampled by request weights in a random order, see pick_rows."""
+        requests = self.request_list()
+        picks = dict()
+        for index in self.sample_requests(requests):
+            request = requests[index]
+            if request.feed is None and not request.generators:
+                yield request
+                continue
+            if index not in picks:
+                picks[index] = self.pick_rows(request)
+            yield self.render_request(request, next(picks[index]))
+
+    def pick_rows(self, request: ConfigRequest):
+        """Yield placeholder values for each pick of a request in a mix.
+
+        Each pick of a request with a data feed takes the next feed row, feed is restarted when exhausted.
+        Each pick of a request with generator expressions takes the next generated values.
+        """
+        values = self.value_stream(request)
+        while True:
+            rows = iter(request.feed) if request.feed is not None else repeat(dict())
+            first_row = next(rows, None)
+            if first_row is None:
+                raise ValueError('Feed {} is empty.'.format(request.feed.file_path))
+            for row in chain((first_row,), rows):
+                yield row if values is None else dict(row, **next(values))
+
+    def request_list(self):
+        """Return requests as a list, RequestTable is used as is."""
+        return self.requests if isinstance(self.requests, (list, RequestTable)) else list(self.requests)
+
+    def sample_requests(self, requests: list):
+        """Yield total_bullets indexes of requests sampled by weight, the same seed gives the same sequence."""
+        yield from WeightedSampler([request.weight for request in requests], seed=self.seed).sample(self.total_bullets)
+
+    @staticmethod
+    def render_request(request: ConfigRequest, row: dict) -> ConfigRequest:
+        """Render request placeholders with a feed row and generated values.
+
+        Parameters of the request are already validated, so like RequestTable rows the rendered request
+        is created without descriptors and rendered values are never parsed as generator expressions.
+        """
+        expanded = ConfigRequest.__new__(ConfigRequest)
+        state = expanded.__dict__
+        state.update(request.__dict__)
+        body = render(request.body, row)
+        state.update(url=str(render(request.url, row)), extra_headers=render(request.extra_headers, row), body=body,
+                     feed=None, generators=dict())
+        if request.body_type != DEFAULT_BODY_TYPE:
+            try:
+                state['body_encoder'] = make_encoder(request.body_type, body)
+            except (OSError, ValueError) as err:
+                raise TypeError('{url} contains bad body: {err}'.format(url=request.url, err=err))
+        return expanded
+
+    def bullet_renderer(self):
+        """Return function rendering a request to an encoded bullet of ammo_type.
+
+        URI renderers keep headers of the previous bullet, so a new one is created for each ammo file.
+        """
+        if self.ammo_type in URI_RENDERERS:
+            return URI_RENDERERS[self.ammo_type](profile=self.profile).render_request
+        return partial(render_bullet, profile=self.profile)
 
     def generate_ammo(self):
-        """Generate and write Phantom ammo to a text file."""
-        ammo_gen = (
-            PhantomAmmo(log=self.log,
-                        method=request.method,
-                        url=request.url,
-                        host=request.host,
-                        case=request.case,
-                        port=request.port,
-                        extra_headers=request.extra_headers,
-                        body=request.body).bullet for request in self.requests
-        )
-        self.save_text_file(file_path=self.ammo_file_path, txt_data=ammo_gen)
+        """Generate and write ammo to a file (or to shards)."""
+        instrumentation = self.instrumentation
+        use_cache = self.cache_dir and not self.total_bullets
+        if use_cache and (self.ammo_type in URI_RENDERERS or self.shards > 1):
+            # segments can not be concatenated: header lines depend on the previous request,
+            # bullets of a request are split between shards
+            use_cache = False
+            if self.log:
+                self.log.warning('Cache is not used with {} ammo type or shards.'.format(self.ammo_type))
+        writer = None
+        with instrumentation.phase('generate'):
+            try:
+                if self.shards > 1:
+                    writer = ShardedWriter(self.ammo_file_path, self.shards, self.shard_strategy, self.buffer_size,
+                                           self.compression, self.compression_workers)
+                else:
+                    writer = AmmoWriter(self.ammo_file_path, self.buffer_size, self.compression,
+                                        self.compression_workers)
+                with writer:
+                    if self.shards > 1:
+                        self.write_sharded(writer)
+                    elif use_cache:
+                        self.write_cached(writer)
+                    elif self.workers > 1:
+                        with instrumentation.phase('parallel'):
+                            self.write_parallel(writer)
+                    elif instrumentation.enabled:
+                        self.write_serial_instrumented(writer)
+                    else:
+                        self.write_serial(writer)
+            except (BrokenPipeError, ConnectionResetError):
+                if writer is None or not writer.stream:
+                    raise
+                # consumer has read enough ammo, it is not an error
+                if self.log:
+                    self.log.warning('Consumer of {} closed the stream.'.format(self.ammo_file_path))
+        self.stats = writer.stats
+        if self.log:
+            self.log.info('{bullets} bullets ({bytes} bytes, {file_bytes} in file) saved to {file} in {seconds:.2f}s, '
+                          '{bullets_per_sec:.0f} bullets/sec.'.format(file=self.ammo_file_path, **self.stats))
+            if self.shards > 1:
+                self.log.info('{shards} shards manifest saved to {manifest}.'.format(
+                    shards=self.shards, manifest=manifest_path(self.ammo_file_path)))
         return True
+
+    def write_serial(self, writer: AmmoWriter):
+        """Render bullets in the current process."""
+        # debug formatting of each bullet is expensive, skip it if nobody will see it
+        bullet_log = self.log if debug_enabled(self.log) else None
+        render = self.bullet_renderer()
+        for request in self.expand_requests():
+            writer.write(render(request, bullet_log))
+
+    def write_serial_instrumented(self, writer: AmmoWriter):
+        """Render bullets in the current process, measure expand, render and write phases and count cases."""
+        bullet_log = self.log if debug_enabled(self.log) else None
+        instrumentation, clock = self.instrumentation, time.perf_counter
+        render = self.bullet_renderer()
+        expand_seconds = render_seconds = write_seconds = 0.0
+        requests = self.expand_requests()
+        while True:
+            started = clock()
+            request = next(requests, None)
+            expanded = clock()
+            expand_seconds += expanded - started
+            if request is None:
+                break
+            bullet = render(request, bullet_log)
+            rendered = clock()
+            writer.write(bullet)
+            written = clock()
+            render_seconds += rendered - expanded
+            write_seconds += written - rendered
+            instrumentation.count(request.case, bullet_size(bullet), rendered - expanded)
+        instrumentation.add_time('expand', expand_seconds)
+        instrumentation.add_time('render', render_seconds)
+        instrumentation.add_time('write', write_seconds)
+
+    def write_cached(self, writer: AmmoWriter):
+        """Render changed requests to cache segments and concatenate all segments to the ammo file."""
+        cache = SegmentCache(self.cache_dir)
+        self.reset_streams()
+        for request in self.requests:
+            salt = repr(self.profile)
+            values = self.value_stream(request)
+            if values is not None:
+                # generated values depend on the seed and position of the template value stream
+                salt += ':{}:{}'.format(self.seed, values.position)
+            key = cache.key(request, salt=salt)
+            if key in cache and all(generator.cacheable for generator in request.generators.values()):
+                bullets = cache.reuse(key)
+                if values is not None:
+                    values.skip(bullets)
+                if self.instrumentation.enabled:
+                    # reused bullets are not rendered
+                    self.instrumentation.count(request.case, os.path.getsize(cache.path(key)), 0.0, bullets)
+            else:
+                with self.instrumentation.phase('cache_render'):
+                    bullets = cache.store(key, self.counted_bullets(partial(render_bullet, profile=self.profile),
+                                                                    self.expand_request(request)),
+                                          self.buffer_size)
+            with self.instrumentation.phase('cache_concat'):
+                writer.write_file(cache.path(key), bullets)
+        cache.save()
+        if self.log:
+            self.log.info('Cache segments reused: {hits}, rendered: {misses}.'.format(
+                hits=cache.hits, misses=cache.misses))
+
+    def counted_bullets(self, render, requests):
+        """Yield bullets of requests rendered by render, count them by case if instrumentation is enabled."""
+        instrumentation = self.instrumentation
+        if not instrumentation.enabled:
+            for request in requests:
+                yield render(request)
+            return
+        clock = time.perf_counter
+        for request in requests:
+            started = clock()
+            bullet = render(request)
+            instrumentation.count(request.case, bullet_size(bullet), clock() - started)
+            yield bullet
+
+    def count_chunk(self, chunk: list, bullets: list) -> list:
+        """Count (encoded bullet, render seconds) of a chunk rendered in a worker process, return the bullets."""
+        count = self.instrumentation.count
+        for request, (bullet, seconds) in zip(chunk, bullets):
+            count(request.case, len(bullet), seconds)
+        return [bullet for bullet, __ in bullets]
+
+    def map_chunks(self, submit):
+        """Yield (chunk, result) for chunks of expanded requests rendered in a process pool, in the original order.
+
+        submit: function(pool, chunk) submitting a chunk to the pool and returning a future.
+        Only a limited number of chunks is in flight, so memory does not depend on the number of requests.
+        """
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            pending = deque()
+            for chunk in chunks(self.expand_requests(), self.chunk_size):
+                pending.append((chunk, submit(pool, chunk)))
+                if len(pending) >= self.workers * 2:
+                    chunk, future = pending.popleft()
+                    yield chunk, future.result()
+            while pending:
+                chunk, future = pending.popleft()
+                yield chunk, future.result()
+
+    def write_parallel(self, writer: AmmoWriter):
+        """Render chunks of bullets in a process pool and write them in the original order.
+
+        Bullets are not debug-logged in this mode.
+        URI chunks get the shape of the previous chunk last request, so header lines are the same as in one process.
+        """
+        shape = None
+        # per-case counters need bullets of a chunk and their render time
+        counted = self.instrumentation.enabled
+
+        def submit_uri(pool, chunk):
+            nonlocal shape
+            future = pool.submit(render_timed_uri_bullets if counted else render_uri_chunk,
+                                 chunk, self.ammo_type, shape, self.profile)
+            shape = request_shape(chunk[-1], self.profile)
+            return future
+
+        if self.ammo_type in URI_RENDERERS:
+            submit = submit_uri
+        else:
+            submit = partial(submit_chunk, render_timed_bullets if counted else render_chunk, profile=self.profile)
+        for chunk, data in self.map_chunks(submit):
+            if counted:
+                data = b''.join(self.count_chunk(chunk, data))
+            writer.write(data, bullets=len(chunk))
+
+    def write_sharded(self, writer: ShardedWriter):
+        """Route bullets to shards by case and render them.
+
+        Phantom bullets are rendered in a process pool if workers > 1,
+        URI bullets are rendered in the current process by a renderer of each shard.
+        """
+        counted = self.instrumentation.enabled
+        if self.workers > 1 and self.ammo_type not in URI_RENDERERS:
+            render = render_timed_bullets if counted else render_bullets
+            for chunk, bullets in self.map_chunks(partial(submit_chunk, render, profile=self.profile)):
+                if counted:
+                    bullets = self.count_chunk(chunk, bullets)
+                for request, bullet in zip(chunk, bullets):
+                    writer.write(writer.pick(request.case), bullet, request.case)
+            return
+        bullet_log = self.log if debug_enabled(self.log) else None
+        renderers = [self.bullet_renderer() for __ in writer.writers]
+        count, clock = self.instrumentation.count, time.perf_counter
+        for request in self.expand_requests():
+            index = writer.pick(request.case)
+            started = clock() if counted else 0.0
+            bullet = renderers[index](request, bullet_log)
+            if counted:
+                count(request.case, bullet_size(bullet), clock() - started)
+            writer.write(index, bullet, request.case)
+
+    def estimate(self, sample_size: int = DEFAULT_SAMPLE_SIZE) -> dict:
+        """Estimate ammo without writing it: bullets and bytes in total and for each case, render time.
+
+        Bullets of a request without data feed and generator expressions have the same size,
+        it is computed from the compiled template without rendering, render time is measured for a sample
+        of such requests (see TimeSample). Other requests are rendered for sample_size bullets evenly
+        spread over all bullets of the request, bytes of the rest are extrapolated by the sample average.
+        Bytes are not compressed, estimated_seconds is the render time divided between workers.
+        """
+        started = time.perf_counter()
+        estimate = AmmoEstimate()
+        self.reset_streams()
+        # id of a shared json body: (body, encoded size), the body is kept so its id is not reused
+        self.body_sizes = dict()
+        if self.total_bullets:
+            requests = self.request_list()
+            self.time_sample = TimeSample(sample_size, len(requests))
+            counts = Counter(self.sample_requests(requests))
+            estimated = list(self.estimate_requests(estimate, requests, sample_size, counts))
+            cases = [case for case, __ in estimated]
+            templates = [row_templates for __, row_templates in estimated]
+            if self.ammo_type in URI_RENDERERS:
+                switches = dict()
+                previous = None
+                for index in self.sample_requests(requests):
+                    if index != previous:
+                        if (previous, index) not in switches:
+                            last = templates[previous][1] if previous is not None else None
+                            switches[previous, index] = len(header_switch(last, templates[index][0]))
+                        estimate.add(cases[index], 0, switches[previous, index])
+                        previous = index
+        else:
+            self.time_sample = TimeSample(sample_size, len(self.requests) if hasattr(self.requests, '__len__') else None)
+            last = None
+            for case, row_templates in self.estimate_requests(estimate, self.requests, sample_size):
+                if row_templates is not None:
+                    estimate.add(case, 0, len(header_switch(last, row_templates[0])))
+                    last = row_templates[1]
+        estimate.render_seconds += self.time_sample.seconds
+        self.body_sizes = dict()
+        return estimate.report(self.workers, seconds=time.perf_counter() - started)
+
+    def body_size(self, request: ConfigRequest) -> int:
+        """Return size of the encoded body of a request, json bodies shared by RequestTable rows are encoded once."""
+        if request.body_encoder is not None:
+            return request.body_encoder.size
+        body = request.body
+        if not body:
+            return 0
+        known = self.body_sizes.get(id(body))
+        if known is None or known[0] is not body:
+            known = self.body_sizes[id(body)] = (body, len(encode_body(body)))
+        return known[1]
+
+    def estimate_requests(self, estimate: AmmoEstimate, requests, sample_size: int, counts: dict = None):
+        """Add bullets of each request to the estimate, yield (case, templates) of each request, see estimate_request.
+
+        counts: number of bullets of each request number. None means one bullet per request or per feed row.
+        RequestTable rows of the same shape share one size computation and are created only to be rendered.
+        """
+        if not isinstance(requests, RequestTable):
+            for number, request in enumerate(requests):
+                count = counts[number] if counts is not None else self.request_count(request)
+                yield request.case, self.estimate_request(estimate, request, count, sample_size)
+            return
+        sizers = dict()
+        for number, (shape_id, url, case) in enumerate(requests.shape_rows()):
+            if shape_id is None:
+                request = requests[number]
+                count = counts[number] if counts is not None else self.request_count(request)
+                yield request.case, self.estimate_request(estimate, request, count, sample_size)
+                continue
+            count = counts[number] if counts is not None else 1
+            if not count:
+                yield case, None
+                continue
+            sizer = sizers.get(shape_id)
+            if sizer is None:
+                sizer = sizers[shape_id] = self.static_sizer(requests[number])
+            template, size = sizer
+            estimate.add(case, count, size(len(url.encode('utf-8')), len(case.encode('utf-8'))) * count)
+            if self.time_sample.count(count):
+                self.time_render(requests[number], count)
+            yield case, (template, template) if template is not None else None
+
+    @staticmethod
+    def request_count(request: ConfigRequest) -> int:
+        """Return number of bullets of a request without a mix: one bullet per request or per feed row."""
+        return sum(1 for __ in request.feed) if request.feed is not None else 1
+
+    def static_sizer(self, request: ConfigRequest) -> tuple:
+        """Return URI template (None for phantom ammo) and size function of a request without data feed and generators.
+
+        Size function returns bullet size by sizes of the encoded url and case, nothing is rendered.
+        """
+        body_size = self.body_size(request)
+        if self.ammo_type in URI_RENDERERS:
+            renderer = URI_RENDERERS[self.ammo_type](profile=self.profile)
+            return (renderer.request_template(request),
+                    lambda url_size, case_size: renderer.line_size(request, url_size, case_size, body_size))
+        template = RENDERER.request_template(request, self.profile)
+        return None, lambda url_size, case_size: template.bullet_size(url_size, case_size, body_size)
+
+    def time_render(self, request: ConfigRequest, count: int):
+        """Measure render time of a request of count bullets for the time sample."""
+        render = self.bullet_renderer()
+        # template is compiled by the size computation, only rendering is timed
+        rendered = time.perf_counter()
+        render(request)
+        self.time_sample.add(count, time.perf_counter() - rendered)
+
+    def estimate_request(self, estimate: AmmoEstimate, request: ConfigRequest, count: int, sample_size: int):
+        """Add count bullets of a request to the estimate.
+
+        URI header lines written before the first bullet of the request are not counted.
+        Return UriTemplate of the first and the last bullet for URI ammo types, None otherwise.
+        """
+        if not count:
+            return None
+        if request.feed is None and not request.generators:
+            template, size = self.static_sizer(request)
+            estimate.add(request.case, count,
+                         size(len(request.url.encode('utf-8')), len(request.case.encode('utf-8'))) * count)
+            if self.time_sample.count(count):
+                self.time_render(request, count)
+            return (template, template) if template is not None else None
+        clock = time.perf_counter
+        renderer = None
+        if self.ammo_type in URI_RENDERERS:
+            renderer = URI_RENDERERS[self.ammo_type](profile=self.profile)
+            render = renderer.render_request
+        else:
+            render = partial(render_bullet, profile=self.profile)
+        rows = self.pick_rows(request) if self.total_bullets else self.request_rows(request)
+        step = -(-count // sample_size)
+        sizes = list()
+        first = None
+        shapes = 1
+        seconds = 0.0
+        for row in islice(rows, 0, count, step):
+            rendered = clock()
+            sizes.append(bullet_size(render(self.render_request(request, row))))
+            seconds += clock() - rendered
+            if renderer is not None:
+                if first is None:
+                    first = renderer.template
+                    sizes[0] -= len(first.header_lines)
+                elif renderer.template is not first:
+                    shapes = 2
+        # header lines of a mix depend on the order of requests with different headers
+        exact = step == 1 and not (self.total_bullets and shapes > 1)
+        size = sum(sizes) if exact else round(sum(sizes) * count / len(sizes))
+        estimate.add(request.case, count, size, exact, seconds * count / len(sizes))
+        return (first, renderer.template) if renderer is not None else None
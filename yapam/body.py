@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+"""Request body encoders.
+
+ConfigRequest body_type selects the encoder of a body dict:
+    json:      body is serialized to JSON (default, see encode_body).
+    raw:       {"file": "image.png", "content_type": "image/png"} or {"text": "...", "content_type": "text/plain"}.
+    form:      {"username": "admin"} is sent as application/x-www-form-urlencoded.
+    multipart: {"name": "avatar", "avatar": {"file": "a.png", "content_type": "image/png"}} is sent as
+               multipart/form-data, file fields are sent as files.
+Files are mapped to memory once per process and written to the ammo as is, without loading or copying them
+for each bullet.
+
+Example of usage:
+    encoder = make_encoder('raw', {'file': 'image.png', 'content_type': 'image/png'})
+    bullet_parts = (head, ) + encoder.parts + (tail, )
+"""
+
+import mmap
+import os
+from functools import lru_cache
+from json import dumps
+from urllib.parse import urlencode
+
+BODY_TYPES = ('json', 'raw', 'form', 'multipart')
+DEFAULT_BODY_TYPE = 'json'
+BOUNDARY = 'yapam-boundary-7c3e9d1a5b2f4e60'
+FILE_CACHE_SIZE = 256
+
+
+@lru_cache(maxsize=FILE_CACHE_SIZE)
+def map_file(file_path: str):
+    """Return read-only memory map of a file (b'' for an empty file). Each file is mapped once."""
+    with open(file_path, mode='rb') as body_file:
+        if not os.fstat(body_file.fileno()).st_size:
+            return b''
+        # the map stays valid after the file is closed
+        return mmap.mmap(body_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+@lru_cache(maxsize=FILE_CACHE_SIZE)
+def file_contains(file_path: str, token: bytes) -> bool:
+    """Check that file content contains token, each file is checked once."""
+    return map_file(file_path).find(token) >= 0
+
+
+class BodyEncoder:
+    """Encoded request body.
+
+    parts:        tuple of bytes-like objects, body is their concatenation.
+    size:         body size in bytes.
+    content_type: Content-Type header value.
+    files:        paths of files used in the body.
+    """
+
+    content_type = None
+
+    def __init__(self, body: dict):
+        """Encode body."""
+        self.files = list()
+        self.parts = self.encode(body)
+        self.size = sum(len(part) for part in self.parts)
+
+    def encode(self, body: dict) -> tuple:
+        """Return body parts."""
+        raise NotImplementedError
+
+    def file_part(self, file_path: str):
+        """Return memory map of a body file."""
+        self.files.append(file_path)
+        return map_file(file_path)
+
+
+class RawBody(BodyEncoder):
+    """Body from a file or a text as is."""
+
+    def encode(self, body: dict) -> tuple:
+        """Return file or text part."""
+        self.content_type = body.get('content_type', 'application/octet-stream')
+        if 'file' in body:
+            return self.file_part(body['file']),
+        if 'text' in body:
+            return str(body['text']).encode('utf-8'),
+        raise ValueError('raw body should have file or text.')
+
+
+class FormBody(BodyEncoder):
+    """URL-encoded form body."""
+
+    content_type = 'application/x-www-form-urlencoded'
+
+    def encode(self, body: dict) -> tuple:
+        """Return urlencoded fields."""
+        return urlencode(body, doseq=True).encode('utf-8'),
+
+
+class MultipartBody(BodyEncoder):
+    """Multipart form body, {"file": path, "content_type": type} fields are sent as files."""
+
+    content_type = 'multipart/form-data; boundary={}'.format(BOUNDARY)
+
+    def encode(self, body: dict) -> tuple:
+        """Return part headers, field values and file maps."""
+        boundary = BOUNDARY.encode('utf-8')
+        parts = list()
+        head = b''
+        for name, value in body.items():
+            head += b'--%b\r\nContent-Disposition: form-data; name="%b"' % (boundary, name.encode('utf-8'))
+            if isinstance(value, dict) and 'file' in value:
+                file_path = value['file']
+                head += b'; filename="%b"\r\nContent-Type: %b\r\n\r\n' % (
+                    os.path.basename(file_path).encode('utf-8'),
+                    value.get('content_type', 'application/octet-stream').encode('utf-8'))
+                if file_contains(file_path, boundary):
+                    raise ValueError('{} contains multipart boundary.'.format(file_path))
+                parts.append(head)
+                parts.append(self.file_part(file_path))
+                head = b'\r\n'
+                continue
+            data = dumps(value) if isinstance(value, (dict, list)) else str(value)
+            if BOUNDARY in data:
+                raise ValueError('Field {} contains multipart boundary.'.format(name))
+            head += b'\r\n\r\n%b\r\n' % data.encode('utf-8')
+        parts.append(head + b'--%b--\r\n' % boundary)
+        return tuple(parts)
+
+
+ENCODERS = {'raw': RawBody, 'form': FormBody, 'multipart': MultipartBody}
+
+
+def make_encoder(body_type: str, body: dict):
+    """Return BodyEncoder for a body, None for json body (it is encoded by encode_body)."""
+    if body_type not in BODY_TYPES:
+        raise ValueError('{} is not one of body types: {}.'.format(body_type, ', '.join(BODY_TYPES)))
+    if body_type == DEFAULT_BODY_TYPE:
+        return None
+    return ENCODERS[body_type](body)
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""Incremental regeneration cache.
+
+Rendered bullets of each ConfigRequest are stored in a separate segment file named after
+a hash of the request content. Unchanged requests reuse their segments on the next run.
+
+Example of usage:
+    cache = SegmentCache('.yapam_cache')
+    key = cache.key(request)
+    bullets_count = cache.reuse(key) if key in cache else cache.store(key, bullets, buffer_size)
+    segment_path = cache.path(key)
+    cache.save()
+"""
+
+import hashlib
+import io
+import json
+import os
+
+from yapam.writer import AmmoWriter
+
+# change it when rendered output of the same request changes
+RENDER_VERSION = 1
+
+
+class SegmentCache:
+    """Segments of rendered requests on disk.
+
+    cache_dir: directory for segments and manifest (created if missing).
+    Manifest keeps number of bullets in each segment.
+    """
+
+    manifest_name = 'manifest.json'
+
+    def __init__(self, cache_dir: str):
+        """Create cache directory and load manifest."""
+        os.makedirs(cache_dir, exist_ok=True)
+        self.cache_dir = cache_dir
+        self.manifest_path = os.path.join(cache_dir, self.manifest_name)
+        self.segments = dict()
+        if os.path.isfile(self.manifest_path):
+            with io.open(self.manifest_path, mode='r', encoding='utf-8') as manifest_file:
+                self.segments = json.load(manifest_file)
+        self.used = set()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(request, salt: str = '') -> str:
+        """Content hash of a request.
+
+        request: ConfigRequest instance. Data feed is identified by its path, size and modification time.
+        salt:    rendering options that change output of the same request.
+        """
+        params = {'host': request.host,
+                  'url': request.url,
+                  'method': request.method,
+                  'case': request.case,
+                  'port': request.port,
+                  'extra_headers': request.extra_headers,
+                  'body': request.body,
+                  'body_type': request.body_type,
+                  'body_files': None,
+                  'connection': request.connection,
+                  'default_headers': request.default_headers,
+                  'feed': None,
+                  'salt': salt,
+                  'version': RENDER_VERSION}
+        if request.feed is not None:
+            feed_stat = os.stat(request.feed.file_path)
+            params['feed'] = [os.path.abspath(request.feed.file_path), feed_stat.st_size, feed_stat.st_mtime_ns]
+        if request.body_encoder is not None and request.body_encoder.files:
+            params['body_files'] = [[os.path.abspath(file_path), os.stat(file_path).st_size,
+                                     os.stat(file_path).st_mtime_ns] for file_path in request.body_encoder.files]
+        params_str = json.dumps(params, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(params_str.encode('utf-8')).hexdigest()
+
+    def path(self, key: str) -> str:
+        """Segment file path."""
+        return os.path.join(self.cache_dir, key + '.ammo')
+
+    def __contains__(self, key: str) -> bool:
+        """Check that segment is stored."""
+        return key in self.segments and os.path.isfile(self.path(key))
+
+    def reuse(self, key: str) -> int:
+        """Mark stored segment as used, return number of bullets in it."""
+        self.used.add(key)
+        self.hits += 1
+        return self.segments[key]
+
+    def store(self, key: str, bullets, buffer_size: int) -> int:
+        """Write encoded bullets to a new segment, return number of bullets."""
+        tmp_path = self.path(key) + '.tmp'
+        with AmmoWriter(tmp_path, buffer_size) as writer:
+            for bullet in bullets:
+                writer.write(bullet)
+        # segment appears only when it is complete
+        os.replace(tmp_path, self.path(key))
+        self.segments[key] = writer.bullets
+        self.used.add(key)
+        self.misses += 1
+        return writer.bullets
+
+    def save(self):
+        """Remove segments not used by the current run and save manifest."""
+        for key in set(self.segments) - self.used:
+            if os.path.isfile(self.path(key)):
+                os.remove(self.path(key))
+            del self.segments[key]
+        with io.open(self.manifest_path, mode='w', encoding='utf-8') as manifest_file:
+            json.dump(self.segments, manifest_file)
@@ -1,9 +1,75 @@
 # -*- coding: utf-8 -*-
 """Project config."""
 
+import io
+import json
+import os
+from array import array
+
 from dav_utils.config import Config
 from dav_utils.descriptors import (DictType, HttpMethod, IntType,
-                                   StringType)
+                                   StringType, TypeChecker, WritableFile)
+
+from yapam.body import BODY_TYPES, DEFAULT_BODY_TYPE, make_encoder
+from yapam.feed import DataFeed
+from yapam.generators import compile_generators
+from yapam.phantom import CONNECTIONS
+from yapam.shard import DEFAULT_SHARD_STRATEGY
+from yapam.writer import DEFAULT_BUFFER_SIZE, is_stream
+
+DEFAULT_WORKERS = 1
+DEFAULT_CHUNK_SIZE = 1000
+AMMO_TYPES = ('phantom', 'uri', 'uripost')
+DEFAULT_AMMO_TYPE = 'phantom'
+DEFAULT_CONNECTION = 'close'
+
+
+class PositiveNumber(TypeChecker):
+    """Descriptor for positive int or float checking."""
+
+    def __init__(self, name):
+        """Use 'int' and 'float' for TypeChecker value_type."""
+        super().__init__(name, (int, float))
+
+    def __set__(self, instance, value):
+        """Check that value is a positive number."""
+        super().__set__(instance, value)
+        if value <= 0:
+            raise TypeError('{val} is not a positive number.'.format(val=value))
+
+
+class ConnectionType(StringType):
+    """Descriptor for connection profile checking: close, keep-alive or empty string (not set)."""
+
+    def __set__(self, instance, value):
+        """Check that value is one of connection profiles."""
+        super().__set__(instance, value)
+        if value and value not in CONNECTIONS:
+            raise TypeError('{val} is not one of connection profiles: {profiles}.'.format(
+                val=value, profiles=', '.join(CONNECTIONS)))
+
+
+class WritableOutput(WritableFile):
+    """Check that value is a writable file (or can be created), FIFO or Unix socket."""
+
+    def __set__(self, instance, value):
+        """Check FIFO or socket write permissions, other paths are checked as a file."""
+        if not isinstance(value, str) or not is_stream(value):
+            super().__set__(instance, value)
+            return
+        if not os.access(value, os.W_OK):
+            raise PermissionError('{val} can not be written. Check FS permissions.'.format(val=value))
+        instance.__dict__[self.name] = value
+
+
+class BodyType(StringType):
+    """Descriptor for request body type checking."""
+
+    def __set__(self, instance, value):
+        """Check that value is one of body types."""
+        super().__set__(instance, value)
+        if value not in BODY_TYPES:
+            raise TypeError('{val} is not one of body types: {types}.'.format(val=value, types=', '.join(BODY_TYPES)))
 
 
 class ConfigRequest:
@@ -14,8 +80,18 @@ class ConfigRequest:
     method:         request method.
     case:           test case tag in report. default value is url.
     extra_headers:  additional request headers (dict)
-    body:           request body string.
+    body:           request body (dict).
+    body_type:      json, raw, form or multipart, see yapam.body. default value is json.
     port:           request port where handler runs. default value is 80.
+    feed:           path to a CSV/JSONL data feed. ${column} placeholders in url, body and extra_headers
+                    are replaced with row values, one bullet per feed row.
+    ${name(args)} generator expressions in url, body and extra_headers are replaced with generated values
+    for each bullet, see yapam.generators.
+    weight:         share of the request in a mix of total_bullets. default value is 1.
+    connection:     close or keep-alive, overrides connection from config.
+    default_headers: overrides of default headers from config, null value removes a header.
+    literal:        url, body and extra_headers are used as is, ${...} is not replaced (imported requests).
+                    default value is False.
     """
 
     method = HttpMethod('method')
@@ -24,9 +100,14 @@ class ConfigRequest:
     body = DictType('body')
     port = IntType('port')
     extra_headers = DictType('extra_headers')
+    weight = PositiveNumber('weight')
+    connection = ConnectionType('connection')
+    default_headers = DictType('default_headers')
+    body_type = BodyType('body_type')
 
     def __init__(self, host: str, url: str, method: str, case: str = None, port: int = 80, extra_headers: dict = None,
-                 body: str = None):
+                 body: str = None, feed: str = None, weight: float = 1, connection: str = None,
+                 default_headers: dict = None, body_type: str = DEFAULT_BODY_TYPE, literal: bool = False):
         """Validate parameters and create instance of ConfigRequest."""
         self.method = method
         self.url = url
@@ -35,6 +116,181 @@ class ConfigRequest:
         self.case = case if case else url
         self.extra_headers = extra_headers if extra_headers else dict()
         self.body = body if body else dict()
+        self.feed = DataFeed(feed) if feed else None
+        self.weight = weight
+        self.connection = connection if connection else ''
+        self.default_headers = default_headers if default_headers else dict()
+        self.literal = bool(literal)
+        if self.literal and self.feed is not None:
+            raise TypeError('{url} is literal and can not have a feed.'.format(url=self.url))
+        try:
+            self.generators = dict() if self.literal else compile_generators(self.url, self.extra_headers, self.body)
+        except (OSError, ValueError) as err:
+            raise TypeError('{url} contains bad generator expression: {err}'.format(url=self.url, err=err))
+        # headers with placeholders get a new value for each bullet, they are not compiled into bullet templates
+        self.dynamic_headers = frozenset(key for key, val in self.extra_headers.items() if '${' in str(val)) \
+            if self.feed is not None or self.generators else frozenset()
+        self.body_type = body_type
+        self.body_encoder = None
+        # body with placeholders is encoded after rendering, for each bullet
+        if self.feed is None and not self.generators:
+            try:
+                self.body_encoder = make_encoder(self.body_type, self.body)
+            except (OSError, ValueError) as err:
+                raise TypeError('{url} contains bad body: {err}'.format(url=self.url, err=err))
+
+    def __getstate__(self) -> dict:
+        """Pickle request without body encoder (memory maps of files can not be pickled)."""
+        state = dict(self.__dict__)
+        state['body_encoder'] = None
+        return state
+
+    def __setstate__(self, state: dict):
+        """Restore request and encode body again."""
+        self.__dict__.update(state)
+        if self.feed is None and not self.generators:
+            self.body_encoder = make_encoder(self.body_type, self.body)
+
+
+class JsonlRequestSource:
+    """Requests from a JSONL file: one ConfigRequest parameters JSON object per line.
+
+    File is read and validated line by line on each iteration, so only one request is held in memory.
+
+    file_path: path to .jsonl file.
+    """
+
+    __extensions = frozenset(['.jsonl'])
+
+    def __init__(self, file_path: str):
+        """Check that requests file exists and has .jsonl extension."""
+        if not os.path.isfile(file_path):
+            raise FileNotFoundError('File {} not exists.'.format(file_path))
+        __, file_ext = os.path.splitext(file_path)
+        if file_ext not in self.__extensions:
+            raise TypeError('{} is not a JSONL file.'.format(file_path))
+        self.file_path = file_path
+
+    def __iter__(self):
+        """Yield ConfigRequest for each non-empty line."""
+        with io.open(self.file_path, mode='r', encoding='utf-8') as requests_file:
+            for line_number, line in enumerate(requests_file, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    yield ConfigRequest(**json.loads(line))
+                except (TypeError, ValueError) as err:
+                    raise ValueError('{file}:{line} contains bad parameters: {err}'.format(
+                        file=self.file_path, line=line_number, err=err))
+
+
+class RequestTable:
+    """Compact table of ConfigRequest parameters.
+
+    Requests of the same shape (host, method, port, extra_headers, body, weight, connection and default_headers)
+    share one validated set of attributes, so a row is a shape number, url and interned case number in arrays.
+    A shape is validated by ConfigRequest once, other rows of the shape check url only.
+    Requests with a data feed, generator expressions or a body encoder are kept as ConfigRequest instances.
+    Rows are returned as ConfigRequest instances created on access, shared attributes should not be changed.
+
+    requests: list of ConfigRequest parameters dicts.
+    """
+
+    __parameters = frozenset(['host', 'url', 'method', 'case', 'port', 'extra_headers', 'body', 'feed', 'weight',
+                              'connection', 'default_headers', 'body_type', 'literal'])
+
+    def __init__(self, requests: list = ()):
+        """Validate requests and fill the table."""
+        self.shapes = list()
+        self.shape_numbers = dict()
+        self.cases = list()
+        self.case_numbers = dict()
+        self.shape_ids = array('I')
+        self.case_ids = array('i')
+        self.urls = list()
+        # row number: ConfigRequest of a request that can not be shared
+        self.requests = dict()
+        for request in requests:
+            self.append(request)
+
+    def append(self, parameters: dict):
+        """Validate ConfigRequest parameters and add a row."""
+        if not isinstance(parameters, dict) or not parameters.keys() <= self.__parameters:
+            raise TypeError('{} are not ConfigRequest parameters.'.format(parameters))
+        url = parameters.get('url')
+        if not isinstance(url, str) or '${' in url or parameters.get('feed') or \
+                parameters.get('body_type', DEFAULT_BODY_TYPE) != DEFAULT_BODY_TYPE:
+            return self.append_request(ConfigRequest(**parameters))
+        # repr keeps key order and types of values, so equal keys give equal bullets
+        port, weight = parameters.get('port', 80), parameters.get('weight', 1)
+        key = (parameters.get('host'), parameters.get('method'), port, type(port),
+               repr(parameters.get('extra_headers')), repr(parameters.get('body')),
+               weight, type(weight), parameters.get('connection'), repr(parameters.get('default_headers')),
+               bool(parameters.get('literal')))
+        shape_id = self.shape_numbers.get(key)
+        if shape_id is None:
+            request = ConfigRequest(**parameters)
+            if request.generators:
+                return self.append_request(request)
+            shape = dict(request.__dict__)
+            del shape['url'], shape['case']
+            shape_id = self.shape_numbers[key] = len(self.shapes)
+            self.shapes.append(shape)
+        self.shape_ids.append(shape_id)
+        self.case_ids.append(self.case_id(parameters.get('case')))
+        self.urls.append(url)
+
+    def append_request(self, request: ConfigRequest):
+        """Add a row with ConfigRequest as is."""
+        self.requests[len(self.urls)] = request
+        self.shape_ids.append(0)
+        self.case_ids.append(-1)
+        self.urls.append(None)
+
+    def case_id(self, case) -> int:
+        """Return number of an interned case, -1 if case is not set (url is the case)."""
+        if not case:
+            return -1
+        case_id = self.case_numbers.get(case)
+        if case_id is None:
+            case_id = self.case_numbers[case] = len(self.cases)
+            self.cases.append(case)
+        return case_id
+
+    def __len__(self):
+        """Return number of requests."""
+        return len(self.urls)
+
+    def __getitem__(self, number: int) -> ConfigRequest:
+        """Return ConfigRequest of a row."""
+        url = self.urls[number]
+        if url is None:
+            return self.requests[number % len(self.urls)]
+        # parameters are already validated, attributes are set without descriptors
+        request = ConfigRequest.__new__(ConfigRequest)
+        state = request.__dict__
+        state.update(self.shapes[self.shape_ids[number]])
+        case_id = self.case_ids[number]
+        state['url'] = url
+        state['case'] = self.cases[case_id] if case_id >= 0 else url
+        return request
+
+    def __iter__(self):
+        """Yield ConfigRequest of each row."""
+        for number in range(len(self.urls)):
+            yield self[number]
+
+    def shape_rows(self):
+        """Yield (shape number, url, case) of each row without creating ConfigRequest instances.
+
+        Shape number, url and case are None for a row kept as ConfigRequest.
+        """
+        cases = self.cases
+        for url, shape_id, case_id in zip(self.urls, self.shape_ids, self.case_ids):
+            if url is None:
+                yield None, None, None
+            else:
+                yield shape_id, url, cases[case_id] if case_id >= 0 else url
 
 
 class ConfigRequestType:
@@ -45,10 +301,15 @@ class ConfigRequestType:
         self.name = name
 
     def __set__(self, instance, raw_values_list: list):
-        """Check that raw_value_list is a list and create ConfigRequest instance for each list element."""
-        if isinstance(raw_values_list, list):
+        """Check that raw_value_list is a list and create RequestTable of its elements.
+
+        JsonlRequestSource is set as is, its requests are validated while they are read.
+        """
+        if isinstance(raw_values_list, JsonlRequestSource):
+            instance.__dict__[self.name] = raw_values_list
+        elif isinstance(raw_values_list, list):
             try:
-                instance.__dict__[self.name] = [ConfigRequest(**value) for value in raw_values_list]
+                instance.__dict__[self.name] = RequestTable(raw_values_list)
             except TypeError as E:
                 print(E)
                 raise TypeError('{} contains bad parameters.'.format(self.name))
@@ -65,7 +326,7 @@ class AmmoConfig(Config):
 
     Factory parameters:
         ammo_file: path to a file where results should be saved
-        requests: list of a request-hashes from config
+        requests: list of a request-hashes from config, kept in RequestTable
             "REQUESTS": [
                 {
                   "host": "127.0.0.1",      # request host parameter (where load generator will shoot).
@@ -75,9 +336,51 @@ class AmmoConfig(Config):
                   "extra_headers": {}       # additional request headers.
                   "body": "user=user"       # body string (json-type)
                   "port": 443               # port where handler runs. default value is 80. int.
+                  "feed": "users.csv"       # CSV/JSONL data feed for ${column} placeholders. optional.
+                  "weight": 70              # share of the request in a mix of total_bullets. default value is 1.
+                  "connection": "close"     # connection profile of the request. optional.
+                  "default_headers": {}     # default headers overrides of the request. optional.
+                  "body_type": "json"       # json, raw, form or multipart. default value is json.
+                  "literal": false          # true - ${...} in url, headers and body is not replaced. optional.
                 }
             ]
 
+    ammo_type: phantom, uri (GET requests, headers are written once) or uripost (POST requests, headers are written
+               once). default value is phantom.
+    connection: close or keep-alive - Connection header of bullets. default value is close.
+    default_headers: overrides of default bullet headers (User-Agent, Accept, Content-Type, Connection),
+                     null value removes a header. default value is {}.
+    shards: number of ammo files bullets are split to, for several tank nodes. default value is 1.
+    shard_strategy: round-robin, byte-balanced or hash-by-case. default value is round-robin.
+    write_buffer_size: size of an ammo file write chunk in bytes. default value is 4 MiB.
+    workers: number of rendering processes. default value is 1 (render in the current process).
+    chunk_size: number of requests rendered by a worker process at once. default value is 1000.
+    total_bullets: number of bullets sampled from requests by weight. default value is 0 (one bullet per request).
+    seed: random generator seed for the request mix. default value is 0.
+    compression: ammo file compression: gzip or xz. by default it is chosen by ammo_file extension (.gz, .xz).
+    compression_workers: number of threads compressing independent blocks in parallel. default value is 1.
+    requests_file: path to a JSONL file with one request-hash (like REQUESTS element) per line. replaces requests.
+                   requests are read and validated lazily while ammo is generated.
+    cache_dir: directory for rendered segments of requests, unchanged requests are not rendered again.
+               default value is '' (no cache).
+    access_log: access log import parameters, see AccessLogImporter. requests are taken from the log if it is set.
+        "ACCESS_LOG": {
+            "file_path": "access.log.gz",  # nginx/Apache combined format access log, plain or gzip.
+            "host": "127.0.0.1",           # request host parameter.
+            "port": 80,                    # request port. optional.
+            "methods": ["GET"],            # allowed methods. optional.
+            "statuses": [200],             # allowed response statuses. optional.
+            "url_pattern": "^/api/",       # regular expression for urls. optional.
+            "sample_rate": 0.1             # share of matched lines to import. optional.
+        }
+    har: HAR file import parameters, see HarImporter. requests are taken from the HAR file if it is set.
+        "HAR": {
+            "file_path": "session.har",     # HAR file recorded by a browser.
+            "header_allow": ["Authorization"],  # headers to keep. optional.
+            "header_deny": ["Cookie"],      # headers to drop. optional.
+            "url_pattern": "^/api/"         # regular expression for urls. optional.
+        }
+
     script logging:
         log_date_fmt: log date format (only str)
         log_fmt: log format (only str)
@@ -86,6 +389,45 @@ class AmmoConfig(Config):
 
     requests = ConfigRequestType('requests')
     ammo_file = StringType('ammo_file')
+    ammo_type = StringType('ammo_type')
+    connection = ConnectionType('connection')
+    default_headers = DictType('default_headers')
+    shards = IntType('shards')
+    shard_strategy = StringType('shard_strategy')
+    write_buffer_size = IntType('write_buffer_size')
+    workers = IntType('workers')
+    chunk_size = IntType('chunk_size')
+    total_bullets = IntType('total_bullets')
+    seed = IntType('seed')
+    compression = StringType('compression')
+    compression_workers = IntType('compression_workers')
+    requests_file = StringType('requests_file')
+    cache_dir = StringType('cache_dir')
+    access_log = DictType('access_log')
+    har = DictType('har')
+
+    def __init__(self, config_file: str = None):
+        """Set default values of optional parameters and load configuration from config_file."""
+        self.ammo_type = DEFAULT_AMMO_TYPE
+        self.connection = DEFAULT_CONNECTION
+        self.default_headers = dict()
+        self.shards = 1
+        self.shard_strategy = DEFAULT_SHARD_STRATEGY
+        self.write_buffer_size = DEFAULT_BUFFER_SIZE
+        self.workers = DEFAULT_WORKERS
+        self.chunk_size = DEFAULT_CHUNK_SIZE
+        self.total_bullets = 0
+        self.seed = 0
+        self.compression = ''
+        self.compression_workers = 1
+        self.cache_dir = ''
+        self.access_log = dict()
+        self.har = dict()
+        self.requests = list()
+        self.requests_file = ''
+        super().__init__(config_file)
+        if self.requests_file:
+            self.requests = JsonlRequestSource(self.requests_file)
 
     @property
     def template_blueprint(self):
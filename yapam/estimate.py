@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""Ammo size and generation time estimate.
+
+Armory.estimate fills AmmoEstimate by rendering bullet sizes only, nothing is written.
+Sizes of requests without a data feed and generator expressions are computed from compiled templates,
+sizes of other requests may be extrapolated from a sample of bullets, such cases are marked as not exact.
+Render time of requests without a data feed and generator expressions is measured for a sample of them.
+
+Example of usage:
+    report = Armory(user_config.requests, user_config.ammo_file, user_config.log).estimate()
+    print(report['bullets'], report['bytes'], report['estimated_seconds'])
+"""
+
+
+class CaseEstimate:
+    """Estimate of a test case."""
+
+    __slots__ = ('bullets', 'bytes', 'exact')
+
+    def __init__(self):
+        """Create zero counters."""
+        self.bullets = 0
+        self.bytes = 0
+        self.exact = True
+
+
+class TimeSample:
+    """Render time of requests measured for a sample of them and extrapolated to all bullets.
+
+    If the number of requests is known, every (requests // sample_size)-th request is timed,
+    otherwise all of the first sample_size requests are timed, then every (number // sample_size)-th request,
+    so the number of timed requests grows logarithmically.
+    """
+
+    __slots__ = ('sample_size', 'step', 'requests', 'bullets', 'sampled_bullets', 'sampled_seconds')
+
+    def __init__(self, sample_size: int, total: int = None):
+        """Create empty sample, total is the number of requests if it is known."""
+        self.sample_size = max(sample_size, 1)
+        self.step = max(total // self.sample_size, 1) if total is not None else None
+        self.requests = 0
+        self.bullets = 0
+        self.sampled_bullets = 0
+        self.sampled_seconds = 0.0
+
+    def count(self, bullets: int) -> bool:
+        """Count a request of bullets, return True if it should be timed."""
+        self.requests += 1
+        self.bullets += bullets
+        if self.step is not None:
+            return not (self.requests - 1) % self.step
+        return self.requests <= self.sample_size or not self.requests % (self.requests // self.sample_size)
+
+    def add(self, bullets: int, seconds: float):
+        """Add render time of a timed request of bullets."""
+        self.sampled_bullets += bullets
+        self.sampled_seconds += seconds
+
+    @property
+    def seconds(self) -> float:
+        """Render time of all bullets."""
+        return self.sampled_seconds * self.bullets / self.sampled_bullets if self.sampled_bullets else 0.0
+
+
+class AmmoEstimate:
+    """Bullets and bytes of each case and render time of an ammo."""
+
+    def __init__(self):
+        """Create empty estimate."""
+        self.cases = dict()
+        self.render_seconds = 0.0
+
+    def add(self, case: str, bullets: int, size: int, exact: bool = True, render_seconds: float = 0.0):
+        """Add bullets of a case.
+
+        size:           bytes of all bullets.
+        exact:          False if size is extrapolated.
+        render_seconds: time of rendering all bullets.
+        """
+        counters = self.cases.get(case)
+        if counters is None:
+            counters = self.cases[case] = CaseEstimate()
+        counters.bullets += bullets
+        counters.bytes += size
+        counters.exact = counters.exact and exact
+        self.render_seconds += render_seconds
+
+    def report(self, workers: int = 1, **extra) -> dict:
+        """Totals and cases as a JSON-serializable dict.
+
+        workers:  number of rendering processes, render time is divided between them.
+        extra:    additional top-level values.
+        """
+        report = {'bullets': sum(counters.bullets for counters in self.cases.values()),
+                  'bytes': sum(counters.bytes for counters in self.cases.values()),
+                  'exact': all(counters.exact for counters in self.cases.values()),
+                  'estimated_seconds': self.render_seconds / workers,
+                  'cases': {case: {'bullets': counters.bullets,
+                                   'bytes': counters.bytes,
+                                   'exact': counters.exact}
+                            for case, counters in self.cases.items()}}
+        report.update(extra)
+        return report
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""Data feeds for parameterized requests.
+
+Request url, body and extra_headers values may contain ${column} placeholders
+(and ${name(args)} generator expressions, see yapam.generators).
+Each feed row produces a separate bullet, rows are read one at a time.
+
+Example of usage:
+    feed = DataFeed('users.csv')
+    for row in feed:
+        url = render('/users/${user_id}', row)
+"""
+
+import csv
+import io
+import json
+import os
+import re
+
+# ${column} or ${generator(args)}
+PLACEHOLDER = re.compile(r'\$\{([A-Za-z_][A-Za-z0-9_]*(?:\([^)}]*\))?)\}')
+
+
+def render(value, row: dict):
+    """Replace ${column} placeholders in value with row values.
+
+    value: str, dict or list (nested values are rendered too).
+    row:   feed row.
+    If the whole str value is a single placeholder, row value is returned as is (keeps JSONL types).
+    """
+    if isinstance(value, str):
+        if '${' not in value:
+            return value
+        match = PLACEHOLDER.fullmatch(value)
+        if match:
+            return row_value(row, match.group(1))
+        return PLACEHOLDER.sub(lambda m: str(row_value(row, m.group(1))), value)
+    if isinstance(value, dict):
+        return {key: render(val, row) for key, val in value.items()}
+    if isinstance(value, list):
+        return [render(val, row) for val in value]
+    return value
+
+
+def row_value(row: dict, column: str):
+    """Return row value for a placeholder column."""
+    try:
+        return row[column]
+    except KeyError:
+        raise ValueError('Feed column {} not found.'.format(column))
+
+
+class DataFeed:
+    """Lazy CSV/JSONL data feed.
+
+    file_path: path to .csv (with header line) or .jsonl (one JSON object per line) file.
+    """
+
+    __extensions = frozenset(['.csv', '.jsonl'])
+
+    def __init__(self, file_path: str):
+        """Check that feed file exists and has a supported extension."""
+        if not isinstance(file_path, str):
+            raise TypeError('{val} is not a {val_type}'.format(val=file_path, val_type=str))
+        if not os.path.isfile(file_path):
+            raise FileNotFoundError('File {} not exists.'.format(file_path))
+        __, file_ext = os.path.splitext(file_path)
+        if file_ext not in self.__extensions:
+            raise TypeError('{} is not a CSV or JSONL file.'.format(file_path))
+        self.file_path = file_path
+        self.file_ext = file_ext
+
+    def __iter__(self):
+        """Read feed rows one by one."""
+        with io.open(self.file_path, mode='r', encoding='utf-8', newline='') as feed_file:
+            if self.file_ext == '.csv':
+                yield from csv.DictReader(feed_file)
+                return
+            for line in feed_file:
+                if line.strip():
+                    yield json.loads(line)
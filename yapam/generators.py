@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+"""Value generators for dynamic bullet fields.
+
+Request url, body and extra_headers values may contain ${name(args)} generator expressions:
+    ${seq()}, ${seq(1000, 2)}     sequential integers from start (default 0) with step (default 1).
+    ${randint(1, 100)}           random integer from the range, both ends included.
+    ${uuid()}                    random UUID4 string.
+    ${timestamp()}, ${timestamp(ms)}  current unix time in seconds or milliseconds.
+    ${choice(a, b, c)}, ${choice(@tokens.txt)}  random pick from a token pool (or from lines of a file).
+The same expression gives the same value in all fields of a bullet.
+Values are drawn in growing batches from a seeded random generator, the same seed gives the same values.
+
+Example of usage:
+    generators = compile_generators('/users/${seq(1)}', {'token': '${choice(@tokens.txt)}'})
+    for row in ValueStream(generators, seed=1):
+        url = render('/users/${seq(1)}', row)
+"""
+
+import io
+import random
+import time
+
+from yapam.feed import PLACEHOLDER
+
+BATCH_SIZE = 10000
+MIN_BATCH_SIZE = 16
+UUID_VARIANTS = '89ab89ab89ab89ab'
+
+
+class Generator:
+    """Generator expression: values of a bullet field.
+
+    args: list of expression arguments as strings.
+    cacheable: False if values of the same seed change between runs, such segments are always rendered again.
+    """
+
+    cacheable = True
+
+    def __init__(self, args: list):
+        """Parse arguments."""
+        if args:
+            raise ValueError('{} does not take arguments.'.format(self.name))
+
+    @property
+    def name(self) -> str:
+        """Generator name in expressions."""
+        return type(self).__name__.lower()
+
+    def batch(self, rand: random.Random, position: int, size: int) -> list:
+        """Return size values.
+
+        rand:     seeded random generator of the stream.
+        position: number of values drawn before.
+        """
+        raise NotImplementedError
+
+    @staticmethod
+    def int_args(args: list, name: str) -> list:
+        """Convert arguments to int."""
+        try:
+            return [int(arg) for arg in args]
+        except ValueError:
+            raise ValueError('{} arguments should be integers: {}.'.format(name, ', '.join(args)))
+
+
+class Seq(Generator):
+    """Sequential integers: seq(start=0, step=1)."""
+
+    def __init__(self, args: list):
+        """Parse start and step."""
+        if len(args) > 2:
+            raise ValueError('seq takes start and step arguments only.')
+        self.start, self.step = (self.int_args(args, 'seq') + [0, 1][len(args):])
+
+    def batch(self, rand: random.Random, position: int, size: int) -> list:
+        """Return next size integers of the sequence."""
+        start = self.start + position * self.step
+        return list(range(start, start + size * self.step, self.step)) if self.step else [start] * size
+
+
+class RandInt(Generator):
+    """Random integers: randint(a, b), a <= value <= b."""
+
+    def __init__(self, args: list):
+        """Parse range ends."""
+        if len(args) != 2:
+            raise ValueError('randint takes 2 arguments: a and b.')
+        a, b = self.int_args(args, 'randint')
+        if a > b:
+            raise ValueError('randint range is empty: {} > {}.'.format(a, b))
+        self.values = range(a, b + 1)
+
+    def batch(self, rand: random.Random, position: int, size: int) -> list:
+        """Return size random integers."""
+        return rand.choices(self.values, k=size)
+
+
+class Uuid(Generator):
+    """Random UUID4 strings: uuid()."""
+
+    def batch(self, rand: random.Random, position: int, size: int) -> list:
+        """Return size UUID4 strings made from one block of random bits."""
+        hex_str = '{:0{width}x}'.format(rand.getrandbits(128 * size), width=32 * size)
+        values = list()
+        for start in range(0, 32 * size, 32):
+            h = hex_str[start:start + 32]
+            # version 4 and RFC 4122 variant bits
+            values.append('{}-{}-4{}-{}{}-{}'.format(h[:8], h[8:12], h[13:16], UUID_VARIANTS[int(h[16], 16)],
+                                                     h[17:20], h[20:]))
+        return values
+
+
+class Timestamp(Generator):
+    """Current unix time: timestamp() in seconds or timestamp(ms) in milliseconds.
+
+    Time is read once for each batch.
+    """
+
+    cacheable = False
+
+    def __init__(self, args: list):
+        """Parse time unit."""
+        if args not in ([], ['s'], ['ms']):
+            raise ValueError('timestamp unit should be s or ms.')
+        self.multiplier = 1000 if args == ['ms'] else 1
+
+    def batch(self, rand: random.Random, position: int, size: int) -> list:
+        """Return size current timestamps."""
+        return [int(time.time() * self.multiplier)] * size
+
+
+class Choice(Generator):
+    """Random picks from a token pool: choice(a, b, c) or choice(@file) with one token per line."""
+
+    def __init__(self, args: list):
+        """Parse tokens or load them from a file."""
+        if len(args) == 1 and args[0].startswith('@'):
+            with io.open(args[0][1:], mode='r', encoding='utf-8') as tokens_file:
+                args = [line.rstrip('\r\n') for line in tokens_file if line.strip()]
+        if not args:
+            raise ValueError('choice token pool is empty.')
+        self.tokens = args
+
+    def batch(self, rand: random.Random, position: int, size: int) -> list:
+        """Return size random tokens."""
+        return rand.choices(self.tokens, k=size)
+
+
+GENERATORS = {generator.__name__.lower(): generator for generator in (Seq, RandInt, Uuid, Timestamp, Choice)}
+
+
+def compile_expression(expression: str) -> Generator:
+    """Return Generator for an expression like randint(1, 100)."""
+    name, __, args = expression.partition('(')
+    if name not in GENERATORS:
+        raise ValueError('Unknown generator {}, available generators: {}.'.format(name, ', '.join(GENERATORS)))
+    args = [arg.strip() for arg in args[:-1].split(',')] if args[:-1].strip() else list()
+    return GENERATORS[name](args)
+
+
+def find_expressions(value) -> set:
+    """Return generator expressions used in value (str, dict or list, nested values are checked too)."""
+    if isinstance(value, str):
+        if '${' not in value:
+            return set()
+        return {expression for expression in PLACEHOLDER.findall(value) if expression.endswith(')')}
+    if isinstance(value, dict):
+        return set().union(*(find_expressions(val) for val in value.values()))
+    if isinstance(value, list):
+        return set().union(*(find_expressions(val) for val in value))
+    return set()
+
+
+def compile_generators(*values) -> dict:
+    """Return Generator for each generator expression used in values."""
+    return {expression: compile_expression(expression)
+            for expression in sorted(set().union(*(find_expressions(value) for value in values)))}
+
+
+class ValueStream:
+    """Infinite iterator of rows with generated values: {expression: value}.
+
+    generators: dict of expression and Generator, see compile_generators.
+    seed:       random generator seed, same seed gives the same values.
+    batch_size: maximum number of values drawn from each generator at once.
+                Batches grow from MIN_BATCH_SIZE, so a stream used for a few bullets draws a few values.
+    position:   number of rows taken from the stream.
+    """
+
+    def __init__(self, generators: dict, seed=0, batch_size: int = BATCH_SIZE):
+        """Set stream parameters."""
+        if not generators:
+            raise ValueError('generators should not be empty.')
+        self.generators = generators
+        self.seed = seed
+        self.batch_size = batch_size
+        self.position = 0
+        self.__rand = random.Random(seed)
+        self.__expressions = list(generators)
+        self.__rows = iter(())
+        self.__drawn = 0
+
+    def __iter__(self):
+        """Return the stream itself, rows are taken from the current position."""
+        return self
+
+    def __next__(self) -> dict:
+        """Return next row, values are drawn in batches when previous batch is used up."""
+        row = next(self.__rows, None)
+        if row is None:
+            size = min(self.batch_size, max(MIN_BATCH_SIZE, self.__drawn))
+            columns = [generator.batch(self.__rand, self.__drawn, size) for generator in self.generators.values()]
+            self.__rows = (dict(zip(self.__expressions, values)) for values in zip(*columns))
+            self.__drawn += size
+            row = next(self.__rows)
+        self.position += 1
+        return row
+
+    def skip(self, count: int):
+        """Take count rows without using them."""
+        for __ in range(count):
+            next(self)
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""HAR (HTTP Archive) importer.
+
+Converts browser session recordings to requests for Armory.
+log.entries array is parsed incrementally one entry at a time, the whole file is never loaded.
+
+Example of usage:
+    requests = HarImporter('session.har', header_deny=['cookie'])
+    Armory(requests, 'ammo', logger).generate_ammo()
+"""
+
+import io
+import json
+import re
+from urllib.parse import urlsplit
+
+from dav_utils.descriptors import HttpMethod
+
+from yapam.body import DEFAULT_BODY_TYPE
+from yapam.config import ConfigRequest
+from yapam.phantom import canonical_header
+
+ENTRIES_START = re.compile(r'"entries"\s*:\s*\[')
+READ_SIZE = 1024 * 1024
+# headers generated by PhantomAmmo
+GENERATED_HEADERS = frozenset(['host', 'content-length'])
+
+
+def iter_entries(file_path: str, read_size: int = READ_SIZE):
+    """Yield log.entries elements of a HAR file one by one."""
+    decoder = json.JSONDecoder()
+    with io.open(file_path, mode='r', encoding='utf-8-sig') as har_file:
+        buffer = ''
+        # find the start of entries array
+        while True:
+            chunk = har_file.read(read_size)
+            if not chunk:
+                return
+            buffer += chunk
+            match = ENTRIES_START.search(buffer)
+            if match:
+                buffer = buffer[match.end():]
+                break
+            # keep the tail, "entries" may be split between chunks
+            buffer = buffer[-64:]
+
+        position = 0
+        more = read_size
+        eof = False
+        while True:
+            while position < len(buffer) and buffer[position] in ' \t\r\n,':
+                position += 1
+            if position < len(buffer) and buffer[position] == ']':
+                return
+            try:
+                entry, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if eof:
+                    raise ValueError('{} is not a valid HAR file.'.format(file_path))
+                # entry is not complete yet, read more (twice as much as before for large entries)
+                chunk = har_file.read(more)
+                more *= 2
+                eof = not chunk
+                buffer = buffer[position:] + chunk
+                position = 0
+                continue
+            yield entry
+            position = end
+            more = read_size
+
+
+class HarImporter:
+    """Iterable of ConfigRequest instances made from HAR entries.
+
+    file_path:    path to the HAR file.
+    header_allow: list of header names to keep. default value is None (all headers).
+    header_deny:  list of header names to drop. Host, Content-Length and HTTP/2 pseudo-headers are always dropped.
+    url_pattern:  regular expression, only matching urls are imported. default value is None (all urls).
+    Test case tag is the url path without query string. Header names are canonical, so they replace default headers.
+    Requests are literal, ${...} in recorded urls, headers and bodies is never replaced.
+    JSON object bodies are kept as json, other bodies are kept as raw text with the HAR mimeType
+    and counted in raw_bodies. Entries with other request methods or bad values are counted in skipped.
+    """
+
+    def __init__(self, file_path: str, header_allow: list = None, header_deny: list = None, url_pattern: str = None):
+        """Set importer parameters."""
+        self.file_path = file_path
+        self.header_allow = frozenset(name.lower() for name in header_allow) if header_allow else None
+        self.header_deny = frozenset(name.lower() for name in header_deny) if header_deny else frozenset()
+        self.url_pattern = re.compile(url_pattern) if url_pattern else None
+        self.imported = 0
+        self.skipped = 0
+        self.raw_bodies = 0
+
+    def headers(self, har_headers: list) -> dict:
+        """Filter HAR request headers."""
+        headers = dict()
+        for header in har_headers:
+            name = header.get('name', '')
+            key = name.lower()
+            if not name or name.startswith(':') or key in GENERATED_HEADERS or key in self.header_deny:
+                continue
+            if self.header_allow is not None and key not in self.header_allow:
+                continue
+            headers[canonical_header(name)] = header.get('value', '')
+        return headers
+
+    def body(self, post_data: dict) -> tuple:
+        """Return HAR request body and body type: a JSON object as json, other text as raw."""
+        text = post_data.get('text') if post_data else None
+        if not text:
+            return dict(), DEFAULT_BODY_TYPE
+        try:
+            body = json.loads(text)
+        except ValueError:
+            body = None
+        if not isinstance(body, dict):
+            self.raw_bodies += 1
+            return {'text': text, 'content_type': post_data.get('mimeType') or 'text/plain'}, 'raw'
+        return body, DEFAULT_BODY_TYPE
+
+    def __iter__(self):
+        """Yield ConfigRequest for each HAR entry."""
+        for entry in iter_entries(self.file_path):
+            har_request = entry.get('request', dict())
+            method = har_request.get('method', '').upper()
+            url = urlsplit(har_request.get('url', ''))
+            if method not in HttpMethod.http_methods or not url.hostname:
+                self.skipped += 1
+                continue
+            path = url.path if url.path else '/'
+            full_path = path + '?' + url.query if url.query else path
+            if self.url_pattern is not None and not self.url_pattern.search(full_path):
+                continue
+            body, body_type = self.body(har_request.get('postData'))
+            try:
+                request = ConfigRequest(host=url.hostname,
+                                        url=full_path,
+                                        method=method,
+                                        case=path,
+                                        port=url.port if url.port else (443 if url.scheme == 'https' else 80),
+                                        extra_headers=self.headers(har_request.get('headers', list())),
+                                        body=body,
+                                        body_type=body_type,
+                                        literal=True)
+            except (TypeError, ValueError):
+                # bad port of the url or bad values of the entry
+                self.skipped += 1
+                continue
+            self.imported += 1
+            yield request
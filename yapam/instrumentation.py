@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""Generation run instrumentation: per-phase timers and per-case counters.
+
+Disabled instrumentation (NULL_INSTRUMENTATION) does nothing, Armory checks enabled once per run
+and uses a loop without timers in this case.
+
+Example of usage:
+    instrumentation = Instrumentation()
+    with instrumentation.phase('config'):
+        user_config = AmmoConfig('config.json')
+    Armory(user_config.requests, user_config.ammo_file, user_config.log, instrumentation=instrumentation).generate_ammo()
+    instrumentation.save('report.json')
+"""
+
+import io
+import json
+import time
+from contextlib import contextmanager
+
+
+class CaseCounters:
+    """Counters of a test case."""
+
+    __slots__ = ('bullets', 'bytes', 'render_seconds')
+
+    def __init__(self):
+        """Create zero counters."""
+        self.bullets = 0
+        self.bytes = 0
+        self.render_seconds = 0.0
+
+
+class Instrumentation:
+    """Timers and counters of a generation run."""
+
+    enabled = True
+
+    def __init__(self):
+        """Create empty timers and counters."""
+        self.phases = dict()
+        self.cases = dict()
+
+    @contextmanager
+    def phase(self, name: str):
+        """Measure time of a phase. Time of the same phase is summed up."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - started)
+
+    def add_time(self, name: str, seconds: float):
+        """Add seconds to a phase timer."""
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def count(self, case: str, size: int, render_seconds: float, bullets: int = 1):
+        """Count rendered bullets of a case, size is bytes of all of them."""
+        counters = self.cases.get(case)
+        if counters is None:
+            counters = self.cases[case] = CaseCounters()
+        counters.bullets += bullets
+        counters.bytes += size
+        counters.render_seconds += render_seconds
+
+    def report(self) -> dict:
+        """Timers and counters as a JSON-serializable dict."""
+        return {'phases': dict(self.phases),
+                'cases': {case: {'bullets': counters.bullets,
+                                 'bytes': counters.bytes,
+                                 'render_seconds': counters.render_seconds}
+                          for case, counters in self.cases.items()}}
+
+    def save(self, file_path: str, **extra):
+        """Save report (and extra top-level values) to a JSON file."""
+        report = self.report()
+        report.update(extra)
+        with io.open(file_path, mode='w', encoding='utf-8') as report_file:
+            json.dump(report, report_file, indent=2, ensure_ascii=False)
+
+
+class NullInstrumentation(Instrumentation):
+    """Disabled instrumentation."""
+
+    enabled = False
+
+    @contextmanager
+    def phase(self, name: str):
+        """Do not measure anything."""
+        yield
+
+    def add_time(self, name: str, seconds: float):
+        """Do not measure anything."""
+
+    def count(self, case: str, size: int, render_seconds: float, bullets: int = 1):
+        """Do not count anything."""
+
+
+NULL_INSTRUMENTATION = NullInstrumentation()
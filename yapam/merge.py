@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+"""Merge of Phantom ammo files.
+
+Bullets are found by the Phantom framing (see yapam.reader) and copied to the output unchanged,
+requests are never parsed. Inputs are mapped to memory, so memory usage does not depend on their size:
+    concat:     inputs one after another.
+    interleave: bullets are taken from inputs by ratios, e.g. ratios 3 and 1 give A A A B A A A B...
+                An exhausted input is skipped, so the rest of longer inputs follows at the end.
+With window > 1 merged bullets are shuffled within a window of this number of bullets.
+
+Example of usage:
+    merger = AmmoMerger(['auth_ammo', 'catalog_ammo'], mode='interleave', ratios=[1, 4], window=10000, seed=1)
+    merger.merge('ammo')
+"""
+
+import os
+import random
+from itertools import islice
+
+from yapam.reader import AmmoReader, iter_frames
+from yapam.writer import AmmoWriter, DEFAULT_BUFFER_SIZE
+
+MERGE_MODES = ('concat', 'interleave')
+DEFAULT_MERGE_MODE = 'concat'
+
+
+def input_bullets(reader: AmmoReader):
+    """Yield encoded bullets (with separators) of an ammo file."""
+    buffer = reader.buffer
+    try:
+        for frame in iter_frames(buffer):
+            yield buffer[frame.offset:frame.next]
+    except ValueError as err:
+        raise ValueError('{path}: {err}'.format(path=reader.file_path, err=err))
+
+
+def interleave(iterables: list, ratios: list):
+    """Yield (number of iterable, item) taking items by ratios (smooth weighted round-robin)."""
+    iterators = [iter(iterable) for iterable in iterables]
+    active = list(range(len(iterators)))
+    current = [0] * len(iterators)
+    total = sum(ratios)
+    while active:
+        for number in active:
+            current[number] += ratios[number]
+        number = max(active, key=current.__getitem__)
+        current[number] -= total
+        item = next(iterators[number], None)
+        if item is None:
+            active.remove(number)
+            total -= ratios[number]
+            continue
+        yield number, item
+
+
+def shuffle_window(iterable, window: int, seed=0):
+    """Yield items of iterable shuffled within a window of items."""
+    rand = random.Random(seed)
+    iterator = iter(iterable)
+    items = list(islice(iterator, window))
+    for item in iterator:
+        position = rand.randrange(len(items))
+        yield items[position]
+        items[position] = item
+    rand.shuffle(items)
+    yield from items
+
+
+class AmmoMerger:
+    """Merge Phantom ammo files into one ammo file.
+
+    file_paths: paths to input ammo files.
+    mode:       concat or interleave.
+    ratios:     number of bullets taken from each input in turn in interleave mode. default value is 1 for each input.
+    window:     number of bullets shuffled together. 0 or 1 means bullets are not shuffled.
+    seed:       random generator seed for shuffling, the same seed gives the same file.
+    """
+
+    def __init__(self, file_paths: list, mode: str = DEFAULT_MERGE_MODE, ratios: list = None, window: int = 0,
+                 seed: int = 0):
+        """Check merge parameters and that input files exist."""
+        if not file_paths:
+            raise ValueError('file_paths should not be empty.')
+        if mode not in MERGE_MODES:
+            raise ValueError('{} is not one of merge modes: {}.'.format(mode, ', '.join(MERGE_MODES)))
+        ratios = list(ratios) if ratios else [1] * len(file_paths)
+        if len(ratios) != len(file_paths) or any(not isinstance(ratio, int) or ratio < 1 for ratio in ratios):
+            raise ValueError('ratios should be positive integers, one for each input file.')
+        if window < 0:
+            raise ValueError('window should not be negative.')
+        for file_path in file_paths:
+            if not os.path.isfile(file_path):
+                raise FileNotFoundError('File {} not exists.'.format(file_path))
+        self.file_paths = list(file_paths)
+        self.mode = mode
+        self.ratios = ratios
+        self.window = window
+        self.seed = seed
+        self.stats = dict()
+
+    def merge(self, file_path: str, buffer_size: int = DEFAULT_BUFFER_SIZE, compression: str = None) -> dict:
+        """Write merged ammo to a file (or a FIFO, Unix socket), return AmmoWriter stats and bullets of each input.
+
+        compression: gzip, xz or None. If None, compression is chosen by file_path extension (.gz, .xz).
+        """
+        if os.path.exists(file_path) and any(os.path.samefile(file_path, path) for path in self.file_paths):
+            # output would be truncated while it is mapped to memory
+            raise ValueError('Output {} is one of input files.'.format(file_path))
+        readers = list()
+        try:
+            for path in self.file_paths:
+                readers.append(AmmoReader(path))
+            counts = [0] * len(readers)
+            with AmmoWriter(file_path, buffer_size, compression) as writer:
+                if self.mode == 'concat' and self.window <= 1:
+                    for number, reader in enumerate(readers):
+                        counts[number] = sum(1 for __ in input_bullets(reader))
+                        # the whole mapped file is written at once
+                        with memoryview(reader.buffer) as data:
+                            writer.write(data, counts[number])
+                else:
+                    for number, bullet in self.bullets(readers):
+                        counts[number] += 1
+                        writer.write(bullet)
+        finally:
+            for reader in readers:
+                reader.close()
+        self.stats = dict(writer.stats, inputs=[{'file': path, 'bullets': count}
+                                                for path, count in zip(self.file_paths, counts)])
+        return self.stats
+
+    def bullets(self, readers: list):
+        """Yield (number of input, encoded bullet) in the merged order."""
+        if self.mode == 'interleave':
+            bullets = interleave([input_bullets(reader) for reader in readers], self.ratios)
+        else:
+            bullets = ((number, bullet) for number, reader in enumerate(readers) for bullet in input_bullets(reader))
+        if self.window > 1:
+            bullets = shuffle_window(bullets, self.window, self.seed)
+        return bullets
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""Weighted request mix.
+
+Example of usage:
+    sampler = WeightedSampler([70, 25, 5], seed=42)
+    for index in sampler.sample(1000000):
+        request = requests[index]
+"""
+
+import random
+
+
+class WeightedSampler:
+    """Constant-time weighted sampling (Vose's alias method).
+
+    weights: positive weights of the items.
+    seed:    random generator seed, same seed gives the same sequence.
+    """
+
+    def __init__(self, weights: list, seed: int = 0):
+        """Build probability and alias tables."""
+        if not weights:
+            raise ValueError('weights should not be empty.')
+        if any(weight <= 0 for weight in weights):
+            raise ValueError('weights should be positive numbers.')
+        self.random = random.Random(seed)
+        size = len(weights)
+        total = float(sum(weights))
+        scaled = [weight * size / total for weight in weights]
+        self.probability = [1.0] * size
+        self.alias = list(range(size))
+
+        small = [index for index, value in enumerate(scaled) if value < 1.0]
+        large = [index for index, value in enumerate(scaled) if value >= 1.0]
+        while small and large:
+            less, more = small.pop(), large.pop()
+            self.probability[less] = scaled[less]
+            self.alias[less] = more
+            scaled[more] = scaled[more] + scaled[less] - 1.0
+            if scaled[more] < 1.0:
+                small.append(more)
+            else:
+                large.append(more)
+        # leftovers are equal to 1.0 up to float rounding
+        for index in small + large:
+            self.probability[index] = 1.0
+
+    def sample(self, count: int):
+        """Yield count item indexes."""
+        size = len(self.probability)
+        probability, alias, rand = self.probability, self.alias, self.random.random
+        for __ in range(count):
+            position = rand() * size
+            index = int(position)
+            yield index if position - index < probability[index] else alias[index]
@@ -1,8 +1,18 @@
 # -*- coding: utf-8 -*-
 """Ammo for phantom load generator."""
 
+from functools import lru_cache
 from json import dumps
 
+TEMPLATE_CACHE_SIZE = 4096
+# connection profile: Connection header value
+CONNECTIONS = {'close': 'Close', 'keep-alive': 'Keep-Alive'}
+
+
+def canonical_header(key: str) -> str:
+    """Capitalize all key words of a header name: content-type -> Content-Type."""
+    return '-'.join([word.lower().capitalize() for word in key.split('-')])
+
 
 class PhantomAmmo:
     """PhantomAmmo blueprint.
@@ -47,7 +57,9 @@ class PhantomAmmo:
     def __init__(self, method: str, url: str, host: str, case: str, port: int,
                  extra_headers: dict,
                  body: str,
-                 log=None):
+                 log=None,
+                 connection: str = None,
+                 default_headers: dict = None):
         """Phantom-type bullet constructor.
 
         method: one of allowed http methods.
@@ -64,6 +76,8 @@ class PhantomAmmo:
                  'Connection': 'Close'}
         body: request body.
         log: logger instance for debug messages.
+        connection: close or keep-alive. default value is None (Connection of default_headers).
+        default_headers: overrides of default_headers, None value removes a header.
         """
         self.log = log
         self.method = method
@@ -73,11 +87,10 @@ class PhantomAmmo:
         self.port = port
         self.case = case
 
-        headers = extra_headers
-        self.default_headers['Host'] = '{host}:{port}'.format(host=self.host, port=self.port)
-        headers.update(self.default_headers)
-
-        self.headers = headers
+        # neither caller's extra_headers nor class default_headers are changed
+        profile = header_profile(connection, tuple(default_headers.items()) if default_headers else (),
+                                 tuple(self.default_headers.items()))
+        self.headers = dict(bullet_headers(host, port, tuple(extra_headers.items()) if extra_headers else (), profile))
         if body and isinstance(body, dict):
             body = dumps(body)
         self.body = body
@@ -91,10 +104,9 @@ class PhantomAmmo:
     def headers(self, value: dict):
         """Phantom-type bullet http headers setter."""
         headers_list = list()
-        for key, value in value.items():
+        for key, header_value in value.items():
             # all key words must be capitalized
-            header_key = '-'.join([word.lower().capitalize() for word in key.split('-')])
-            header_str = '{key}: {val}'.format(key=header_key, val=value)
+            header_str = '{key}: {val}'.format(key=canonical_header(key), val=header_value)
             headers_list.append(header_str)
         self.__headers = '\r\n'.join(headers_list)
 
@@ -102,9 +114,10 @@ class PhantomAmmo:
     def request(self):
         """Phantom-type bullet http request."""
         if self.body:
+            # Content-Length is a number of bytes, not characters
             return self.body_template.format(method=self.method, url=self.url,
                                              headers=self.headers,
-                                             content_length=len(str(self.body)),
+                                             content_length=len(str(self.body).encode('utf-8')),
                                              body=self.body)
         return self.no_body_template.format(method=self.method,
                                             url=self.url,
@@ -114,9 +127,217 @@ class PhantomAmmo:
     def bullet(self):
         """Phantom-type bullet for load generator."""
         request = self.request
-        ammo = self.ammo_template.format(request_length=len(request),
+        ammo = self.ammo_template.format(request_length=len(request.encode('utf-8')),
                                          case=self.case,
                                          request=request)
         if self.log:
             self.log.debug(ammo.replace('\r\n', ', ').replace('\n', ', '))
         return ammo
+
+
+@lru_cache(maxsize=TEMPLATE_CACHE_SIZE)
+def header_profile(connection: str = None, default_headers: tuple = (), base: tuple = None) -> tuple:
+    """Return default headers of a bullet as a tuple of (key, value) pairs.
+
+    connection: close or keep-alive. None keeps Connection header of base.
+    default_headers: (key, value) pairs overriding base headers and connection, None value removes a header.
+    base: profile to override, PhantomAmmo.default_headers by default.
+    """
+    headers = dict(base if base is not None else PhantomAmmo.default_headers.items())
+    if connection is not None:
+        if connection not in CONNECTIONS:
+            raise ValueError('{} is not one of connection profiles: {}.'.format(connection, ', '.join(CONNECTIONS)))
+        headers['Connection'] = CONNECTIONS[connection]
+    for key, val in default_headers:
+        key = canonical_header(key)
+        if val is None:
+            headers.pop(key, None)
+        else:
+            headers[key] = val
+    return tuple(headers.items())
+
+
+DEFAULT_PROFILE = header_profile()
+
+
+def request_profile(request, profile: tuple = DEFAULT_PROFILE) -> tuple:
+    """Return profile with body Content-Type, connection and default headers of a ConfigRequest applied."""
+    encoder = request.body_encoder
+    if not request.connection and not request.default_headers and encoder is None:
+        return profile
+    headers = tuple(request.default_headers.items())
+    if encoder is not None:
+        headers = (('Content-Type', encoder.content_type),) + headers
+    return header_profile(request.connection or None, headers, profile)
+
+
+def bullet_headers(host: str, port: int, extra_headers: tuple, profile: tuple = DEFAULT_PROFILE) -> list:
+    """Headers of a bullet as (canonical key, value) pairs: extra headers, default headers and Host.
+
+    extra_headers: request additional headers as a tuple of (key, value) pairs, they replace default headers
+                   with the same name in any letter case.
+    profile: default headers as a tuple of (key, value) pairs, see header_profile.
+    """
+    headers = {canonical_header(key): val for key, val in extra_headers}
+    for key, val in profile:
+        headers.setdefault(canonical_header(key), val)
+    headers['Host'] = '{host}:{port}'.format(host=host, port=port)
+    return list(headers.items())
+
+
+class PhantomTemplate:
+    """Precompiled Phantom bullet for requests of the same shape (method, host, port, extra and default headers).
+
+    Request line parts and canonical headers are encoded once,
+    only url, case, body and values of dynamic headers are spliced in for each bullet.
+    Result is the same as PhantomAmmo.bullet encoded to utf-8.
+    """
+
+    __slots__ = ('method', 'headers', 'header_parts')
+
+    def __init__(self, method: str, host: str, port: int, extra_headers: tuple, profile: tuple = DEFAULT_PROFILE):
+        """Build static parts of a bullet.
+
+        method: one of allowed http methods.
+        host: host to shoot.
+        port: port where handler runs.
+        extra_headers: request additional headers as a tuple of (key, value) pairs.
+                       None value is a dynamic header, its value is passed to render for each bullet.
+        profile: default headers as a tuple of (key, value) pairs, see header_profile.
+        """
+        parts = [' HTTP/1.1\r\n']
+        for number, (key, val) in enumerate(bullet_headers(host, port, extra_headers, profile)):
+            parts[-1] += '{sep}{key}: '.format(sep='\r\n' if number else '', key=key)
+            if val is None:
+                parts.append('')
+            else:
+                parts[-1] += str(val)
+        self.method = '{method} '.format(method=method).encode('utf-8')
+        self.headers = parts[0].encode('utf-8')
+        # encoded headers split by dynamic header values
+        self.header_parts = tuple(part.encode('utf-8') for part in parts)
+
+    def join_headers(self, header_values: tuple) -> bytes:
+        """Return encoded headers with values of dynamic headers."""
+        headers = [self.header_parts[0]]
+        for value, part in zip(header_values, self.header_parts[1:]):
+            headers.append(value.encode('utf-8'))
+            headers.append(part)
+        return b''.join(headers)
+
+    def render(self, url: str, case: str, body: bytes = b'', header_values: tuple = ()) -> bytes:
+        """Render encoded Phantom bullet.
+
+        url: url where load generator will shoot.
+        case: test case tag in report.
+        body: encoded request body (bytes-like object). Request without body if empty.
+        header_values: values of dynamic headers in the template order.
+        """
+        headers = self.join_headers(header_values) if header_values else self.headers
+        if body:
+            request = b'%b%b%b\r\nContent-Length: %d\r\n\r\n%b' % (
+                self.method, url.encode('utf-8'), headers, len(body), body)
+        else:
+            request = self.method + url.encode('utf-8') + headers
+        return b'%d %b\n%b\r\n\r\n' % (len(request), case.encode('utf-8'), request)
+
+    def bullet_size(self, url_size: int, case_size: int, body_size: int = 0) -> int:
+        """Return size of a bullet without dynamic headers in bytes, nothing is rendered.
+
+        url_size, case_size and body_size: sizes of encoded url, case and body.
+        """
+        request_size = len(self.method) + url_size + len(self.headers)
+        if body_size:
+            request_size += len(b'\r\nContent-Length: %d\r\n\r\n' % body_size) + body_size
+        return len(b'%d' % request_size) + case_size + request_size + 6
+
+    def render_parts(self, url: str, case: str, body_parts: tuple, body_size: int, header_values: tuple = ()) -> tuple:
+        """Render encoded Phantom bullet as a tuple of parts, body parts are not copied.
+
+        url: url where load generator will shoot.
+        case: test case tag in report.
+        body_parts: tuple of bytes-like objects, body is their concatenation.
+        body_size: body size in bytes.
+        header_values: values of dynamic headers in the template order.
+        """
+        headers = self.join_headers(header_values) if header_values else self.headers
+        head = b'%b%b%b\r\nContent-Length: %d\r\n\r\n' % (self.method, url.encode('utf-8'), headers, body_size)
+        return (b'%d %b\n%b' % (len(head) + body_size, case.encode('utf-8'), head),) + body_parts + (b'\r\n\r\n',)
+
+
+@lru_cache(maxsize=TEMPLATE_CACHE_SIZE)
+def compile_template(method: str, host: str, port: int, extra_headers: tuple,
+                     profile: tuple = DEFAULT_PROFILE) -> PhantomTemplate:
+    """Return cached PhantomTemplate for a request shape.
+
+    extra_headers: request additional headers as a tuple of (key, value) pairs.
+    profile: default headers as a tuple of (key, value) pairs, see header_profile.
+    """
+    return PhantomTemplate(method, host, port, extra_headers, profile)
+
+
+class PhantomRenderer:
+    """Stateless Phantom bullet renderer.
+
+    Instances keep no per-bullet state and templates are immutable,
+    so one renderer may be used concurrently from many threads or an asyncio executor.
+    Output is the same as PhantomAmmo.bullet encoded to utf-8.
+    """
+
+    __slots__ = ()
+
+    @staticmethod
+    def render(method: str, url: str, host: str, port: int = 80, case: str = None, extra_headers: dict = None,
+               body=None, connection: str = None, default_headers: dict = None) -> bytes:
+        """Render encoded Phantom bullet.
+
+        method: one of allowed http methods.
+        url: url where load generator will shoot.
+        host: host to shoot.
+        port: port where handler runs.
+        case: test case tag in report. default value is url.
+        extra_headers: request additional headers (not changed).
+        body: request body (dict is serialized to JSON).
+        connection: close or keep-alive. default value is None (Connection of PhantomAmmo.default_headers).
+        default_headers: overrides of PhantomAmmo.default_headers, None value removes a header.
+        """
+        headers = tuple((key, str(val)) for key, val in extra_headers.items()) if extra_headers else ()
+        profile = header_profile(connection, tuple(default_headers.items()) if default_headers else ())
+        template = compile_template(method, host, port, headers, profile)
+        return template.render(url, case if case else url, encode_body(body))
+
+    @staticmethod
+    def render_request(request, profile: tuple = DEFAULT_PROFILE) -> bytes:
+        """Render encoded Phantom bullet for a ConfigRequest.
+
+        profile: default headers (see header_profile) overridden by connection and default_headers of the request.
+        Bullet with a body encoder (see yapam.body) is a tuple of parts.
+        """
+        dynamic = request.dynamic_headers
+        headers = tuple((key, None if key in dynamic else str(val)) for key, val in request.extra_headers.items())
+        # values of dynamic headers are not a part of the cached template
+        values = tuple(str(request.extra_headers[key]) for key, val in headers if val is None)
+        template = compile_template(request.method, request.host, request.port, headers,
+                                    request_profile(request, profile))
+        encoder = request.body_encoder
+        if encoder is None:
+            return template.render(request.url, request.case, encode_body(request.body), values)
+        return template.render_parts(request.url, request.case, encoder.parts, encoder.size, values)
+
+    @staticmethod
+    def request_template(request, profile: tuple = DEFAULT_PROFILE) -> PhantomTemplate:
+        """Return compiled template of a ConfigRequest without dynamic headers, see PhantomTemplate.bullet_size.
+
+        profile: default headers (see header_profile) overridden by connection and default_headers of the request.
+        """
+        headers = tuple((key, str(val)) for key, val in request.extra_headers.items())
+        return compile_template(request.method, request.host, request.port, headers, request_profile(request, profile))
+
+
+def encode_body(body) -> bytes:
+    """Encode request body the same way as PhantomAmmo does."""
+    if not body:
+        return b''
+    if isinstance(body, dict):
+        body = dumps(body)
+    return str(body).encode('utf-8')
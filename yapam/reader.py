@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+r"""Random-access reader of Phantom ammo files.
+
+Phantom bullet framing (see PhantomAmmo.ammo_template):
+    <request length> <case>\n
+    <request of request length bytes>\r\n\r\n
+
+Example of usage:
+    with AmmoReader('ammo') as reader:
+        bullet = reader[5000000]
+        for bullet in reader.sample(100, seed=1):
+            print(bullet.case, bullet.request)
+"""
+
+import io
+import mmap
+import os
+import random
+import struct
+from array import array
+from collections import namedtuple
+from contextlib import suppress
+
+INDEX_MAGIC = b'YAPAMIDX'
+INDEX_HEADER = struct.Struct('<8sQQ')
+SEPARATORS = b'\r\n'
+
+Frame = namedtuple('Frame', ['offset', 'case', 'start', 'end', 'next'])
+Bullet = namedtuple('Bullet', ['offset', 'case', 'request'])
+
+
+def parse_frame(buffer, offset: int, strict: bool = False) -> Frame:
+    r"""Parse bullet framing at offset.
+
+    buffer: bytes-like object (bytes, mmap, memoryview).
+    strict: request should be followed by exactly one \r\n\r\n, so an over-declared length is an error.
+            By default any number of separators is skipped.
+    Returns Frame: offset, case, start and end of the request and offset of the next bullet.
+    Raises ValueError if framing is broken.
+    """
+    size = len(buffer)
+    line_end = buffer.find(b'\n', offset)
+    if line_end < 0:
+        raise ValueError('Bullet header line is not terminated at offset {}.'.format(offset))
+    length, __, case = buffer[offset:line_end].partition(b' ')
+    if not length.isdigit():
+        raise ValueError('Bad request length at offset {}.'.format(offset))
+    start = line_end + 1
+    end = start + int(length)
+    if end > size:
+        raise ValueError('Request at offset {} is longer than the rest of the file.'.format(offset))
+    if strict:
+        if buffer[end:end + 4] != b'\r\n\r\n':
+            raise ValueError('Request at offset {} is not followed by \\r\\n\\r\\n.'.format(offset))
+        next_offset = end + 4
+    else:
+        next_offset = end
+        while next_offset < size and buffer[next_offset] in SEPARATORS:
+            next_offset += 1
+    return Frame(offset, case.rstrip(b'\r').decode('utf-8'), start, end, next_offset)
+
+
+def iter_frames(buffer, offset: int = 0):
+    """Yield Frame for each bullet of the buffer starting from offset."""
+    size = len(buffer)
+    while offset < size:
+        frame = parse_frame(buffer, offset)
+        yield frame
+        offset = frame.next
+
+
+class AmmoReader:
+    """Phantom ammo file reader over mmap.
+
+    Bullet offsets are kept in a compact array index, the index is saved to a sidecar file
+    and reused while the ammo file size and modification time are the same.
+
+    file_path:  path to the ammo file.
+    index_path: path to the index sidecar file. default value is file_path + '.idx'.
+    """
+
+    def __init__(self, file_path: str, index_path: str = None):
+        """Map ammo file to memory."""
+        self.file_path = file_path
+        self.index_path = index_path if index_path else file_path + '.idx'
+        self.__file = io.open(file_path, mode='rb')
+        stat = os.fstat(self.__file.fileno())
+        self.size = stat.st_size
+        self.mtime_ns = stat.st_mtime_ns
+        self.buffer = mmap.mmap(self.__file.fileno(), 0, access=mmap.ACCESS_READ) if self.size else b''
+        self.__index = None
+
+    def __enter__(self):
+        """Use reader as a context manager."""
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """Close mmap and the file."""
+        self.close()
+
+    def close(self):
+        """Close mmap and the file."""
+        if isinstance(self.buffer, mmap.mmap):
+            self.buffer.close()
+        self.__file.close()
+
+    @property
+    def index(self) -> array:
+        """Bullet offsets. Loaded from the sidecar file or built and saved."""
+        if self.__index is None:
+            self.__index = self.load_index()
+            if self.__index is None:
+                self.__index = self.build_index()
+                self.save_index()
+        return self.__index
+
+    def build_index(self) -> array:
+        """Scan the ammo file and collect bullet offsets."""
+        index = array('Q')
+        for frame in iter_frames(self.buffer):
+            index.append(frame.offset)
+        return index
+
+    def save_index(self):
+        """Save index to the sidecar file. Return False if it can not be written, the index is kept in memory."""
+        tmp_path = self.index_path + '.tmp'
+        try:
+            with io.open(tmp_path, mode='wb') as index_file:
+                index_file.write(INDEX_HEADER.pack(INDEX_MAGIC, self.size, self.mtime_ns))
+                self.__index.tofile(index_file)
+            # a partially written sidecar is never loaded
+            os.replace(tmp_path, self.index_path)
+        except OSError:
+            with suppress(OSError):
+                os.remove(tmp_path)
+            return False
+        return True
+
+    def load_index(self):
+        """Load index from the sidecar file. Return None if it is missing or outdated."""
+        if not os.path.isfile(self.index_path):
+            return None
+        with io.open(self.index_path, mode='rb') as index_file:
+            header = index_file.read(INDEX_HEADER.size)
+            expected = (INDEX_MAGIC, self.size, self.mtime_ns)
+            if len(header) != INDEX_HEADER.size or INDEX_HEADER.unpack(header) != expected:
+                return None
+            index = array('Q')
+            index.frombytes(index_file.read())
+        return index
+
+    def __len__(self):
+        """Return number of bullets."""
+        return len(self.index)
+
+    def __getitem__(self, item):
+        """Return Bullet by number or list of Bullets for a slice."""
+        if isinstance(item, slice):
+            return [self.bullet(offset) for offset in self.index[item]]
+        return self.bullet(self.index[item])
+
+    def __iter__(self):
+        """Iterate over all bullets."""
+        for offset in self.index:
+            yield self.bullet(offset)
+
+    def bullet(self, offset: int) -> Bullet:
+        """Return Bullet at offset. Request is copied to bytes, so bullets stay valid after close."""
+        frame = parse_frame(self.buffer, offset)
+        return Bullet(offset, frame.case, self.buffer[frame.start:frame.end])
+
+    def raw(self, start: int, stop: int = None) -> memoryview:
+        """Return unchanged bytes of bullets from start to stop (exclusive) numbers.
+
+        The memoryview should be released before close, e.g. used as a context manager.
+        """
+        index = self.index
+        start, stop, __ = slice(start, stop).indices(len(index))
+        if start >= stop:
+            return memoryview(b'')
+        end = index[stop] if stop < len(index) else self.size
+        return memoryview(self.buffer)[index[start]:end]
+
+    def write_slice(self, file_path: str, start: int, stop: int = None):
+        """Save bullets from start to stop (exclusive) numbers to a new ammo file."""
+        with self.raw(start, stop) as data, io.open(file_path, mode='wb') as slice_file:
+            slice_file.write(data)
+
+    def sample(self, count: int, seed: int = None) -> list:
+        """Return count random bullets in the file order."""
+        numbers = random.Random(seed).sample(range(len(self.index)), count)
+        return [self[number] for number in sorted(numbers)]
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+"""Sharded ammo output for several tank nodes.
+
+Bullets are routed to N ammo files in a single pass:
+    round-robin:   bullet i goes to shard i % N, each shard gets the same case mix.
+    byte-balanced: bullet goes to the shard with the least bytes written.
+    hash-by-case:  all bullets of a test case go to the same shard.
+Manifest with per-shard bullet, byte and case counters is saved next to the shards.
+
+Example of usage:
+    with ShardedWriter('ammo', shards=4, strategy='byte-balanced') as writer:
+        for case, bullet in bullets:
+            writer.write(writer.pick(case), bullet, case)
+"""
+
+import heapq
+import io
+import json
+import os
+import zlib
+
+from yapam.writer import AmmoWriter, COMPRESSION_EXTENSIONS, DEFAULT_BUFFER_SIZE, bullet_size
+
+SHARD_STRATEGIES = ('round-robin', 'byte-balanced', 'hash-by-case')
+DEFAULT_SHARD_STRATEGY = 'round-robin'
+
+
+def shard_path(file_path: str, index: int) -> str:
+    """Shard file path: ammo -> ammo.0, ammo.gz -> ammo.0.gz."""
+    root, file_ext = os.path.splitext(file_path)
+    if file_ext.lower() in COMPRESSION_EXTENSIONS:
+        return '{root}.{index}{ext}'.format(root=root, index=index, ext=file_ext)
+    return '{path}.{index}'.format(path=file_path, index=index)
+
+
+def manifest_path(file_path: str) -> str:
+    """Shards manifest path."""
+    return file_path + '.manifest.json'
+
+
+class ShardedWriter:
+    """Write encoded bullets to N ammo files.
+
+    file_path:   base path, shard files are named by shard_path.
+    shards:      number of shards.
+    strategy:    round-robin, byte-balanced or hash-by-case.
+    buffer_size, compression and compression_workers are used for each shard, see AmmoWriter.
+    """
+
+    def __init__(self, file_path: str, shards: int, strategy: str = DEFAULT_SHARD_STRATEGY,
+                 buffer_size: int = DEFAULT_BUFFER_SIZE, compression: str = None, compression_workers: int = 1):
+        """Open shard files."""
+        if shards < 1:
+            raise ValueError('shards should be a positive number.')
+        if strategy not in SHARD_STRATEGIES:
+            raise ValueError('{} is not one of shard strategies: {}.'.format(strategy, ', '.join(SHARD_STRATEGIES)))
+        self.file_path = file_path
+        self.strategy = strategy
+        self.stream = False
+        self.writers = list()
+        try:
+            for index in range(shards):
+                self.writers.append(AmmoWriter(shard_path(file_path, index), buffer_size, compression,
+                                               compression_workers))
+        except Exception:
+            self.close_writers()
+            raise
+        self.cases = [dict() for __ in range(shards)]
+        self.__next = 0
+        # bytes of each shard and heap of (bytes, index) for byte-balanced strategy,
+        # heap entries with outdated bytes are dropped lazily
+        self.__sizes = [0] * shards
+        self.__heap = [(0, index) for index in range(shards)]
+
+    def __enter__(self):
+        """Use writer as a context manager."""
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """Close shards and save manifest."""
+        self.close()
+
+    def pick(self, case: str) -> int:
+        """Return shard index for the next bullet of a case."""
+        if self.strategy == 'round-robin':
+            index = self.__next
+            self.__next = (index + 1) % len(self.writers)
+            return index
+        if self.strategy == 'byte-balanced':
+            heap, sizes = self.__heap, self.__sizes
+            while heap[0][0] != sizes[heap[0][1]]:
+                heapq.heappop(heap)
+            return heap[0][1]
+        # crc32 is stable between runs, unlike hash()
+        return zlib.crc32(case.encode('utf-8')) % len(self.writers)
+
+    def write(self, index: int, data: bytes, case: str):
+        """Write encoded bullet (bytes-like object or a tuple of parts) to a shard."""
+        self.writers[index].write(data)
+        cases = self.cases[index]
+        cases[case] = cases.get(case, 0) + 1
+        if self.strategy == 'byte-balanced':
+            self.__sizes[index] += bullet_size(data)
+            heapq.heappush(self.__heap, (self.__sizes[index], index))
+            if len(self.__heap) > 2 * len(self.__sizes):
+                # bullets written to shards that were not picked leave outdated entries
+                self.__heap = [(size, shard) for shard, size in enumerate(self.__sizes)]
+                heapq.heapify(self.__heap)
+
+    def close_writers(self):
+        """Close shard files."""
+        for writer in self.writers:
+            writer.close()
+
+    def close(self):
+        """Close shards and save manifest."""
+        self.close_writers()
+        with io.open(manifest_path(self.file_path), mode='w', encoding='utf-8') as manifest_file:
+            json.dump(self.manifest, manifest_file, indent=2, ensure_ascii=False)
+
+    @property
+    def manifest(self) -> dict:
+        """Strategy and per-shard file, bullets, bytes and cases counters."""
+        return {'strategy': self.strategy,
+                'shards': [{'file': writer.file_path,
+                            'bullets': writer.bullets,
+                            'bytes': writer.bytes_written,
+                            'file_bytes': writer.file_bytes,
+                            'cases': cases}
+                           for writer, cases in zip(self.writers, self.cases)]}
+
+    @property
+    def stats(self) -> dict:
+        """Total statistics of all shards, like AmmoWriter.stats."""
+        shard_stats = [writer.stats for writer in self.writers]
+        stats = {key: sum(stat[key] for stat in shard_stats) for key in ('bullets', 'bytes', 'file_bytes')}
+        stats['seconds'] = max(stat['seconds'] for stat in shard_stats)
+        stats['bullets_per_sec'] = stats['bullets'] / stats['seconds'] if stats['seconds'] else 0.0
+        stats['shards'] = len(self.writers)
+        return stats
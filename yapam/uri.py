@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+"""URI-style and URIPOST ammo for Yandex Tank.
+
+Headers are written once as [Key: value] lines and are shared by all following bullets,
+header lines are written again only for headers changed by the next request.
+URI bullet is a single line, URIPOST bullet is a line with the body length followed by the body:
+    [Host: 127.0.0.1:80]
+    [User-Agent: phantom]
+    /catalog?page=1 catalog
+    54 /auth auth
+    {"username": "tank_user_0", "password": "tank_user_0"}
+
+Renderers remember headers of the previous bullet, so use one renderer instance per ammo file.
+
+Example of usage:
+    renderer = UriRenderer()
+    for request in requests:
+        ammo_file.write(renderer.render_request(request))
+"""
+
+from functools import lru_cache
+
+from yapam.phantom import DEFAULT_PROFILE, TEMPLATE_CACHE_SIZE, bullet_headers, encode_body, request_profile
+from yapam.writer import join_parts
+
+
+def request_shape(request, profile: tuple = DEFAULT_PROFILE) -> tuple:
+    """Request parameters that define bullet headers.
+
+    Host, port, extra headers as (key, value) pairs and profile with request overrides (see request_profile).
+    """
+    return (request.host, request.port, tuple((key, str(val)) for key, val in request.extra_headers.items()),
+            request_profile(request, profile))
+
+
+class UriTemplate:
+    """Encoded header lines for requests of the same shape (host, port, extra and default headers)."""
+
+    __slots__ = ('headers', 'header_lines')
+
+    def __init__(self, host: str, port: int, extra_headers: tuple, profile: tuple = DEFAULT_PROFILE):
+        """Build header lines.
+
+        host: host to shoot.
+        port: port where handler runs.
+        extra_headers: request additional headers as a tuple of (key, value) pairs.
+        profile: default headers as a tuple of (key, value) pairs, see header_profile.
+        """
+        self.headers = dict(bullet_headers(host, port, extra_headers, profile))
+        self.header_lines = b''.join(header_line(key, val) for key, val in self.headers.items())
+
+
+def header_line(key: str, value: str) -> bytes:
+    """Return encoded [Key: value] header line."""
+    return '[{key}: {val}]\n'.format(key=key, val=value).encode('utf-8')
+
+
+@lru_cache(maxsize=TEMPLATE_CACHE_SIZE)
+def compile_uri_template(host: str, port: int, extra_headers: tuple, profile: tuple = DEFAULT_PROFILE) -> UriTemplate:
+    """Return cached UriTemplate for a request shape.
+
+    extra_headers: request additional headers as a tuple of (key, value) pairs.
+    profile: default headers as a tuple of (key, value) pairs, see header_profile.
+    """
+    return UriTemplate(host, port, extra_headers, profile)
+
+
+@lru_cache(maxsize=TEMPLATE_CACHE_SIZE)
+def header_switch(previous: UriTemplate, template: UriTemplate) -> bytes:
+    """Header lines turning headers of the previous template into headers of the template.
+
+    Tank can not unset a header, so a header missing in the template is an error.
+    """
+    if previous is None:
+        return template.header_lines
+    removed = set(previous.headers) - set(template.headers)
+    if removed:
+        raise ValueError('URI ammo can not remove headers {} set by a previous request, '
+                         'use phantom ammo type.'.format(', '.join(sorted(removed))))
+    return b''.join(header_line(key, val) for key, val in template.headers.items()
+                    if previous.headers.get(key) != val)
+
+
+class UriRenderer:
+    """URI-style bullet renderer. Only GET requests without body are supported.
+
+    shape: shape of the request written before (see request_shape), if bullets are appended to existing ammo.
+    profile: default headers (see header_profile) overridden by connection and default_headers of each request.
+    """
+
+    __slots__ = ('template', 'profile')
+
+    ammo_type = 'uri'
+    method = 'GET'
+
+    def __init__(self, shape: tuple = None, profile: tuple = DEFAULT_PROFILE):
+        """Set headers already written to the ammo and default headers."""
+        self.template = compile_uri_template(*shape) if shape else None
+        self.profile = profile
+
+    def render_request(self, request, log=None) -> bytes:
+        """Render encoded bullet for a ConfigRequest, with header lines if headers changed.
+
+        request: ConfigRequest instance.
+        log: logger instance for debug messages.
+        """
+        self.check_method(request)
+        bullet = self.render_line(request)
+        if request.dynamic_headers:
+            # headers change with each bullet, their templates are not cached
+            template = UriTemplate(*request_shape(request, self.profile))
+            switch = header_switch.__wrapped__(self.template, template)
+        else:
+            template = compile_uri_template(*request_shape(request, self.profile))
+            switch = header_switch(self.template, template) if template is not self.template else b''
+        if switch:
+            if type(bullet) is tuple:
+                bullet = (switch + bullet[0],) + bullet[1:]
+            else:
+                bullet = switch + bullet
+        self.template = template
+        if log:
+            log.debug(join_parts(bullet).decode('utf-8', errors='replace').rstrip('\n').replace('\n', ', '))
+        return bullet
+
+    def request_template(self, request) -> UriTemplate:
+        """Return UriTemplate of a ConfigRequest, raise ValueError if the request is not supported, see line_size."""
+        self.check_method(request)
+        self.line_size(request, 0, 0, 0)
+        return compile_uri_template(*request_shape(request, self.profile))
+
+    def check_method(self, request):
+        """Raise ValueError if the request method is not supported by the ammo type."""
+        if request.method != self.method:
+            raise ValueError('{ammo_type} ammo supports {method} requests only, {url} is a {req_method} request.'.format(
+                ammo_type=self.ammo_type, method=self.method, url=request.url, req_method=request.method))
+
+    @staticmethod
+    def line_size(request, url_size: int, case_size: int, body_size: int) -> int:
+        """Return size of uri line by sizes of encoded url, case and body, nothing is rendered.
+
+        Header lines are not counted, they depend on the previous bullet (see header_switch).
+        """
+        if request.body:
+            raise ValueError('uri ammo does not support request body ({}), '
+                             'use uripost or phantom ammo type.'.format(request.url))
+        return url_size + case_size + 2
+
+    @staticmethod
+    def render_line(request) -> bytes:
+        """Render encoded uri line."""
+        if request.body:
+            raise ValueError('uri ammo does not support request body ({}), '
+                             'use uripost or phantom ammo type.'.format(request.url))
+        return b'%b %b\n' % (request.url.encode('utf-8'), request.case.encode('utf-8'))
+
+
+class UriPostRenderer(UriRenderer):
+    """URIPOST bullet renderer. Only POST requests are supported."""
+
+    __slots__ = ()
+
+    ammo_type = 'uripost'
+    method = 'POST'
+
+    @staticmethod
+    def line_size(request, url_size: int, case_size: int, body_size: int) -> int:
+        """Return size of body length and uri line followed by the body."""
+        return len(b'%d' % body_size) + url_size + case_size + body_size + 4
+
+    @staticmethod
+    def render_line(request):
+        """Render encoded body length and uri line followed by the body.
+
+        Bullet with a body encoder (see yapam.body) is a tuple of parts.
+        """
+        encoder = request.body_encoder
+        if encoder is not None:
+            return (b'%d %b %b\n' % (encoder.size, request.url.encode('utf-8'), request.case.encode('utf-8')),
+                    ) + encoder.parts + (b'\n',)
+        body = encode_body(request.body)
+        return b'%d %b %b\n%b\n' % (len(body), request.url.encode('utf-8'), request.case.encode('utf-8'), body)
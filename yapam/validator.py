@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""Streaming Phantom ammo validator and per-case statistics.
+
+Example of usage:
+    report = AmmoValidator('ammo').validate()
+    if not report['valid']:
+        print(report['errors'])
+"""
+
+import mmap
+
+from yapam.reader import AmmoReader, parse_frame
+
+DEFAULT_MAX_ERRORS = 10
+
+
+class CaseStats:
+    """Bullets statistics of a test case."""
+
+    __slots__ = ('bullets', 'bytes', 'min', 'max', 'histogram')
+
+    def __init__(self):
+        """Create empty statistics."""
+        self.bullets = 0
+        self.bytes = 0
+        self.min = None
+        self.max = 0
+        self.histogram = dict()
+
+    def add(self, length: int):
+        """Count a bullet with request of length bytes."""
+        self.bullets += 1
+        self.bytes += length
+        self.min = length if self.min is None else min(self.min, length)
+        self.max = max(self.max, length)
+        # power of two size buckets
+        bucket = 1 << length.bit_length() if length else 0
+        self.histogram[bucket] = self.histogram.get(bucket, 0) + 1
+
+    def as_dict(self) -> dict:
+        """Statistics as a JSON-serializable dict."""
+        return {'bullets': self.bullets,
+                'bytes': self.bytes,
+                'min': self.min,
+                'max': self.max,
+                'histogram': {'<{}'.format(bucket) if bucket else '0': count
+                              for bucket, count in sorted(self.histogram.items())}}
+
+
+def check_request(buffer, start: int, end: int):
+    """Check HTTP request between start and end of the buffer. Return error message or None."""
+    line_end = buffer.find(b'\r\n', start, end)
+    request_line = buffer[start:line_end if line_end >= 0 else end].split(b' ')
+    if len(request_line) != 3 or not request_line[2].startswith(b'HTTP/'):
+        return 'Bad request line.'
+    headers_end = buffer.find(b'\r\n\r\n', start, end)
+    # request without body may be declared without the final empty line
+    body_start = headers_end + 4 if headers_end >= 0 else end
+    headers = buffer[line_end + 2 if line_end >= 0 else end:headers_end if headers_end >= 0 else end]
+    content_length = None
+    for header in headers.split(b'\r\n'):
+        key, __, value = header.partition(b':')
+        if key.strip().lower() == b'content-length':
+            if not value.strip().isdigit():
+                return 'Bad Content-Length header.'
+            content_length = int(value)
+    body_length = end - body_start
+    if content_length is None and body_length:
+        return 'Request body without Content-Length header.'
+    if content_length is not None and content_length != body_length:
+        return 'Content-Length is {}, but body is {} bytes.'.format(content_length, body_length)
+    return None
+
+
+class AmmoValidator:
+    r"""Phantom ammo file validator.
+
+    File is mapped to memory and read sequentially once, memory usage does not depend on file size.
+    Each request should be followed by exactly one \r\n\r\n, so a wrong request length is found.
+
+    file_path:  path to the ammo file.
+    max_errors: number of first malformed bullets in the report.
+    """
+
+    def __init__(self, file_path: str, max_errors: int = DEFAULT_MAX_ERRORS):
+        """Set validator parameters."""
+        self.file_path = file_path
+        self.max_errors = max_errors
+
+    def validate(self) -> dict:
+        """Check every bullet and collect per-case statistics.
+
+        Report keys:
+            valid:   True if there are no errors.
+            bullets: number of bullets.
+            bytes:   file size.
+            cases:   per-case bullets, request bytes, min/max request length and size histogram.
+            errors:  first max_errors malformed bullets as {'offset': int, 'error': str}.
+            errors_total: number of malformed bullets.
+        """
+        cases = dict()
+        errors = list()
+        errors_total = 0
+        with AmmoReader(self.file_path) as reader:
+            buffer = reader.buffer
+            if isinstance(buffer, mmap.mmap) and hasattr(mmap, 'MADV_SEQUENTIAL'):
+                buffer.madvise(mmap.MADV_SEQUENTIAL)
+            offset = 0
+            while offset < reader.size:
+                try:
+                    frame = parse_frame(buffer, offset, strict=True)
+                except ValueError as err:
+                    # bullet boundaries are lost, the rest of the file can not be checked
+                    errors_total += 1
+                    if len(errors) < self.max_errors:
+                        errors.append({'offset': offset, 'error': str(err)})
+                    break
+                offset = frame.next
+                stats = cases.get(frame.case)
+                if stats is None:
+                    stats = cases[frame.case] = CaseStats()
+                stats.add(frame.end - frame.start)
+                error = check_request(buffer, frame.start, frame.end)
+                if error:
+                    errors_total += 1
+                    if len(errors) < self.max_errors:
+                        errors.append({'offset': frame.offset, 'error': error})
+            size = reader.size
+
+        return {'valid': not errors_total,
+                'bullets': sum(stats.bullets for stats in cases.values()),
+                'bytes': size,
+                'cases': {case: stats.as_dict() for case, stats in cases.items()},
+                'errors': errors,
+                'errors_total': errors_total}
@@ -0,0 +1,330 @@
+# -*- coding: utf-8 -*-
+"""Buffered streaming writer for ammo files.
+
+Ammo may be streamed to a FIFO or a Unix socket instead of a regular file,
+writes block until the consumer reads data, so nothing is stored on disk.
+"""
+
+import gzip
+import io
+import logging
+import lzma
+import os
+import shutil
+import socket
+import stat
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_BUFFER_SIZE = 4 * 1024 * 1024
+COMPRESSIONS = frozenset(['gzip', 'xz'])
+COMPRESSION_EXTENSIONS = {'.gz': 'gzip', '.xz': 'xz'}
+
+
+def debug_enabled(logger) -> bool:
+    """Check that logger will actually emit debug messages.
+
+    logger: stdlib logger, dav_utils Logging instance or None.
+    """
+    if logger is None:
+        return False
+    # dav_utils Logging wraps the stdlib logger
+    logger = getattr(logger, 'root_logger', logger)
+    return logger.isEnabledFor(logging.DEBUG)
+
+
+def join_parts(bullet) -> bytes:
+    """Join bullet parts (see AmmoWriter.write) to bytes."""
+    return b''.join(bullet) if type(bullet) is tuple else bullet
+
+
+def bullet_size(bullet) -> int:
+    """Return size of a bullet or of bullet parts (see AmmoWriter.write) in bytes."""
+    return sum(len(part) for part in bullet) if type(bullet) is tuple else len(bullet)
+
+
+def compression_by_extension(file_path: str):
+    """Return compression by file_path extension (.gz or .xz) or None."""
+    __, file_ext = os.path.splitext(file_path)
+    return COMPRESSION_EXTENSIONS.get(file_ext.lower())
+
+
+def compress_block(compression: str, data: bytes) -> bytes:
+    """Compress data to a complete gzip member or xz stream."""
+    if compression == 'gzip':
+        # zero mtime keeps output reproducible, gzip.compress accepts mtime since Python 3.8
+        block = io.BytesIO()
+        with open_compressed(block, compression) as compressor:
+            compressor.write(data)
+        return block.getvalue()
+    return lzma.compress(data, format=lzma.FORMAT_XZ)
+
+
+def open_compressed(fileobj, compression: str):
+    """Open streaming compressor over a binary file object."""
+    if compression == 'gzip':
+        return gzip.GzipFile(filename='', mode='wb', fileobj=fileobj, mtime=0)
+    return lzma.LZMAFile(fileobj, mode='wb', format=lzma.FORMAT_XZ)
+
+
+def is_stream(file_path: str) -> bool:
+    """Check that file_path is an existing FIFO or Unix socket."""
+    try:
+        mode = os.stat(file_path).st_mode
+    except OSError:
+        return False
+    return stat.S_ISFIFO(mode) or stat.S_ISSOCK(mode)
+
+
+class StreamOutput:
+    """Unbuffered binary output to a FIFO or a Unix socket consumer.
+
+    FIFO is opened when the consumer opens it for reading, socket should be listened by the consumer.
+    Writes block while the consumer does not read (backpressure) and are always complete.
+    BrokenPipeError or ConnectionResetError is raised if the consumer has gone.
+
+    file_path: path to a FIFO or a Unix socket.
+    """
+
+    def __init__(self, file_path: str):
+        """Connect to the consumer."""
+        self.file_path = file_path
+        self.position = 0
+        self.closed = False
+        if stat.S_ISSOCK(os.stat(file_path).st_mode):
+            self.__socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                self.__socket.connect(file_path)
+            except OSError:
+                self.__socket.close()
+                raise
+            self.__fd = self.__socket.fileno()
+        else:
+            self.__socket = None
+            self.__fd = os.open(file_path, os.O_WRONLY)
+
+    def write(self, data) -> int:
+        """Write all bytes-like data, blocking while the consumer is busy."""
+        if self.__socket is not None:
+            self.__socket.sendall(data)
+            size = len(data)
+        else:
+            with memoryview(data) as view:
+                size = 0
+                while size < len(view):
+                    size += os.write(self.__fd, view[size:])
+        self.position += size
+        return size
+
+    def flush(self):
+        """Do nothing, output is not buffered."""
+
+    def tell(self) -> int:
+        """Return number of bytes written."""
+        return self.position
+
+    def fileno(self) -> int:
+        """Return file descriptor."""
+        return self.__fd
+
+    def close(self):
+        """Close the stream, consumer gets end of file."""
+        if self.closed:
+            return
+        self.closed = True
+        if self.__socket is not None:
+            self.__socket.close()
+        else:
+            os.close(self.__fd)
+
+
+class ParallelCompressor:
+    """Compress independent blocks in parallel and write them in order.
+
+    Each block becomes a separate gzip member or xz stream,
+    concatenated members/streams are read by standard decompressors as a single file.
+    zlib and lzma release the GIL while compressing, so threads load all workers.
+
+    fileobj:     binary file object for compressed data.
+    compression: gzip or xz.
+    workers:     number of compressing threads.
+    """
+
+    def __init__(self, fileobj, compression: str, workers: int):
+        """Start compressing threads."""
+        self.fileobj = fileobj
+        self.compression = compression
+        self.workers = workers
+        self.closed = False
+        self.__pool = ThreadPoolExecutor(max_workers=workers)
+        self.__pending = deque()
+
+    def write(self, data) -> int:
+        """Queue a block for compression, write finished blocks."""
+        self.__pending.append(self.__pool.submit(compress_block, self.compression, bytes(data)))
+        # limit number of blocks in memory
+        while len(self.__pending) > self.workers * 2:
+            self.fileobj.write(self.__pending.popleft().result())
+        return len(data)
+
+    def close(self):
+        """Write the rest of blocks and stop threads."""
+        if self.closed:
+            return
+        while self.__pending:
+            self.fileobj.write(self.__pending.popleft().result())
+        self.__pool.shutdown()
+        self.closed = True
+
+
+class AmmoWriter:
+    """Write encoded bullets to a file in large chunks.
+
+    Bullets are collected in a buffer and written to the file when buffer_size is reached,
+    so peak memory does not depend on the size of the ammo file.
+
+    file_path:   path to a file where ammo should be saved, or an existing FIFO or Unix socket to stream ammo to.
+    buffer_size: size of a write chunk in bytes.
+    compression: gzip, xz or None. If None, compression is chosen by file_path extension (.gz, .xz).
+    compression_workers: number of threads compressing independent blocks of buffer_size in parallel.
+    """
+
+    def __init__(self, file_path: str, buffer_size: int = DEFAULT_BUFFER_SIZE, compression: str = None,
+                 compression_workers: int = 1):
+        """Open file_path for binary writing."""
+        if buffer_size <= 0:
+            raise ValueError('buffer_size should be a positive number.')
+        if compression is None:
+            compression = compression_by_extension(file_path)
+        if compression is not None and compression not in COMPRESSIONS:
+            raise ValueError('{} is not one of supported compressions: gzip, xz.'.format(compression))
+        if compression_workers < 1:
+            raise ValueError('compression_workers should be a positive number.')
+        self.file_path = file_path
+        self.buffer_size = buffer_size
+        self.compression = compression
+        self.bullets = 0
+        self.bytes_written = 0
+        self.file_bytes = 0
+        self.__buffer = bytearray()
+        self.stream = is_stream(file_path)
+        self.__raw = StreamOutput(file_path) if self.stream else io.open(file_path, mode='wb', buffering=0)
+        if compression is None:
+            self.__file = self.__raw
+        elif compression_workers > 1:
+            self.__file = ParallelCompressor(self.__raw, compression, compression_workers)
+        else:
+            self.__file = open_compressed(self.__raw, compression)
+        self.__started = time.perf_counter()
+        self.__finished = None
+
+    def __enter__(self):
+        """Use writer as a context manager."""
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """Flush buffer and close the file."""
+        self.close()
+
+    def write(self, data: bytes, bullets: int = 1):
+        """Add encoded bullets to the buffer.
+
+        data:    encoded bullet (or several joined bullets), any bytes-like object,
+                 or a tuple of bytes-like parts of a bullet.
+        bullets: number of bullets in data.
+        """
+        self.bullets += bullets
+        if type(data) is tuple:
+            for part in data:
+                self.write(part, bullets=0)
+            return
+        if len(data) >= self.buffer_size:
+            # large data (like a memory mapped body file) is written as is, without copying to the buffer
+            self.flush()
+            self.write_all(data)
+            return
+        self.__buffer += data
+        if len(self.__buffer) >= self.buffer_size:
+            self.flush()
+
+    def write_file(self, file_path: str, bullets: int):
+        """Append content of a file with encoded bullets.
+
+        Uncompressed output to a regular file is copied by the kernel (copy_file_range) when it is possible.
+        """
+        self.bullets += bullets
+        with io.open(file_path, mode='rb', buffering=0) as src:
+            if self.__file is not self.__raw or self.stream:
+                for block in iter(lambda: src.read(self.buffer_size), b''):
+                    self.write(block, bullets=0)
+                return
+            self.flush()
+            size = os.fstat(src.fileno()).st_size
+            copied = 0
+            try:
+                while copied < size:
+                    count = os.copy_file_range(src.fileno(), self.__raw.fileno(), size - copied)
+                    if not count:
+                        break
+                    copied += count
+            except (AttributeError, OSError):
+                # copy_file_range is missing or not supported for these files
+                pass
+            self.bytes_written += copied
+            if copied < size:
+                src.seek(copied)
+                with io.open(self.__raw.fileno(), mode='wb', closefd=False) as dst:
+                    shutil.copyfileobj(src, dst, self.buffer_size)
+                self.bytes_written += size - copied
+
+    def flush(self):
+        """Write buffer content to the file."""
+        if self.__buffer:
+            self.write_all(self.__buffer)
+            self.__buffer.clear()
+
+    def write_all(self, data: bytes):
+        """Write bytes-like data to the file, retrying after partial writes."""
+        with memoryview(data) as view:
+            written = 0
+            while written < len(view):
+                with view[written:] as chunk:
+                    written += self.__file.write(chunk)
+        self.bytes_written += written
+
+    def close(self):
+        """Flush buffer and close the file."""
+        if self.__raw.closed:
+            return
+        try:
+            self.flush()
+            if self.__file is not self.__raw:
+                # writes the rest of compressed data
+                self.__file.close()
+        finally:
+            if self.__file is not self.__raw and not self.__file.closed:
+                # stream consumer has gone, the rest of compressed data can not be written
+                try:
+                    self.__file.close()
+                except (OSError, ValueError):
+                    pass
+            self.file_bytes = self.__raw.tell()
+            self.__raw.close()
+            self.__finished = time.perf_counter()
+
+    @property
+    def elapsed(self) -> float:
+        """Seconds since writer was opened (till closed)."""
+        finished = self.__finished if self.__finished else time.perf_counter()
+        return finished - self.__started
+
+    @property
+    def stats(self) -> dict:
+        """Writer statistics: bullets, bytes written (before compression), file size and bullets/sec."""
+        elapsed = self.elapsed
+        return {'bullets': self.bullets,
+                'bytes': self.bytes_written,
+                'file_bytes': self.file_bytes,
+                'seconds': elapsed,
+                'bullets_per_sec': self.bullets / elapsed if elapsed else 0.0}